@@ -0,0 +1,477 @@
+"""
+Offline benchmarks for the retrieval pipeline
+
+Run from backend/python after building the default flat index:
+
+    python benchmarks.py index [--k 10] [--queries 200]
+    python benchmarks.py hybrid [--k 10] [--queries 200]
+    python benchmarks.py concurrency [--threads 1 2 4 8] [--queries 200]
+    python benchmarks.py encoder [--backends torch int8 onnx onnx_int8] [--texts 1000]
+    python benchmarks.py flatten [--input data/banks.json] [--repeat 5]
+"""
+import argparse
+import json
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import faiss
+
+from faiss_index import build_index, exact_rerank, make_search_params
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def latency_stats(samples: Sequence[float]) -> Dict[str, float]:
+    """Summarize per-call latencies given in seconds"""
+    samples_ms = np.asarray(samples, dtype='float64') * 1000
+    return {
+        'mean_ms': float(samples_ms.mean()),
+        'p50_ms': float(np.percentile(samples_ms, 50)),
+        'p95_ms': float(np.percentile(samples_ms, 95))
+    }
+
+def print_report(title: str, rows: List[Dict[str, Any]]) -> None:
+    """Print benchmark rows as an aligned text table"""
+    print(f"\n{title}")
+    if not rows:
+        print("(no rows)")
+        return
+
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    cells = [
+        [f"{row[c]:.4f}" if isinstance(row.get(c), float) else str(row.get(c, '-')) for c in columns]
+        for row in rows
+    ]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for r in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(r, widths)))
+
+def recall_at_k(found: np.ndarray, expected: np.ndarray) -> float:
+    """Mean fraction of the expected neighbours present in the found ones"""
+    hits = [len(set(f[f >= 0]) & set(e)) / len(e) for f, e in zip(found, expected)]
+    return float(np.mean(hits))
+
+def load_flat_embeddings(faiss_file: str) -> np.ndarray:
+    """Recover the float32 embedding matrix from a flat FAISS index"""
+    index = faiss.read_index(faiss_file)
+    return index.reconstruct_n(0, index.ntotal)
+
+def sample_queries(embeddings: np.ndarray, num_queries: int, noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    """Perturbed, re-normalized corpus vectors used as stand-in query embeddings"""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(embeddings), size=min(num_queries, len(embeddings)), replace=False)
+    queries = embeddings[rows] + rng.normal(0, noise, size=(len(rows), embeddings.shape[1]))
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries.astype('float32')
+
+def time_queries(search: Callable[[np.ndarray], np.ndarray], queries: np.ndarray):
+    """Run one search per query row, returning (ids, latencies)"""
+    found, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        found.append(search(query[None, :]))
+        latencies.append(time.perf_counter() - start)
+    return np.vstack(found), latencies
+
+# 'rerank' over-fetches that many times k and re-ranks by exact similarity,
+# as SemanticSearch does for compressed indexes
+INDEX_CONFIGS = [
+    ('ivf_flat', {}, [{'nprobe': n} for n in (1, 4, 8, 16, 32)]),
+    ('ivf_pq', {}, [{'nprobe': n} for n in (1, 4, 8, 16, 32)] + [{'nprobe': 16, 'rerank': 4}]),
+    ('hnsw', {}, [{'ef_search': e} for e in (16, 32, 64, 128)]),
+    ('sq_fp16', {}, [{}]),
+    ('pq', {}, [{}, {'rerank': 4}, {'rerank': 10}]),
+    ('opq_pq', {}, [{}, {'rerank': 4}, {'rerank': 10}])
+]
+
+def index_size_mb(index: faiss.Index) -> float:
+    """Serialized size of an index, a close proxy for its resident memory"""
+    return faiss.serialize_index(index).nbytes / 2**20
+
+def index_recall_report(
+    embeddings: np.ndarray,
+    queries: np.ndarray,
+    k: int = 10,
+    configs: Optional[List] = None
+) -> List[Dict[str, Any]]:
+    """
+    Recall@k, size and single-query latency of each index type against the flat baseline
+
+    Args:
+        embeddings: Corpus embedding matrix
+        queries: Query embedding matrix
+        k: Neighbours retrieved per query
+        configs: (index_type, build_params, search_param_sweep) tuples
+
+    Returns:
+        One report row per index type and search parameter setting
+    """
+    flat, _ = build_index(embeddings, 'flat')
+    expected, flat_latencies = time_queries(lambda q: flat.search(q, k)[1][0], queries)
+    rows = [{
+        'index': 'flat', 'params': '-', 'build_s': 0.0, 'size_mb': index_size_mb(flat),
+        f'recall@{k}': 1.0, **latency_stats(flat_latencies)
+    }]
+
+    for index_type, build_params, sweep in configs or INDEX_CONFIGS:
+        start = time.perf_counter()
+        index, recorded = build_index(embeddings, index_type, **build_params)
+        build_seconds = time.perf_counter() - start
+
+        for search_params in sweep:
+            rerank = search_params.get('rerank', 1)
+            params = make_search_params(index_type, **{n: v for n, v in search_params.items() if n != 'rerank'})
+            if rerank > 1:
+                def search(q):
+                    return exact_rerank(embeddings, q, index.search(q, k * rerank, params=params)[1], k)[1][0]
+            else:
+                def search(q):
+                    return index.search(q, k, params=params)[1][0]
+
+            found, latencies = time_queries(search, queries)
+            rows.append({
+                'index': index_type,
+                'params': ','.join(f"{name}={value}" for name, value in {**recorded, **search_params}.items()) or '-',
+                'build_s': build_seconds,
+                'size_mb': index_size_mb(index),
+                f'recall@{k}': recall_at_k(found, expected),
+                **latency_stats(latencies)
+            })
+
+    return rows
+
+def known_item_queries(keys: List, num_queries: int, seed: int = 0):
+    """
+    Queries built from key paths, each with its own key as the relevant item
+
+    The bank segment and the last two path segments of a key such as
+    bank_bank_0.nabil_bank_limited.deposit_products[3].bachat_khata.interest_rate
+    become "nabil bank limited bachat khata interest rate".
+
+    Returns:
+        Tuple of (queries, relevant document id sets)
+    """
+    rng = np.random.default_rng(seed)
+    queries, relevant = [], []
+    for doc_id in rng.choice(len(keys), size=min(num_queries, len(keys)), replace=False):
+        segments = [re.sub(r'\[\d+\]', '', segment) for segment in keys[doc_id][0].split('.')]
+        queries.append(' '.join(segments[1:2] + segments[-2:]).replace('_', ' '))
+        relevant.append({int(doc_id)})
+    return queries, relevant
+
+def hybrid_report(search, queries: List[str], relevant: List[set], k: int = 10) -> List[Dict[str, Any]]:
+    """
+    Recall@k and per-stage latency of each retrieval stage and fusion mode
+
+    Args:
+        search: Loaded SemanticSearch
+        queries: Query strings
+        relevant: Relevant document ids for each query
+        k: Results kept per query
+
+    Returns:
+        One report row per stage or fusion mode
+    """
+    content_ids = {content: doc_id for doc_id, (content, _) in enumerate(search.keys)}
+    previous = (search.fusion, search.semantic_weight, search.keyword_weight)
+    rows = []
+
+    def add_row(name: str, found: List[set], stage_stats: List[Dict[str, float]]):
+        row = {
+            'stage': name,
+            f'recall@{k}': float(np.mean([len(f & r) / len(r) for f, r in zip(found, relevant)]))
+        }
+        for stage in sorted({stage for stats in stage_stats for stage in stats}):
+            row[stage] = float(np.mean([stats.get(stage, 0.0) for stats in stage_stats]))
+        rows.append(row)
+
+    found, stage_stats = [], []
+    for query in queries:
+        start = time.perf_counter()
+        doc_ids, _ = search.ranker.retrieve(search.clean_text(query), k)
+        stage_stats.append({'lexical_ms': (time.perf_counter() - start) * 1000})
+        found.append(set(doc_ids.tolist()))
+    add_row('lexical', found, stage_stats)
+
+    modes = [
+        ('dense', 'linear', 1.0, 0.0),
+        ('linear', 'linear', previous[1], previous[2]),
+        ('rrf', 'rrf', previous[1], previous[2]),
+        ('weighted', 'weighted', previous[1], previous[2])
+    ]
+    try:
+        for name, fusion, semantic_weight, keyword_weight in modes:
+            search.fusion, search.semantic_weight, search.keyword_weight = fusion, semantic_weight, keyword_weight
+            found, stage_stats = [], []
+            for query in queries:
+                results, stats = search.search_with_stats(query, top_k=k, threshold=1e-9)
+                found.append({content_ids[result.content] for result in results})
+                stage_stats.append(stats)
+            add_row(name, found, stage_stats)
+    finally:
+        search.fusion, search.semantic_weight, search.keyword_weight = previous
+
+    return rows
+
+def concurrency_report(search, queries: List[str], thread_counts: Sequence[int] = (1, 2, 4, 8)) -> List[Dict[str, Any]]:
+    """
+    Search throughput with the same queries spread over a growing number of threads
+
+    Args:
+        search: Loaded SemanticSearch, ideally with its caches disabled
+        queries: Query strings
+        thread_counts: Thread pool sizes to measure
+
+    Returns:
+        One report row per thread count
+    """
+    def timed_search(query: str) -> float:
+        start = time.perf_counter()
+        search.search(query)
+        return time.perf_counter() - start
+
+    # Untimed pass so lazy initialization does not count against one thread count
+    search.search(queries[0])
+
+    rows = []
+    for threads in thread_counts:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            latencies = list(executor.map(timed_search, queries))
+        qps = len(queries) / (time.perf_counter() - start)
+
+        rows.append({
+            'threads': threads,
+            'qps': qps,
+            'speedup': qps / rows[0]['qps'] if rows else 1.0,
+            **latency_stats(latencies)
+        })
+
+    return rows
+
+def encoder_report(
+    model_name: str,
+    texts: List[str],
+    queries: List[str],
+    backends: Sequence[str],
+    k: int = 10
+) -> List[Dict[str, Any]]:
+    """
+    Parity with the fp32 torch encoder and speed of each encoder backend
+
+    Args:
+        model_name: Sentence transformer model
+        texts: Corpus texts encoded in batches
+        queries: Query strings encoded one at a time
+        backends: encoder_backends.BACKENDS to compare
+        k: Neighbours compared for the recall column
+
+    Returns:
+        One report row per backend
+    """
+    from encoder_backends import load_encoder
+
+    def normalized(embeddings: np.ndarray) -> np.ndarray:
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    reference_encoder = load_encoder(model_name, 'torch')
+    reference = normalized(reference_encoder.encode(texts, batch_size=32, show_progress_bar=False))
+    reference_queries = normalized(reference_encoder.encode(queries, batch_size=32, show_progress_bar=False))
+    expected = np.argsort(-reference_queries @ reference.T, axis=1)[:, :k]
+
+    rows = []
+    for backend in backends:
+        start = time.perf_counter()
+        encoder = load_encoder(model_name, backend)
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        embeddings = normalized(encoder.encode(texts, batch_size=32, show_progress_bar=False))
+        throughput = len(texts) / (time.perf_counter() - start)
+
+        latencies, query_embeddings = [], []
+        for query in queries:
+            start = time.perf_counter()
+            query_embeddings.append(encoder.encode([query], show_progress_bar=False)[0])
+            latencies.append(time.perf_counter() - start)
+        found = np.argsort(-normalized(np.vstack(query_embeddings)) @ embeddings.T, axis=1)[:, :k]
+
+        cosine = (embeddings * reference).sum(axis=1)
+        rows.append({
+            'backend': backend,
+            'load_s': load_seconds,
+            'texts_per_s': throughput,
+            'mean_cos': float(cosine.mean()),
+            'min_cos': float(cosine.min()),
+            f'recall@{k}': recall_at_k(found, expected),
+            **latency_stats(latencies)
+        })
+
+    return rows
+
+def recursive_flatten(obj: Any, parent_key: str, flattened: Dict[str, str], sep: str = '.') -> None:
+    """The recursive flatten_dict/flatten_list pair JSONFlattener used before, as a baseline"""
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            new_key = f"{parent_key}{sep}{key}" if parent_key else key
+            if isinstance(value, (dict, list)):
+                recursive_flatten(value, new_key, flattened, sep)
+            else:
+                flattened[new_key] = str(value)
+    else:
+        for i, item in enumerate(obj):
+            new_key = f"{parent_key}[{i}]"
+            if isinstance(item, (dict, list)):
+                recursive_flatten(item, new_key, flattened, sep)
+            else:
+                flattened[new_key] = str(item)
+
+def flatten_report(banks: List[Any], repeat: int = 5) -> List[Dict[str, Any]]:
+    """
+    Time the recursive baseline against JSONFlattener over the same banks
+
+    Raises:
+        AssertionError: If the flatteners disagree on any key, value or order
+    """
+    from preprocess import JSONFlattener
+
+    def run_recursive() -> Dict[str, str]:
+        flattened = {}
+        for i, bank in enumerate(banks):
+            recursive_flatten(bank, f"bank_{i}", flattened)
+        return flattened
+
+    def run_iterative() -> Dict[str, str]:
+        flattener = JSONFlattener(tokenizer=None)
+        for i, bank in enumerate(banks):
+            flattener.flatten_dict(bank, f"bank_{i}")
+        return flattener.flattened_data
+
+    expected = run_recursive()
+    assert list(run_iterative().items()) == list(expected.items()), "flatteners disagree"
+
+    rows = []
+    for name, run in (('recursive', run_recursive), ('iterative', run_iterative)):
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            latencies.append(time.perf_counter() - start)
+        rows.append({
+            'flattener': name,
+            'entries': len(expected),
+            'entries_per_s': len(expected) / float(np.median(latencies)),
+            **latency_stats(latencies)
+        })
+
+    return rows
+
+def load_search(**kwargs):
+    """SemanticSearch over the index built by embeddings.py"""
+    from search import SemanticSearch
+
+    search = SemanticSearch(**kwargs)
+    search.load_index_and_keys(
+        faiss_file='embeddings/vector_database.faiss',
+        key_file='embeddings/key_mapping.json',
+        meta_file='embeddings/index_meta.json'
+    )
+    return search
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval pipeline benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    index_parser = subparsers.add_parser('index', help="ANN recall vs latency against the flat index")
+    index_parser.add_argument('--faiss-file', default='embeddings/vector_database.faiss')
+    index_parser.add_argument('--k', type=int, default=10)
+    index_parser.add_argument('--queries', type=int, default=200)
+
+    hybrid_parser = subparsers.add_parser('hybrid', help="Recall and latency per retrieval stage")
+    hybrid_parser.add_argument('--k', type=int, default=10)
+    hybrid_parser.add_argument('--queries', type=int, default=200)
+    hybrid_parser.add_argument('--model', default='all-mpnet-base-v2')
+
+    concurrency_parser = subparsers.add_parser('concurrency', help="Search throughput by thread count")
+    concurrency_parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    concurrency_parser.add_argument('--queries', type=int, default=200)
+    concurrency_parser.add_argument('--model', default='all-mpnet-base-v2')
+    concurrency_parser.add_argument('--torch-threads', type=int, default=None,
+                                    help="Intra-op threads per forward pass")
+
+    encoder_parser = subparsers.add_parser('encoder', help="Encoder backend parity and latency")
+    encoder_parser.add_argument('--backends', nargs='+', default=['torch', 'int8', 'onnx', 'onnx_int8'])
+    encoder_parser.add_argument('--texts', type=int, default=1000, help="Corpus texts compared")
+    encoder_parser.add_argument('--queries', type=int, default=100)
+    encoder_parser.add_argument('--k', type=int, default=10)
+    encoder_parser.add_argument('--model', default='all-mpnet-base-v2')
+    encoder_parser.add_argument('--key-file', default='embeddings/key_mapping.json')
+
+    flatten_parser = subparsers.add_parser('flatten', help="Recursive vs iterative JSON flattening")
+    flatten_parser.add_argument('--input', default='data/banks.json')
+    flatten_parser.add_argument('--repeat', type=int, default=5)
+
+    args = parser.parse_args()
+
+    if args.benchmark == 'index':
+        embeddings = load_flat_embeddings(args.faiss_file)
+        queries = sample_queries(embeddings, args.queries)
+        print_report(
+            f"Recall@{args.k} vs latency over {len(embeddings)} vectors, {len(queries)} queries",
+            index_recall_report(embeddings, queries, k=args.k)
+        )
+
+    elif args.benchmark == 'hybrid':
+        search = load_search(model_name=args.model)
+        queries, relevant = known_item_queries(search.keys, args.queries)
+        print_report(
+            f"Per-stage recall@{args.k} and mean latency (ms) over {len(queries)} known-item queries",
+            hybrid_report(search, queries, relevant, k=args.k)
+        )
+
+    elif args.benchmark == 'concurrency':
+        if args.torch_threads:
+            import torch
+            torch.set_num_threads(args.torch_threads)
+
+        # Caches off so every query pays for encoding, FAISS and rescoring
+        search = load_search(model_name=args.model, embedding_cache_size=0, result_cache_size=0)
+        queries, _ = known_item_queries(search.keys, args.queries)
+        print_report(
+            f"Search throughput over {len(queries)} queries",
+            concurrency_report(search, queries, args.threads)
+        )
+
+    elif args.benchmark == 'encoder':
+        with open(args.key_file, 'r', encoding='utf-8') as file:
+            keys = json.load(file)
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(keys), size=min(args.texts, len(keys)), replace=False)
+        # Same text layout as EmbeddingGenerator.prepare_texts
+        texts = [f"{keys[i][0]}: {keys[i][1]}" for i in sample]
+        queries, _ = known_item_queries(keys, args.queries)
+        print_report(
+            f"Encoder backends vs fp32 torch over {len(texts)} corpus texts, {len(queries)} single queries",
+            encoder_report(args.model, texts, queries, args.backends, k=args.k)
+        )
+
+    elif args.benchmark == 'flatten':
+        with open(args.input, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        banks = [bank for bank in (data['banks'] if isinstance(data, dict) else data) if isinstance(bank, dict)]
+        print_report(
+            f"Flattening {len(banks)} banks from {args.input}, median of {args.repeat} runs",
+            flatten_report(banks, args.repeat)
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """Thread-safe LRU cache with an optional time-to-live per entry"""
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        """
+        Args:
+            maxsize: Maximum number of entries, least recently used evicted first
+            ttl: Seconds an entry stays valid, None for no expiry
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Whether entries were stored since the last save
+        self.dirty = False
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = Lock()
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, counting a hit or a miss"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and not self._expired(entry[0], time.time()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries when full"""
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            self.dirty = True
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._data),
+                'maxsize': self.maxsize
+            }
+
+    def save(self, path: str) -> int:
+        """
+        Spill unexpired entries to disk, replacing the file atomically
+
+        Nothing is written unless entries were stored since the last save,
+        so processes that only read the cache leave the file alone.
+
+        Keys must be strings and values numpy arrays of one shape, as in
+        the query embedding cache. The file is an .npz of the vectors with
+        the keys as a JSON list, so loading it never unpickles anything.
+        Entries another process saved to the same path since are merged
+        in, the most recently stored winning, so concurrent one-shot
+        processes do not drop each other's additions.
+
+        Returns:
+            Number of entries written
+        """
+        now = time.time()
+        with self._lock:
+            if not self.dirty:
+                return 0
+            self.dirty = False
+            entries = {
+                key: (stored_at, value)
+                for key, (stored_at, value) in self._data.items()
+                if not self._expired(stored_at, now)
+            }
+
+        for key, stored_at, value in self._read_entries(path):
+            if not self._expired(stored_at, now) and stored_at > entries.get(key, (-1.0, None))[0]:
+                entries[key] = (stored_at, value)
+
+        # Most recent last, trimmed to what a cache of this size would hold
+        ordered = sorted(entries.items(), key=lambda item: item[1][0])
+        if self.maxsize > 0:
+            ordered = ordered[-self.maxsize:]
+        try:
+            if any(not isinstance(key, str) for key, _ in ordered):
+                raise TypeError("Only caches with string keys can be saved")
+
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            # A temp file of its own, so processes saving concurrently never
+            # write into each other's file before the rename
+            with tempfile.NamedTemporaryFile(
+                dir=directory or '.', prefix=f"{os.path.basename(path)}.", suffix='.tmp', delete=False
+            ) as file:
+                tmp_path = file.name
+                try:
+                    np.savez(
+                        file,
+                        keys=np.array(json.dumps([key for key, _ in ordered])),
+                        stored_at=np.array([stored_at for _, (stored_at, _) in ordered], dtype=np.float64),
+                        values=np.stack([np.asarray(value) for _, (_, value) in ordered]) if ordered
+                        else np.zeros((0, 0), dtype=np.float32)
+                    )
+                except Exception:
+                    file.close()
+                    os.remove(tmp_path)
+                    raise
+            os.replace(tmp_path, path)
+        except Exception:
+            # Unsaved entries are still worth saving next time
+            self.dirty = True
+            raise
+
+        logger.info(f"Saved {len(ordered)} cache entries to {path}")
+        return len(ordered)
+
+    @staticmethod
+    def _read_entries(path: str) -> List[Tuple[str, float, np.ndarray]]:
+        """(key, stored_at, value) triples of a file written by save(), oldest first"""
+        if not os.path.exists(path):
+            return []
+
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                keys = json.loads(str(data['keys']))
+                stored_at = data['stored_at'].tolist()
+                values = data['values']
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache file {path}: {str(e)}")
+            return []
+
+        # Cached arrays are shared between callers
+        values.setflags(write=False)
+        return list(zip(keys, stored_at, values))
+
+    def load(self, path: str) -> int:
+        """
+        Restore entries spilled by save(), skipping expired ones
+
+        Returns:
+            Number of entries loaded
+        """
+        entries = self._read_entries(path)
+        if not entries:
+            return 0
+
+        now = time.time()
+        with self._lock:
+            for key, stored_at, value in entries[-self.maxsize:] if self.maxsize > 0 else []:
+                if not self._expired(stored_at, now):
+                    self._data[key] = (stored_at, value)
+            loaded = len(self._data)
+
+        logger.info(f"Loaded {loaded} cache entries from {path}")
+        return loaded
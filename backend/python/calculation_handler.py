@@ -262,9 +262,12 @@ def generate_calculation_response(calculation_data, query):
         return f"Calculation completed with {calc_type}. Please check the detailed results."
 
 
-def extract_calculation_parameters(query):
+def extract_calculation_parameters(query, context_results=()):
     """
     Extract calculation parameters from the query.
+
+    Rates not stated in the query are taken from context_results, the
+    search results retrieved for this same query.
     """
     # Regular expression patterns to match principal, time, and other terms
     principal_pattern = r"(\d{4,})\s*(rupees|rs|inr)?\s*(principal)?"
@@ -305,9 +308,8 @@ def extract_calculation_parameters(query):
         rate_min = rate
         rate_max = rate
     else:
-        # Fetch rates from calculation context
-        from calculation import extract_interest_rates, parsed_data
-        rank_1_entry = next((item for item in parsed_data if item["rank"] == 1), None)
+        # Fetch rates from the search results of this query
+        rank_1_entry = next((item for item in context_results if item["rank"] == 1), None)
         if rank_1_entry:
             interest_rates = extract_interest_rates(rank_1_entry["source"])
             if interest_rates:
@@ -376,15 +378,22 @@ def extract_interest_rates(source):
         return [float(rate.strip('%')) for rate in rates if rate]
     return []
 
-def handle_calculation_query(query):
-    """Handle calculation query and return results."""
+def handle_calculation_query(query, context_results=()):
+    """
+    Handle calculation query and return results.
+
+    Args:
+        query: Resolved user query
+        context_results: Search results of the query as dicts with content,
+            source and rank; the rank 1 entry supplies rates the query omits
+    """
     try:
         # Extract parameters from the query for calculation
         (principal, rate_min, rate_max, time, compounding,
          should_calculate_emi,
          should_calculate_simple_interest,
          should_calculate_compound_interest,
-         should_calculate_amortization_schedule) = extract_calculation_parameters(query)
+         should_calculate_amortization_schedule) = extract_calculation_parameters(query, context_results)
 
         # Prepare calculation data
         calculation_data = {
@@ -504,10 +513,9 @@ def handle_calculation_query(query):
         # Generate human-readable response
         calculation_data['human_response'] = generate_calculation_response(calculation_data, query)
 
-        # Save calculation data
-        with open("calculation_data.json", "w", encoding="utf-8") as file:
-            json.dump(calculation_data, file, indent=4)
-            logger.info("Calculation data saved to calculation_data.json")
+        # Logged rather than written to a shared file, which concurrent
+        # requests of a warm worker would overwrite
+        logger.info(f"Calculation data: {json.dumps(calculation_data)}")
 
         return calculation_data
 
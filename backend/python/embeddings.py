@@ -1,16 +1,19 @@
 import simplejson as json
+import hashlib
 import numpy as np
 import torch
 import logging
+import multiprocessing
 import os
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
+from model_registry import get_encoder, get_transformer
 
 # Attempt safe import
 try:
     from sentence_transformers import SentenceTransformer
 except ImportError:
     print("Could not import SentenceTransformer. Attempting alternative import.")
-    from transformers import AutoModel, AutoTokenizer
+    SentenceTransformer = None
 
 # Configure logging
 logging.basicConfig(
@@ -27,7 +30,14 @@ class EmbeddingGenerator:
     def __init__(
         self, 
         model_name: str = 'all-mpnet-base-v2',  # Changed to the specified model
-        batch_size: int = 32
+        batch_size: int = 32,
+        num_workers: int = 1,
+        torch_threads: Optional[int] = None,
+        shard_size: int = 2048,
+        shard_dir: str = 'embeddings/shards',
+        max_seq_length: int = 384,
+        max_batch_tokens: int = 8192,
+        backend: str = 'torch'
     ):
         """
         Initialize the embedding generator with robust error handling
@@ -35,35 +45,57 @@ class EmbeddingGenerator:
         Args:
             model_name: Name of the sentence transformer model
             batch_size: Size of batches for processing
+            num_workers: Encoding processes, more than 1 enables generate_embeddings_parallel
+            torch_threads: Intra-op threads per worker, cpu_count // num_workers by default
+            shard_size: Texts per shard in parallel mode
+            shard_dir: Where parallel mode keeps finished shards until all are done
+            max_seq_length: Token limit per text in the transformers fallback
+            max_batch_tokens: Padded tokens per batch in the transformers fallback
+            backend: Sentence encoder backend, one of encoder_backends.BACKENDS
         """
         try:
             # Determine device
             self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
             logger.info(f"Using device: {self.device}")
 
-            # Try SentenceTransformer first
-            try:
-                self.model = SentenceTransformer(model_name, device=self.device)
-                self.use_sentence_transformer = True
-                
-                # Log model details
-                logger.info(f"Loaded SentenceTransformer: {model_name}")
-                logger.info(f"Embedding dimension: {self.model.get_sentence_embedding_dimension()}")
-            except ImportError:
-                # Fallback to manual embedding generation
-                logger.warning("Falling back to manual embedding generation")
-                self.model = AutoModel.from_pretrained(model_name)
-                self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-                self.model.to(self.device)
-                self.use_sentence_transformer = False
+            # SentenceTransformer first, falling back to manual embedding generation;
+            # either model is loaded from the model registry on first use
+            self.use_sentence_transformer = SentenceTransformer is not None
+            if not self.use_sentence_transformer:
+                logger.warning("Falling back to manual embedding generation: sentence_transformers is not installed")
 
+            self.model_name = model_name
+            self.backend = backend
             self.batch_size = batch_size
+            self.num_workers = num_workers
+            self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // num_workers)
+            self.shard_size = shard_size
+            self.shard_dir = shard_dir
+            self.max_seq_length = max_seq_length
+            self.max_batch_tokens = max_batch_tokens
             logger.info("Model initialized successfully")
         
         except Exception as e:
             logger.error(f"Error initializing embedding model: {str(e)}")
             raise
 
+    @property
+    def model(self):
+        """Sentence encoder, or the transformers model of the manual fallback"""
+        if self.use_sentence_transformer:
+            return get_encoder(self.model_name, self.backend, self.device)
+        return get_transformer(self.model_name, self.device)[0]
+
+    @property
+    def encoder_id(self) -> str:
+        """Backend producing the vectors, keying caches and shards along with the model"""
+        return self.backend if self.use_sentence_transformer else 'transformers'
+
+    @property
+    def tokenizer(self):
+        """Tokenizer of the manual fallback"""
+        return get_transformer(self.model_name, self.device)[1]
+
     def prepare_texts(self, flattened_data: Dict[str, Any]) -> Tuple[List[str], List[Tuple[str, str]]]:
         """
         Prepare texts and keys from flattened data with robust handling
@@ -107,6 +139,10 @@ class EmbeddingGenerator:
             numpy array of embeddings
         """
         try:
+            # Spread large corpora over worker processes
+            if self.num_workers > 1 and self.use_sentence_transformer and len(texts) > self.shard_size:
+                return self.generate_embeddings_parallel(texts, show_progress=show_progress)
+
             # Use SentenceTransformer method if available
             if self.use_sentence_transformer:
                 embeddings = self.model.encode(
@@ -117,27 +153,7 @@ class EmbeddingGenerator:
                 )
             else:
                 # Manual embedding generation
-                embeddings = []
-                for i in range(0, len(texts), self.batch_size):
-                    batch = texts[i:i+self.batch_size]
-                    
-                    # Tokenize batch
-                    batch_encoded = self.tokenizer(
-                        batch, 
-                        padding=True, 
-                        truncation=True, 
-                        return_tensors='pt'
-                    ).to(self.device)
-                    
-                    # Generate embeddings
-                    with torch.no_grad():
-                        model_output = self.model(**batch_encoded)
-                        batch_embeddings = model_output.last_hidden_state.mean(dim=1)
-                    
-                    embeddings.append(batch_embeddings.cpu().numpy())
-                
-                # Concatenate embeddings
-                embeddings = np.vstack(embeddings)
+                embeddings = self._generate_embeddings_manual(texts)
             
             logger.info(f"Generated embeddings of shape: {embeddings.shape}")
             return embeddings
@@ -146,43 +162,429 @@ class EmbeddingGenerator:
             logger.error(f"Error generating embeddings: {str(e)}")
             raise
 
+    def _token_budget_batches(self, lengths: List[int]) -> List[List[int]]:
+        """
+        Group text indices into batches of similar length
+
+        Texts are taken longest first and a batch is closed once its padded
+        size (count x longest length) would exceed max_batch_tokens, so
+        short texts share large batches and long ones small batches.
+        """
+        batches, batch, longest = [], [], 0
+        for i in sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True):
+            longest = max(longest, lengths[i])
+            if batch and longest * (len(batch) + 1) > self.max_batch_tokens:
+                batches.append(batch)
+                batch, longest = [], lengths[i]
+            batch.append(i)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _generate_embeddings_manual(self, texts: List[str]) -> np.ndarray:
+        """Encode with the transformers model, mean pooling over non-padding tokens"""
+        max_length = min(
+            self.max_seq_length,
+            self.tokenizer.model_max_length,
+            getattr(self.model.config, 'max_position_embeddings', self.max_seq_length)
+        )
+        encoded = self.tokenizer(texts, truncation=True, max_length=max_length)
+        batches = self._token_budget_batches([len(ids) for ids in encoded['input_ids']])
+
+        embeddings = None
+        for batch in batches:
+            batch_encoded = self.tokenizer.pad(
+                [{name: encoded[name][i] for name in encoded.keys()} for i in batch],
+                padding=True,
+                return_tensors='pt'
+            ).to(self.device)
+
+            with torch.no_grad():
+                model_output = self.model(**batch_encoded)
+
+            # Padding positions must not dilute the average
+            mask = batch_encoded['attention_mask'].unsqueeze(-1).to(model_output.last_hidden_state.dtype)
+            summed = (model_output.last_hidden_state * mask).sum(dim=1)
+            batch_embeddings = summed / mask.sum(dim=1).clamp(min=1e-9)
+            # Unit length, matching the Normalize layer of the sentence-transformers model
+            batch_embeddings = torch.nn.functional.normalize(batch_embeddings, p=2, dim=1)
+
+            if embeddings is None:
+                embeddings = np.empty((len(texts), batch_embeddings.shape[1]), dtype='float32')
+            embeddings[batch] = batch_embeddings.cpu().numpy()
+
+        if embeddings is None:
+            embeddings = np.empty((0, self.model.config.hidden_size), dtype='float32')
+        return embeddings
+
+    def generate_embeddings_parallel(self, texts: List[str], show_progress: bool = True) -> np.ndarray:
+        """
+        Generate embeddings in num_workers processes, resuming an interrupted run
+
+        Texts are sorted by length and cut into shards of similar lengths,
+        so batches carry little padding. Each finished shard is saved to
+        shard_dir; a rerun over the same texts only encodes missing shards.
+
+        Args:
+            texts: List of texts to embed
+            show_progress: Whether to show progress bar
+
+        Returns:
+            numpy array of embeddings aligned with texts
+        """
+        try:
+            order = np.argsort([len(text) for text in texts], kind='stable')
+            shards = [order[start:start + self.shard_size] for start in range(0, len(order), self.shard_size)]
+            shard_files = [os.path.join(self.shard_dir, f"shard_{i:05d}.npy") for i in range(len(shards))]
+
+            self._prepare_shard_dir(texts)
+            pending = [
+                (shard_file, [texts[i] for i in shard])
+                for shard_file, shard in zip(shard_files, shards)
+                if not os.path.exists(shard_file)
+            ]
+            logger.info(
+                f"Encoding {len(pending)} of {len(shards)} shards with {self.num_workers} workers, "
+                f"{self.torch_threads} torch threads each"
+            )
+
+            if pending:
+                # spawn rather than fork: forked children inherit torch's thread pools
+                context = multiprocessing.get_context('spawn')
+                with context.Pool(
+                    processes=min(self.num_workers, len(pending)),
+                    initializer=_init_encode_worker,
+                    initargs=(self.model_name, self.torch_threads, self.backend)
+                ) as pool:
+                    done = pool.imap_unordered(
+                        _encode_shard,
+                        [(shard_file, shard_texts, self.batch_size) for shard_file, shard_texts in pending]
+                    )
+                    if show_progress:
+                        from tqdm import tqdm
+                        done = tqdm(done, total=len(pending), desc="Shards")
+                    for shard_file in done:
+                        logger.debug(f"Finished {shard_file}")
+
+            embeddings = None
+            for shard_file, shard in zip(shard_files, shards):
+                shard_embeddings = np.load(shard_file)
+                if embeddings is None:
+                    embeddings = np.empty((len(texts), shard_embeddings.shape[1]), dtype=shard_embeddings.dtype)
+                embeddings[shard] = shard_embeddings
+
+            self._clear_shard_dir()
+            logger.info(f"Generated embeddings of shape: {embeddings.shape}")
+            return embeddings
+
+        except Exception as e:
+            logger.error(f"Error generating embeddings in parallel: {str(e)}")
+            raise
+
+    def _prepare_shard_dir(self, texts: List[str]):
+        """Keep shards from an interrupted run over the same texts, discard anything else"""
+        digest = hashlib.sha1()
+        for text in texts:
+            digest.update(text_hash(text).encode('ascii'))
+        manifest = {
+            'model_name': self.model_name,
+            'backend': self.encoder_id,
+            'shard_size': self.shard_size,
+            'num_texts': len(texts),
+            'texts_hash': digest.hexdigest()
+        }
+
+        manifest_file = os.path.join(self.shard_dir, 'manifest.json')
+        if os.path.exists(manifest_file):
+            with open(manifest_file, 'r', encoding='utf-8') as file:
+                if json.load(file) == manifest:
+                    logger.info(f"Resuming from shards in {self.shard_dir}")
+                    return
+            self._clear_shard_dir()
+
+        os.makedirs(self.shard_dir, exist_ok=True)
+        with open(manifest_file, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file)
+
+    def _clear_shard_dir(self):
+        if not os.path.isdir(self.shard_dir):
+            return
+        for name in os.listdir(self.shard_dir):
+            if name.startswith('shard_') or name == 'manifest.json':
+                os.remove(os.path.join(self.shard_dir, name))
+
+    def generate_embeddings_incremental(
+        self,
+        texts: List[str],
+        cache_file: str = 'embeddings/embedding_cache.npz',
+        show_progress: bool = True
+    ) -> np.ndarray:
+        """
+        Generate embeddings, re-encoding only texts missing from the cache file
+
+        Vectors are keyed by a hash of the exact text, so an entry whose key
+        or value changed is encoded again, and the cache is rewritten with
+        the current texts only, dropping deleted entries.
+
+        Args:
+            texts: List of texts to embed
+            cache_file: Path of the text hash -> vector cache
+            show_progress: Whether to show progress bar
+
+        Returns:
+            numpy array of embeddings aligned with texts
+        """
+        try:
+            hashes = [text_hash(text) for text in texts]
+            cached = load_embedding_cache(cache_file, self.model_name, self.encoder_id)
+
+            # Encode each new text once, even if it appears several times
+            missing = {}
+            for text, digest in zip(texts, hashes):
+                if digest not in cached and digest not in missing:
+                    missing[digest] = text
+
+            if missing:
+                encoded = self.generate_embeddings(list(missing.values()), show_progress=show_progress)
+                cached.update(zip(missing.keys(), np.asarray(encoded, dtype='float32')))
+
+            embeddings = np.vstack([cached[digest] for digest in hashes]).astype('float32') if texts else \
+                np.empty((0, 0), dtype='float32')
+            logger.info(f"Reused {len(texts) - len(missing)} cached embeddings, encoded {len(missing)}")
+
+            save_embedding_cache(cache_file, self.model_name, hashes, embeddings, self.encoder_id)
+            return embeddings
+
+        except Exception as e:
+            logger.error(f"Error generating incremental embeddings: {str(e)}")
+            raise
+
+_worker_model = None
+
+def _init_encode_worker(model_name: str, torch_threads: int, backend: str = 'torch'):
+    """Load the model once per worker process"""
+    from encoder_backends import load_encoder
+
+    global _worker_model
+    torch.set_num_threads(torch_threads)
+    _worker_model = load_encoder(model_name, backend=backend, device='cpu', num_threads=torch_threads)
+
+def _encode_shard(task: Tuple[str, List[str], int]) -> str:
+    """Encode one shard and save it, returning the shard file"""
+    shard_file, texts, batch_size = task
+    embeddings = _worker_model.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True)
+
+    # Write then rename, so a killed worker never leaves a truncated shard behind
+    with open(f"{shard_file}.tmp", 'wb') as file:
+        np.save(file, embeddings)
+    os.replace(f"{shard_file}.tmp", shard_file)
+    return shard_file
+
+def text_hash(text: str) -> str:
+    """Stable content hash of an embedding input"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def load_embedding_cache(cache_file: str, model_name: str, backend: str = 'torch') -> Dict[str, np.ndarray]:
+    """
+    Load text hash -> vector pairs written by save_embedding_cache
+
+    Returns an empty cache when the file is missing, unreadable or was
+    written by a different model or encoder backend; quantized and full
+    precision vectors must not end up in one index.
+    """
+    if not os.path.exists(cache_file):
+        return {}
+
+    try:
+        with np.load(cache_file, allow_pickle=False) as data:
+            if str(data['model_name']) != model_name:
+                logger.info(f"Ignoring {cache_file}, built with model {data['model_name']}")
+                return {}
+            cached_backend = str(data['backend'])
+            if cached_backend != backend:
+                logger.info(f"Ignoring {cache_file}, built with the {cached_backend} backend")
+                return {}
+            return dict(zip(data['hashes'].tolist(), data['vectors']))
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable embedding cache {cache_file}: {str(e)}")
+        return {}
+
+def save_embedding_cache(
+    cache_file: str,
+    model_name: str,
+    hashes: List[str],
+    embeddings: np.ndarray,
+    backend: str = 'torch'
+) -> None:
+    """Write text hashes and their vectors, replacing the file atomically"""
+    directory = os.path.dirname(cache_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Duplicate texts share a hash, keep the first row for each
+    first_rows: Dict[str, int] = {}
+    for row, digest in enumerate(hashes):
+        first_rows.setdefault(digest, row)
+
+    # np.savez appends .npz to names without it, so write through a file object
+    with open(f"{cache_file}.tmp", 'wb') as file:
+        np.savez(
+            file,
+            model_name=np.array(model_name),
+            backend=np.array(backend),
+            hashes=np.array(list(first_rows), dtype='U40'),
+            vectors=np.asarray(embeddings, dtype='float32')[list(first_rows.values())]
+        )
+    os.replace(f"{cache_file}.tmp", cache_file)
+    logger.info(f"Embedding cache with {len(first_rows)} entries saved to {cache_file}")
+
 def save_faiss_index(
     embeddings: np.ndarray,
     keys: List[Tuple[str, str]],
     faiss_file: str = 'embeddings/vector_database.faiss',
     key_file: str = 'embeddings/key_mapping.json',
-    create_dir: bool = True
+    meta_file: str = 'embeddings/index_meta.json',
+    key_store_file: Optional[str] = None,
+    ranker_file: Optional[str] = None,
+    vectors_file: Optional[str] = None,
+    create_dir: bool = True,
+    index_type: str = 'flat',
+    **index_params
 ) -> None:
     """
-    Save FAISS index and keys with comprehensive error handling
+    Save FAISS index, keys and index metadata with comprehensive error handling
+
+    Args:
+        embeddings: Embedding matrix aligned with keys
+        keys: (key, value) pairs for every embedding
+        faiss_file: Output path of the FAISS index
+        key_file: Output path of the key mapping
+        meta_file: Output path of the index metadata
+        key_store_file: Output path of the memory-mappable table of cleaned keys,
+            key_store.bin next to meta_file by default
+        ranker_file: Output path of the fitted keyword ranker, ranker.npz next
+            to meta_file by default
+        vectors_file: Output path of the float32 vectors kept for exact
+            re-ranking of compressed indexes, vectors.<fingerprint>.npy next
+            to meta_file by default
+        create_dir: Whether to create missing output directories
+        index_type: One of faiss_index.INDEX_TYPES
+        **index_params: Build parameters forwarded to faiss_index.build_index
     """
     try:
+        # Loaders find these through the metadata, relative to its directory
+        meta_dir = os.path.dirname(meta_file)
+        key_store_file = key_store_file or os.path.join(meta_dir, 'key_store.bin')
+        ranker_file = ranker_file or os.path.join(meta_dir, 'ranker.npz')
+
         # Create directories if needed
         if create_dir:
-            os.makedirs(os.path.dirname(faiss_file), exist_ok=True)
-            os.makedirs(os.path.dirname(key_file), exist_ok=True)
+            for path in (faiss_file, key_file, meta_file, key_store_file, ranker_file, vectors_file or meta_file):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
 
         # Create and save FAISS index
         import faiss
-        dimension = embeddings.shape[1]
-        index = faiss.IndexFlatL2(dimension)
-        index.add(np.array(embeddings))
-        faiss.write_index(index, faiss_file)
+        from faiss_index import (
+            LOSSY_INDEX_TYPES, build_index, default_search_params, index_fingerprint, write_index_meta
+        )
+        from key_store import write_key_store
+        from search import CustomRanker, clean_text
+
+        index, build_params = build_index(embeddings, index_type=index_type, **index_params)
+        # Lets searchers invalidate cached results when the index is rebuilt,
+        # and tie every file of this build to its metadata
+        fingerprint = index_fingerprint(index, keys)
+
+        # Files are replaced in dependency order: the side artifacts carrying
+        # the fingerprint first, then the index and keys, the metadata last.
+        # Loaders read in the opposite order and reject any file whose
+        # fingerprint or count disagrees with the metadata, so an interrupted
+        # save or one racing a reload never serves a mixed build.
+
+        # Keys cleaned the way searchers clean them, plus the keyword index
+        # over them, so loading needs no JSON parsing or tokenizing
+        cleaned_keys = [tuple(clean_text(str(item)) for item in key_pair) for key_pair in keys]
+        write_key_store(key_store_file, cleaned_keys, fingerprint)
+        ranker = CustomRanker()
+        ranker.fit([content for content, _ in cleaned_keys])
+        ranker.fingerprint = fingerprint
+        ranker.save(ranker_file)
+
+        # Compressed indexes only approximate distances; searchers re-rank
+        # their shortlist against these, memory-mapped so the pages are
+        # shared and only touched rows become resident. .npy has no room
+        # for the fingerprint, so it goes into the file name.
+        lossy = index_type in LOSSY_INDEX_TYPES
+        if lossy:
+            vectors_file = vectors_file or os.path.join(meta_dir, f"vectors.{fingerprint}.npy")
+            with open(f"{vectors_file}.tmp", 'wb') as file:
+                np.save(file, np.ascontiguousarray(embeddings, dtype='float32'))
+            os.replace(f"{vectors_file}.tmp", vectors_file)
+
+        # Write to temporary files and rename so watching searchers never
+        # see a half-written index
+        faiss.write_index(index, f"{faiss_file}.tmp")
 
         # Save keys
-        with open(key_file, 'w', encoding='utf-8') as file:
+        with open(f"{key_file}.tmp", 'w', encoding='utf-8') as file:
             json.dump(keys, file, ensure_ascii=False, indent=2)
 
-        logger.info(f"FAISS index saved to {faiss_file}")
+        os.replace(f"{faiss_file}.tmp", faiss_file)
+        os.replace(f"{key_file}.tmp", key_file)
+
+        # Record how the index was built so loaders can configure searches
+        write_index_meta(meta_file, {
+            'index_type': index_type,
+            'dimension': int(embeddings.shape[1]),
+            'ntotal': int(index.ntotal),
+            'build_params': build_params,
+            'search_params': default_search_params(index_type),
+            'fingerprint': fingerprint,
+            'key_store': os.path.relpath(key_store_file, meta_dir or '.'),
+            'ranker': os.path.relpath(ranker_file, meta_dir or '.'),
+            'vectors': os.path.relpath(vectors_file, meta_dir or '.') if lossy else None
+        })
+
+        _remove_stale_vectors(meta_dir, vectors_file if lossy else None)
+
+        logger.info(f"FAISS {index_type} index saved to {faiss_file}")
         logger.info(f"Keys saved to {key_file}")
         
     except Exception as e:
         logger.error(f"Error saving index and keys: {str(e)}")
         raise
 
-def regenerate_embeddings():
+def _remove_stale_vectors(directory: str, current: Optional[str]) -> None:
+    """Delete re-rank vectors of earlier builds; searchers still mapping them keep their pages"""
+    current = os.path.abspath(current) if current else None
+    for name in os.listdir(directory or '.'):
+        path = os.path.join(directory, name)
+        if name.startswith('vectors.') and name.endswith('.npy') and os.path.abspath(path) != current:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove stale vectors {path}: {str(e)}")
+
+def regenerate_embeddings(
+    index_type: str = 'flat',
+    incremental: bool = False,
+    cache_file: str = 'embeddings/embedding_cache.npz',
+    num_workers: int = 1,
+    torch_threads: Optional[int] = None,
+    backend: str = 'torch',
+    **index_params
+):
     """
     Utility function to regenerate embeddings with the new model
+
+    Args:
+        index_type: FAISS index type to build
+        incremental: Reuse vectors of unchanged entries from cache_file
+        cache_file: Text hash -> vector cache, refreshed on every run
+        num_workers: Encoding processes
+        torch_threads: Intra-op threads per encoding process
+        backend: Sentence encoder backend, one of encoder_backends.BACKENDS
+        **index_params: Build parameters forwarded to save_faiss_index
     """
     try:
         # Load flattened data
@@ -192,20 +594,34 @@ def regenerate_embeddings():
         # Initialize embedding generator with the new model
         generator = EmbeddingGenerator(
             model_name='all-mpnet-base-v2',
-            batch_size=32
+            batch_size=32,
+            num_workers=num_workers,
+            torch_threads=torch_threads,
+            backend=backend
         )
 
         # Prepare texts and keys
         texts, keys = generator.prepare_texts(flattened_data)
 
         # Generate embeddings
-        embeddings = generator.generate_embeddings(
-            texts,
-            show_progress=True
-        )
+        if incremental:
+            embeddings = generator.generate_embeddings_incremental(
+                texts,
+                cache_file=cache_file,
+                show_progress=True
+            )
+        else:
+            embeddings = generator.generate_embeddings(
+                texts,
+                show_progress=True
+            )
+            # Seed the cache so the next incremental run can reuse these vectors
+            save_embedding_cache(
+                cache_file, generator.model_name, [text_hash(t) for t in texts], embeddings, generator.encoder_id
+            )
 
         # Save FAISS index and keys
-        save_faiss_index(embeddings, keys)
+        save_faiss_index(embeddings, keys, index_type=index_type, **index_params)
         
         logger.info("Embeddings regenerated successfully")
         
@@ -214,4 +630,29 @@ def regenerate_embeddings():
         raise
 
 if __name__ == "__main__":
-    regenerate_embeddings()
\ No newline at end of file
+    import argparse
+    from faiss_index import INDEX_TYPES
+
+    parser = argparse.ArgumentParser(description="Regenerate embeddings and the FAISS index")
+    parser.add_argument('--index-type', choices=INDEX_TYPES, default='flat')
+    parser.add_argument('--nlist', type=int, default=None, help="IVF list count")
+    parser.add_argument('--pq-m', type=int, default=16, help="PQ sub-quantizers")
+    parser.add_argument('--hnsw-m', type=int, default=32, help="HNSW graph degree")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only encode entries that changed since the last build")
+    parser.add_argument('--workers', type=int, default=1, help="Encoding processes")
+    parser.add_argument('--torch-threads', type=int, default=None, help="Intra-op threads per encoding process")
+    parser.add_argument('--backend', choices=('torch', 'int8', 'onnx', 'onnx_int8'), default='torch',
+                        help="Sentence encoder backend")
+    args = parser.parse_args()
+
+    regenerate_embeddings(
+        index_type=args.index_type,
+        incremental=args.incremental,
+        num_workers=args.workers,
+        torch_threads=args.torch_threads,
+        backend=args.backend,
+        nlist=args.nlist,
+        pq_m=args.pq_m,
+        hnsw_m=args.hnsw_m
+    )
\ No newline at end of file
@@ -0,0 +1,204 @@
+import json
+import logging
+import os
+import re
+from typing import List, Optional, Union
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+# onnxruntime is optional, only the onnx backends need it
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('torch', 'int8', 'onnx', 'onnx_int8')
+
+DEFAULT_EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'onnx')
+
+def load_encoder(
+    model_name: str,
+    backend: str = 'torch',
+    device: Optional[str] = None,
+    export_dir: Optional[str] = None,
+    num_threads: Optional[int] = None
+):
+    """
+    Load a sentence encoder with the SentenceTransformer encode interface
+
+    Args:
+        model_name: Name or path of the sentence transformer model
+        backend: One of BACKENDS; 'int8' applies dynamic int8 quantization to
+            the linear layers, 'onnx' runs an exported copy of the model in
+            onnxruntime and 'onnx_int8' a quantized export
+        device: Torch device for the 'torch' backend
+        export_dir: Where ONNX exports are kept, one subdirectory per model
+        num_threads: Intra-op threads of the onnxruntime session
+
+    Returns:
+        Object providing encode() and get_sentence_embedding_dimension()
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}', expected one of {BACKENDS}")
+
+    if backend == 'torch':
+        return SentenceTransformer(model_name, device=device)
+
+    if backend == 'int8':
+        # Quantized kernels are CPU only
+        model = SentenceTransformer(model_name, device='cpu')
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    if onnxruntime is None:
+        raise ImportError(f"The '{backend}' encoder backend requires onnxruntime")
+
+    model_dir = os.path.join(export_dir or DEFAULT_EXPORT_DIR, re.sub(r'[^\w.-]+', '_', model_name).strip('_'))
+    if not os.path.exists(os.path.join(model_dir, 'encoder_config.json')):
+        export_onnx(model_name, model_dir)
+    return OnnxEncoder(model_dir, quantized=backend == 'onnx_int8', num_threads=num_threads)
+
+class _LastHiddenState(torch.nn.Module):
+    """Exposes the token embeddings of a transformers model as a plain tensor output"""
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids=None):
+        if token_type_ids is None:
+            return self.model(input_ids=input_ids, attention_mask=attention_mask)[0]
+        return self.model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids)[0]
+
+def _pooling_mode(pooling) -> str:
+    # sentence-transformers < 3 exposes the mode through get_pooling_mode_str
+    if hasattr(pooling, 'get_pooling_mode_str'):
+        return pooling.get_pooling_mode_str()
+    return pooling.pooling_mode
+
+def export_onnx(model_name: str, model_dir: str) -> None:
+    """
+    Export the transformer of a sentence transformer model to ONNX
+
+    Writes model.onnx, a dynamically quantized model_int8.onnx, the
+    tokenizer and encoder_config.json describing the pooling to model_dir.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    try:
+        model = SentenceTransformer(model_name, device='cpu')
+        pooling = next(module for module in model if type(module).__name__ == 'Pooling')
+        pooling_mode = _pooling_mode(pooling)
+        if pooling_mode not in ('mean', 'cls'):
+            raise ValueError(f"ONNX export supports mean or cls pooling, model uses '{pooling_mode}'")
+
+        os.makedirs(model_dir, exist_ok=True)
+        sample = model.tokenizer(['export sample'], return_tensors='pt')
+        input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+        dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+        dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+        transformer = _LastHiddenState(model[0].auto_model).eval()
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer,
+                tuple(sample[name] for name in input_names),
+                os.path.join(model_dir, 'model.onnx'),
+                input_names=input_names,
+                output_names=['last_hidden_state'],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+                dynamo=False
+            )
+
+        quantize_dynamic(
+            os.path.join(model_dir, 'model.onnx'),
+            os.path.join(model_dir, 'model_int8.onnx'),
+            weight_type=QuantType.QInt8
+        )
+        model.tokenizer.save_pretrained(model_dir)
+
+        # Written last, its presence marks a complete export
+        with open(os.path.join(model_dir, 'encoder_config.json'), 'w', encoding='utf-8') as file:
+            json.dump({
+                'model_name': model_name,
+                'pooling': pooling_mode,
+                'normalize': any(type(module).__name__ == 'Normalize' for module in model),
+                'max_seq_length': model.max_seq_length,
+                'dimension': model.get_sentence_embedding_dimension()
+            }, file, indent=2)
+
+        logger.info(f"Exported {model_name} to ONNX in {model_dir}")
+
+    except Exception as e:
+        logger.error(f"Error exporting {model_name} to ONNX: {str(e)}")
+        raise
+
+class OnnxEncoder:
+    """onnxruntime inference of an exported sentence transformer"""
+    def __init__(self, model_dir: str, quantized: bool = False, num_threads: Optional[int] = None):
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, 'encoder_config.json'), 'r', encoding='utf-8') as file:
+            config = json.load(file)
+
+        self.pooling = config['pooling']
+        self.normalize = config['normalize']
+        self.max_seq_length = config['max_seq_length']
+        self.dimension = config['dimension']
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, 'model_int8.onnx' if quantized else 'model.onnx'),
+            options,
+            providers=['CPUExecutionProvider']
+        )
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False
+    ) -> np.ndarray:
+        """Same contract as SentenceTransformer.encode, always returning numpy arrays"""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        # Longest first, so each batch pads to similar lengths
+        order = np.argsort([-len(sentence) for sentence in sentences], kind='stable')
+        embeddings = np.empty((len(sentences), self.dimension), dtype=np.float32)
+
+        for start in range(0, len(sentences), batch_size):
+            batch = order[start:start + batch_size]
+            encoded = self.tokenizer(
+                [sentences[i] for i in batch],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors='np'
+            )
+            hidden = self.session.run(None, {name: encoded[name].astype(np.int64) for name in self.input_names})[0]
+
+            if self.pooling == 'cls':
+                pooled = hidden[:, 0]
+            else:
+                mask = encoded['attention_mask'][..., None].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            embeddings[batch] = pooled
+
+        if self.normalize or normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+        return embeddings[0] if single else embeddings
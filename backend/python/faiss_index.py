@@ -0,0 +1,181 @@
+import hashlib
+import json
+import logging
+import math
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ('flat', 'ivf_flat', 'ivf_pq', 'hnsw', 'sq_fp16', 'pq', 'opq_pq')
+
+# Index types storing compressed vectors; builds of these also keep the
+# float32 vectors on disk for an exact re-rank of the shortlist
+LOSSY_INDEX_TYPES = ('ivf_pq', 'sq_fp16', 'pq', 'opq_pq')
+
+DEFAULT_NPROBE = 8
+DEFAULT_EF_SEARCH = 64
+
+# Read-only memory mapping of index files; IO_FLAG_MMAP_IFC (faiss >= 1.11)
+# also maps flat vector storage instead of copying it
+MMAP_FLAGS = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+
+def default_nlist(num_vectors: int) -> int:
+    """Number of IVF lists: ~4*sqrt(n), keeping >= 39 training points per list"""
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+def build_index(
+    embeddings: np.ndarray,
+    index_type: str = 'flat',
+    nlist: Optional[int] = None,
+    pq_m: int = 16,
+    pq_nbits: int = 8,
+    hnsw_m: int = 32,
+    ef_construction: int = 200
+) -> Tuple[faiss.Index, Dict[str, Any]]:
+    """
+    Build and populate a FAISS index of the requested type
+
+    Args:
+        embeddings: Matrix of shape (n, dimension)
+        index_type: One of INDEX_TYPES
+        nlist: IVF list count, derived from n when omitted
+        pq_m: Number of PQ sub-quantizers (must divide the dimension),
+            also the OPQ rotation's block count
+        pq_nbits: Bits per PQ code
+        hnsw_m: HNSW graph degree
+        ef_construction: HNSW build-time beam width
+
+    Returns:
+        Tuple of (index, build parameters recorded in the metadata)
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    num_vectors, dimension = embeddings.shape
+    build_params: Dict[str, Any] = {}
+
+    if index_type == 'flat':
+        index = faiss.IndexFlatL2(dimension)
+
+    elif index_type in ('ivf_flat', 'ivf_pq'):
+        nlist = nlist or default_nlist(num_vectors)
+        quantizer = faiss.IndexFlatL2(dimension)
+        if index_type == 'ivf_flat':
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_nbits)
+            build_params.update(pq_m=pq_m, pq_nbits=pq_nbits)
+        index.train(embeddings)
+        build_params['nlist'] = nlist
+
+    elif index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        build_params.update(hnsw_m=hnsw_m, ef_construction=ef_construction)
+
+    elif index_type == 'sq_fp16':
+        # Half the memory of float32 with negligible loss
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16)
+
+    else:
+        # pq_m bytes per vector at 8 bits; OPQ rotates the space first so
+        # sub-quantizers see balanced variance
+        factory = f"PQ{pq_m}x{pq_nbits}"
+        if index_type == 'opq_pq':
+            factory = f"OPQ{pq_m},{factory}"
+        index = faiss.index_factory(dimension, factory)
+        index.train(embeddings)
+        build_params.update(pq_m=pq_m, pq_nbits=pq_nbits)
+
+    index.add(embeddings)
+    logger.info(f"Built {index_type} index with {index.ntotal} vectors {build_params}")
+    return index, build_params
+
+def default_search_params(index_type: str) -> Dict[str, int]:
+    """Runtime search parameters used when a query does not override them"""
+    if index_type.startswith('ivf'):
+        return {'nprobe': DEFAULT_NPROBE}
+    if index_type == 'hnsw':
+        return {'ef_search': DEFAULT_EF_SEARCH}
+    return {}
+
+def make_search_params(
+    index_type: str,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    defaults: Optional[Dict[str, int]] = None
+) -> Optional[faiss.SearchParameters]:
+    """
+    Per-query FAISS search parameters
+
+    Parameters are passed to index.search rather than set on the index,
+    so concurrent queries can use different values safely.
+    """
+    defaults = defaults or default_search_params(index_type)
+
+    if index_type.startswith('ivf'):
+        return faiss.SearchParametersIVF(nprobe=nprobe or defaults.get('nprobe', DEFAULT_NPROBE))
+    if index_type == 'hnsw':
+        return faiss.SearchParametersHNSW(efSearch=ef_search or defaults.get('ef_search', DEFAULT_EF_SEARCH))
+    return None
+
+def exact_rerank(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    ids: np.ndarray,
+    k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Re-score a shortlist by exact inner product and keep the best k per query
+
+    Args:
+        vectors: Float32 corpus vectors, typically a read-only memory map
+        queries: Query matrix of shape (n, dimension)
+        ids: Shortlisted ids of shape (n, k'), -1 for padding
+        k: Results kept per query
+
+    Returns:
+        Tuple of (similarities, ids), each of shape (n, min(k, k')), padding
+        sorted last with id -1
+    """
+    # Fancy indexing a memory map reads only the shortlisted rows
+    candidates = vectors[np.where(ids >= 0, ids, 0).ravel()].reshape(*ids.shape, -1)
+    similarities = np.einsum('nkd,nd->nk', candidates, queries)
+    similarities[ids < 0] = -np.inf
+
+    order = np.argsort(-similarities, axis=1, kind='stable')[:, :k]
+    return np.take_along_axis(similarities, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+def index_fingerprint(index: faiss.Index, keys: List[Tuple[str, str]]) -> str:
+    """Content hash of an index build, recorded in the metadata"""
+    digest = hashlib.sha256()
+    digest.update(faiss.serialize_index(index).tobytes())
+    digest.update(json.dumps(keys, ensure_ascii=False).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def file_fingerprint(*paths: str) -> str:
+    """Size/mtime hash of index files, for indexes built without a recorded fingerprint"""
+    digest = hashlib.sha256()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def write_index_meta(meta_file: str, meta: Dict[str, Any]) -> None:
+    """Write index metadata next to the FAISS file"""
+    with open(f"{meta_file}.tmp", 'w', encoding='utf-8') as file:
+        json.dump(meta, file, indent=2)
+    os.replace(f"{meta_file}.tmp", meta_file)
+
+def read_index_meta(meta_file: str) -> Dict[str, Any]:
+    """Read index metadata, treating indexes built before metadata existed as flat"""
+    if not os.path.exists(meta_file):
+        return {'index_type': 'flat', 'build_params': {}, 'search_params': {}}
+
+    with open(meta_file, 'r', encoding='utf-8') as file:
+        return json.load(file)
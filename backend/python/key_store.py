@@ -0,0 +1,83 @@
+import logging
+import mmap
+import os
+import struct
+from typing import Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# File layout: magic, entry count, build fingerprint, int64 offsets
+# (2 * count + 1) into the UTF-8 string table that follows, content and key
+# of each entry interleaved
+MAGIC = b'KEYSTOR2'
+HEADER = struct.Struct('<8sQ16s')
+
+def write_key_store(path: str, keys: Sequence[Tuple[str, str]], fingerprint: str) -> None:
+    """
+    Write (content, key) pairs as an offset-indexed string table
+
+    Args:
+        path: Output file, replaced atomically
+        keys: Pairs in index order, already cleaned
+        fingerprint: Fingerprint of the index build the keys belong to
+    """
+    encoded = [item.encode('utf-8') for pair in keys for item in pair]
+    offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+
+    with open(f"{path}.tmp", 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(keys), fingerprint.encode('ascii')))
+        file.write(offsets.tobytes())
+        file.write(b''.join(encoded))
+    os.replace(f"{path}.tmp", path)
+
+    logger.info(f"Key store with {len(keys)} entries saved to {path}")
+
+class KeyStore(Sequence):
+    """
+    Read-only, memory-mapped view of a file written by write_key_store
+
+    Entries are decoded on access, so opening the store costs the same for
+    any corpus size and processes mapping the same file share its pages.
+    """
+    def __init__(self, path: str):
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a key store")
+        _, count, fingerprint = HEADER.unpack_from(self._mmap)
+        header_size = HEADER.size
+        # Fingerprint of the index build these keys belong to
+        self.fingerprint = fingerprint.rstrip(b'\0').decode('ascii')
+
+        self._count = count
+        self._offsets = np.frombuffer(self._mmap, dtype='<i8', count=2 * count + 1, offset=header_size)
+        self._strings_start = header_size + self._offsets.nbytes
+
+    def _string(self, position: int) -> str:
+        start = self._strings_start + int(self._offsets[position])
+        end = self._strings_start + int(self._offsets[position + 1])
+        return self._mmap[start:end].decode('utf-8')
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("key store index out of range")
+        return self._string(2 * i), self._string(2 * i + 1)
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        for i in range(self._count):
+            yield self._string(2 * i), self._string(2 * i + 1)
+
+    def contents(self) -> List[str]:
+        """Content strings of every entry, in index order"""
+        return [self._string(2 * i) for i in range(self._count)]
@@ -1,6 +1,24 @@
+import os
 import sys
 import json
 import logging
+import argparse
+import signal
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Configure logging to write to file instead of stdout. This runs before the
+# imports below: modules such as preprocess configure logging to stdout at
+# import time, which would interleave log lines with the JSON responses.
+logging.basicConfig(
+    filename='bank_assistant.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
 import numpy as np
 from sentence_transformers import SentenceTransformer
 from preprocess import JSONFlattener
@@ -13,6 +31,7 @@ from ollama_integration import (
     ResponseFormat
 )
 from coreference_resolution import resolve_references
+from model_registry import registry
 from calculation_handler import check_if_calculation_or_not, handle_calculation_query
 
 # Custom JSON encoder to handle numpy types
@@ -26,16 +45,8 @@ class NumpyEncoder(json.JSONEncoder):
             return obj.tolist()
         return super().default(obj)
     
-# Configure logging to write to file instead of stdout
-logging.basicConfig(
-    filename='bank_assistant.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
 
 # Redirect all other output to the log file
-import sys
 class LoggerWriter:
     def __init__(self, level):
         self.level = level
@@ -45,41 +56,78 @@ class LoggerWriter:
     def flush(self):
         pass
 
-sys.stdout = LoggerWriter(logger.info)
-sys.stderr = LoggerWriter(logger.error)
+def _redirect_stdio():
+    """Send print output to the log; responses are written to sys.__stdout__"""
+    sys.stdout = LoggerWriter(logger.info)
+    sys.stderr = LoggerWriter(logger.error)
 
 class BankAssistant:
-    def __init__(self):
+    def __init__(
+        self,
+        intent_engine: str = 'finbert',
+        embeddings_dir: str = 'python/embeddings',
+        ollama_pool_size: int = 10
+    ):
+        """
+        Args:
+            intent_engine: 'finbert' classifies with the FinBERT pipeline,
+                'prototype' with the search encoder's query embedding; its
+                confidences are on a different scale, so it stays opt-in
+                until it is compared against FinBERT on labelled queries
+            embeddings_dir: Directory holding the index files and the query
+                embedding cache
+            ollama_pool_size: Keep-alive connections to Ollama, at least the
+                number of requests answered concurrently
+        """
         try:
             # Initialize SemanticSearch
             self.semantic_search = SemanticSearch(
                 model_name='all-mpnet-base-v2',
                 top_k=10,
-                threshold=0.3
+                threshold=0.3,
+                fusion='weighted',
+                embedding_cache_file=os.path.join(embeddings_dir, 'query_embedding_cache.npz')
+            )
+            self.semantic_search.load_index_and_keys(
+                faiss_file=os.path.join(embeddings_dir, 'vector_database.faiss'),
+                key_file=os.path.join(embeddings_dir, 'key_mapping.json'),
+                meta_file=os.path.join(embeddings_dir, 'index_meta.json')
             )
-            self.semantic_search.load_index_and_keys()
             logger.info("Search engine initialized successfully")
 
             # Initialize intent classifier
-            self.classifier = get_classifier()
+            self.classifier = get_classifier(intent_engine, self.semantic_search)
             logger.info("Intent classifier initialized successfully")
 
-            # Initialize Ollama
-            self.ollama = OllamaIntegration(
-                model_name='llama3.2:3b-instruct-q8_0',
-                default_params=ModelParameters(
-                    temperature=0.7,
-                    top_p=0.9,
-                    max_tokens=500,
-                    # context_window=True
-                )
+            # Ollama is connected on the first query that needs generation,
+            # calculation queries never do
+            self.ollama_model_name = 'llama3.2:3b-instruct-q8_0'
+            self.ollama_pool_size = ollama_pool_size
+            self.ollama_params = ModelParameters(
+                temperature=0.7,
+                top_p=0.9,
+                max_tokens=500,
+                # context_window=True
             )
-            logger.info("Ollama integration initialized successfully")
 
         except Exception as e:
             logger.error(f"Initialization error: {str(e)}")
             raise
 
+    @property
+    def ollama(self) -> OllamaIntegration:
+        """Ollama integration, shared through the model registry"""
+        def connect():
+            ollama = OllamaIntegration(
+                model_name=self.ollama_model_name,
+                default_params=self.ollama_params,
+                pool_maxsize=self.ollama_pool_size
+            )
+            logger.info("Ollama integration initialized successfully")
+            return ollama
+
+        return registry.get(f"ollama:{self.ollama_model_name}:{self.ollama_pool_size}", connect)
+
     def _extract_query_terms(self, query: str):
         """Extract meaningful terms from the query."""
         stop_words = set(['what', 'are', 'the', 'for', 'in', 'of', 'at', 'is', 'a'])
@@ -143,7 +191,15 @@ class BankAssistant:
             f"Latest updates on {query}"
         ]
 
-    def process_query(self, conversation_context):
+    def process_query(self, conversation_context, on_token=None):
+        """
+        Answer one conversation context
+
+        Args:
+            conversation_context: Dict with query, response and follow_up
+            on_token: When given, the model's answer is streamed and each
+                piece of text is passed to it as it is generated
+        """
         try:
             # Resolve coreferences
             resolved_query = resolve_references(conversation_context)
@@ -176,18 +232,6 @@ class BankAssistant:
                     'similarity': float(result.similarity),
                     'rank': int(result.rank)
                 })
-            
-            contextcalc = [
-                    json.dumps({
-                        'content': result.content,
-                        'source': result.source,
-                        'score': float(result.score),
-                        'similarity': float(result.similarity),
-                        'rank': result.rank
-                    }) for result in context_results
-                ]
-            with open("calculationcontext.json", "w", encoding="utf-8") as file:
-                json.dump(contextcalc, file, indent=4)
 
             # Check if it's a calculation query
             if check_if_calculation_or_not(resolved_query):
@@ -201,7 +245,9 @@ class BankAssistant:
                     } for idx, result in enumerate(search_results)
                 ]
                 
-                calculation_result = handle_calculation_query(resolved_query)
+                # Rates come from this request's own results, never from
+                # state shared with other requests
+                calculation_result = handle_calculation_query(resolved_query, context)
                 return {
                     "status": "success",
                     "response": calculation_result.get('human_response', 'Calculation completed'),
@@ -214,7 +260,7 @@ class BankAssistant:
 
             # Generate response
             prompt = self.ollama.generate_prompt(resolved_query, context)
-            model_response = self.ollama.ask_model(prompt)
+            model_response = self.ollama.ask_model(prompt, stream=on_token is not None, on_token=on_token)
             
             # Ensure the response is JSON serializable
             response_text = str(model_response) if hasattr(model_response, '__str__') else "Unable to process response"
@@ -236,51 +282,253 @@ class BankAssistant:
                 "resolved_query": conversation_context['follow_up']
             }
 
-def main():
+def parse_conversation_context(input_data: str) -> dict:
+    """Parse and validate a conversation context JSON string."""
+    conversation_context = json.loads(input_data)
+
+    # Validate required fields
+    required_fields = ['query', 'response', 'follow_up']
+    if not all(field in conversation_context for field in required_fields):
+        raise ValueError("Missing required fields in input JSON")
+
+    return conversation_context
+
+def handle_input(input_data: str, get_assistant, on_token=None) -> dict:
+    """
+    Turn one raw input line into a result dict
+
+    Args:
+        input_data: Raw conversation context JSON
+        get_assistant: Callable returning the BankAssistant to use
+        on_token: Optional callback receiving the answer's text as it is generated
+
+    Returns:
+        Result dict ready for serialization
+    """
+    if not input_data:
+        return {
+            "status": "error",
+            "response": "Please provide conversation context to process.",
+            "error": "No input provided"
+        }
+
+    try:
+        conversation_context = parse_conversation_context(input_data)
+        return get_assistant().process_query(conversation_context, on_token)
+
+    except json.JSONDecodeError as e:
+        return {
+            "status": "error",
+            "response": "Invalid JSON input",
+            "error": str(e)
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "response": "An unexpected error occurred",
+            "error": str(e)
+        }
+
+def serialize_result(result: dict) -> str:
+    """Serialize a result dict to a single JSON line"""
+    # Ensure the result is JSON serializable
+    sanitized_result = json.loads(json.dumps(result, cls=NumpyEncoder))
+    return json.dumps(sanitized_result, ensure_ascii=False)
+
+# Streaming output is a sequence of frames, one JSON line each: any number of
+# {"type": "token", "token": ...} frames with the answer's text as it is
+# generated, then one "final" frame holding the usual result fields
+def serialize_token_frame(token: str, request_id=None) -> str:
+    frame = {"type": "token", "token": token}
+    if request_id is not None:
+        frame["request_id"] = request_id
+    return json.dumps(frame, ensure_ascii=False)
+
+def serialize_final_frame(result: dict) -> str:
+    return serialize_result({"type": "final", **result})
+
+class BankAssistantRequestHandler(BaseHTTPRequestHandler):
+    """JSON endpoint in front of a shared, warmed BankAssistant"""
+
+    def _send_json(self, status_code: int, body: str):
+        payload = body.encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, json.dumps({"status": "ok"}))
+        elif self.path == '/models':
+            self._send_json(200, json.dumps(registry.stats()))
+        else:
+            self._send_json(404, json.dumps({"status": "error", "error": "Not found"}))
+
+    def do_POST(self):
+        if self.path == '/reload':
+            try:
+                self.server.assistant.semantic_search.reload()
+                self._send_json(202, json.dumps({"status": "reloading"}))
+            except Exception as e:
+                self._send_json(500, json.dumps({"status": "error", "error": str(e)}))
+            return
+
+        if self.path != '/query':
+            self._send_json(404, json.dumps({"status": "error", "error": "Not found"}))
+            return
+
+        content_length = int(self.headers.get('Content-Length', 0))
+        input_data = self.rfile.read(content_length).decode('utf-8').strip()
+
+        if self.server.stream:
+            self._stream_query(input_data)
+            return
+
+        result = handle_input(input_data, lambda: self.server.assistant)
+        self._send_json(200, serialize_result(result))
+
+    def _stream_query(self, input_data: str):
+        """Answer with NDJSON frames, each written as soon as it is available"""
+        # No Content-Length; the HTTP/1.0 connection closes after the final frame
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.end_headers()
+
+        def write_frame(line: str):
+            self.wfile.write((line + "\n").encode('utf-8'))
+            self.wfile.flush()
+
+        result = handle_input(
+            input_data,
+            lambda: self.server.assistant,
+            lambda token: write_frame(serialize_token_frame(token))
+        )
+        write_frame(serialize_final_frame(result))
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} - {format % args}")
+
+class BankAssistantServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding one long-lived BankAssistant"""
+    daemon_threads = True
+
+    def __init__(
+        self,
+        server_address,
+        assistant: BankAssistant,
+        stream: bool = False,
+        max_concurrency: int = 16
+    ):
+        super().__init__(server_address, BankAssistantRequestHandler)
+        self.assistant = assistant
+        self.stream = stream
+        # Requests past the limit wait in the accept loop, so handlers never
+        # outnumber the assistant's Ollama connections
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+def _raise_keyboard_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def serve(
+    host: str = '127.0.0.1',
+    port: int = 8765,
+    reload_interval: float = 0,
+    stream: bool = False,
+    max_concurrency: int = 16
+):
+    """
+    Run the warm-worker server
+
+    Models, the FAISS index and the Ollama client are loaded once and
+    shared by every request. POST /reload swaps in a rebuilt index.
+
+    Args:
+        host: Interface to bind to
+        port: Port to listen on
+        reload_interval: Seconds between index file checks, 0 disables watching
+        stream: Answer POST /query with NDJSON token frames and a final frame
+        max_concurrency: Requests handled at once, and the size of the
+            Ollama connection pool they share
+    """
+    assistant = BankAssistant(ollama_pool_size=max_concurrency)
+    if reload_interval > 0:
+        assistant.semantic_search.watch_index_files(reload_interval)
+    server = BankAssistantServer((host, port), assistant, stream, max_concurrency)
+    # Deploys stop workers with SIGTERM; unwind normally so caches are spilled
+    signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+    logger.info(f"BankAssistant server listening on http://{host}:{port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down BankAssistant server")
+    finally:
+        server.server_close()
+
+def _detach_stdout_handlers():
+    """
+    Remove log handlers writing to the real stdout
+
+    stdout carries the response lines and, with --stream, token frames
+    that consumers parse line by line; a handler a library attached to
+    its own logger would interleave log lines with them.
+    """
+    loggers = [logging.getLogger()] + [
+        log for log in logging.Logger.manager.loggerDict.values() if isinstance(log, logging.Logger)
+    ]
+    for log in loggers:
+        for handler in list(log.handlers):
+            if isinstance(handler, logging.StreamHandler) and handler.stream is sys.__stdout__:
+                log.removeHandler(handler)
+                logger.warning(f"Removed log handler writing to stdout from logger '{log.name}'")
+
+def _write_line(line: str):
+    sys.__stdout__.write(line + "\n")
+    sys.__stdout__.flush()
+
+def run_once(stream: bool = False):
+    """
+    Answer a single conversation context read from stdin
+
+    Args:
+        stream: Write token frames while the answer is generated, then a final frame
+    """
     try:
         # Restore stdout for JSON output
         sys.__stdout__.write("")  # Clear any buffered output
         
         # Read input from stdin
         input_data = sys.stdin.readline().strip()
-        
-        if not input_data:
-            result = {
-                "status": "error",
-                "response": "Please provide conversation context to process.",
-                "error": "No input provided"
-            }
-        else:
-            try:
-                conversation_context = json.loads(input_data)
-                
-                # Validate required fields
-                required_fields = ['query', 'response', 'follow_up']
-                if not all(field in conversation_context for field in required_fields):
-                    raise ValueError("Missing required fields in input JSON")
+        _detach_stdout_handlers()
+        if stream:
+            result = handle_input(
+                input_data,
+                BankAssistant,
+                lambda token: _write_line(serialize_token_frame(token))
+            )
+            _write_line(serialize_final_frame(result))
+            return
 
-                assistant = BankAssistant()
-                result = assistant.process_query(conversation_context)
-                
-            except json.JSONDecodeError as e:
-                result = {
-                    "status": "error",
-                    "response": "Invalid JSON input",
-                    "error": str(e)
-                }
-            except Exception as e:
-                result = {
-                    "status": "error",
-                    "response": "An unexpected error occurred",
-                    "error": str(e)
-                }
-        
-        # Ensure the result is JSON serializable
-        sanitized_result = json.loads(json.dumps(result, cls=NumpyEncoder))
+        result = handle_input(input_data, BankAssistant)
         
         # Write JSON response to original stdout
-        sys.__stdout__.write(json.dumps(sanitized_result, ensure_ascii=False) + "\n")
-        sys.__stdout__.flush()
+        _write_line(serialize_result(result))
         
     except Exception as e:
         error_result = {
@@ -288,8 +536,115 @@ def main():
             "response": "An unexpected error occurred",
             "error": str(e)
         }
-        sys.__stdout__.write(json.dumps(error_result, ensure_ascii=False) + "\n")
-        sys.__stdout__.flush()
+        _write_line(serialize_final_frame(error_result) if stream else json.dumps(error_result, ensure_ascii=False))
+
+def _extract_request_id(input_data: str):
+    """
+    Request id of a raw input line
+
+    Lines without one, including lines that are not valid JSON, get a
+    generated id, so every response can be matched to its request.
+    """
+    try:
+        payload = json.loads(input_data)
+    except json.JSONDecodeError:
+        payload = None
+    request_id = payload.get('request_id') if isinstance(payload, dict) else None
+    return request_id if request_id is not None else uuid.uuid4().hex
+
+def run_ndjson(workers: int = 1, reload_interval: float = 0, stream: bool = False):
+    """
+    Answer newline-delimited conversation contexts until stdin closes
+
+    Each input line may carry a ``request_id``; it is echoed back on the
+    matching response line so callers can pipeline requests. Lines without
+    one get a generated id. With more than one worker, responses are
+    written in completion order.
+
+    Args:
+        workers: Number of requests processed concurrently
+        reload_interval: Seconds between index file checks, 0 disables watching
+        stream: Write token frames while each answer is generated and the
+            result as a final frame; frames of concurrent requests interleave
+            and are told apart by request_id
+    """
+    assistant = BankAssistant(ollama_pool_size=max(1, workers))
+    if reload_interval > 0:
+        assistant.semantic_search.watch_index_files(reload_interval)
+    write_lock = threading.Lock()
+    _detach_stdout_handlers()
+
+    def write(line: str):
+        with write_lock:
+            _write_line(line)
+
+    def answer(input_data: str):
+        request_id = _extract_request_id(input_data)
+        if stream:
+            result = handle_input(
+                input_data,
+                lambda: assistant,
+                lambda token: write(serialize_token_frame(token, request_id))
+            )
+            result['request_id'] = request_id
+            write(serialize_final_frame(result))
+            return
+
+        result = handle_input(input_data, lambda: assistant)
+        result['request_id'] = request_id
+        write(serialize_result(result))
+
+    # Requests still running; failures outside handle_input are logged
+    # rather than lost with the discarded future
+    pending = set()
+
+    def finished(future):
+        pending.discard(future)
+        if future.exception() is not None:
+            logger.error(f"NDJSON request failed: {future.exception()!r}")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for raw_line in sys.stdin:
+            input_data = raw_line.strip()
+            if not input_data:
+                continue
+            if workers > 1:
+                future = executor.submit(answer, input_data)
+                pending.add(future)
+                future.add_done_callback(finished)
+            else:
+                try:
+                    answer(input_data)
+                except Exception as e:
+                    logger.error(f"NDJSON request failed: {e!r}")
+
+    logger.info("stdin closed, NDJSON worker exiting")
+
+def main():
+    parser = argparse.ArgumentParser(description="Bank assistant query processor")
+    parser.add_argument('--serve', action='store_true',
+                        help="Run a long-lived HTTP server instead of answering one stdin query")
+    parser.add_argument('--ndjson', action='store_true',
+                        help="Keep answering newline-delimited JSON requests from stdin")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Concurrent requests in --ndjson mode")
+    parser.add_argument('--max-concurrency', type=int, default=16,
+                        help="Requests handled at once in --serve mode, also the Ollama connection pool size")
+    parser.add_argument('--reload-interval', type=float, default=0,
+                        help="Reload the index when its files change, checking every N seconds")
+    parser.add_argument('--stream', action='store_true',
+                        help="Emit the answer as NDJSON token frames followed by a final frame")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    _redirect_stdio()
+    if args.serve:
+        serve(args.host, args.port, args.reload_interval, args.stream, args.max_concurrency)
+    elif args.ndjson:
+        run_ndjson(args.workers, args.reload_interval, args.stream)
+    else:
+        run_once(args.stream)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,130 @@
+import logging
+import time
+from threading import RLock
+from typing import Any, Callable, Dict, Optional
+
+import psutil
+import torch
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """
+    Process-wide store of models, each loaded on first use and shared
+
+    Loads are serialized, so the resident memory growth measured around a
+    load is attributable to that model.
+    """
+    def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = RLock()
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        Return the model registered under key, loading it with loader if needed
+
+        Args:
+            key: Identifies the model and every option affecting how it loads
+            loader: Called without arguments to load the model
+        """
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                return model
+
+            process = psutil.Process()
+            rss_before = process.memory_info().rss
+            start = time.perf_counter()
+            try:
+                model = loader()
+            except Exception as e:
+                logger.error(f"Error loading model {key}: {str(e)}")
+                raise
+
+            self._stats[key] = {
+                'load_seconds': time.perf_counter() - start,
+                'rss_mb': (process.memory_info().rss - rss_before) / 2**20
+            }
+            self._models[key] = model
+            logger.info(
+                f"Loaded {key} in {self._stats[key]['load_seconds']:.2f}s, "
+                f"resident memory +{self._stats[key]['rss_mb']:.1f} MB"
+            )
+            return model
+
+    def is_loaded(self, key: str) -> bool:
+        return key in self._models
+
+    def unload(self, key: str) -> None:
+        """Drop the registry's reference; the model is freed once no component holds it"""
+        with self._lock:
+            self._models.pop(key, None)
+            self._stats.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Load time and resident memory growth of each loaded model, plus the process RSS"""
+        with self._lock:
+            return {
+                'models': {key: dict(stats) for key, stats in self._stats.items()},
+                'process_rss_mb': psutil.Process().memory_info().rss / 2**20
+            }
+
+registry = ModelRegistry()
+
+def default_device() -> str:
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+def get_encoder(
+    model_name: str,
+    backend: str = 'torch',
+    device: Optional[str] = None,
+    num_threads: Optional[int] = None
+):
+    """
+    Shared sentence encoder from encoder_backends.load_encoder
+
+    The encoder is warmed up with one encode before it is shared, which
+    settles the tokenizer's padding/truncation state ahead of concurrent use.
+    """
+    from encoder_backends import load_encoder
+
+    device = device or default_device()
+
+    def load():
+        encoder = load_encoder(model_name, backend=backend, device=device, num_threads=num_threads)
+        encoder.encode(['warm up'], show_progress_bar=False)
+        return encoder
+
+    return registry.get(f"encoder:{model_name}:{backend}:{device}:{num_threads}", load)
+
+def get_transformer(model_name: str, device: Optional[str] = None):
+    """Shared (model, tokenizer) pair of a plain transformers model"""
+    from transformers import AutoModel, AutoTokenizer
+
+    device = device or default_device()
+
+    def load():
+        model = AutoModel.from_pretrained(model_name).to(device)
+        return model, AutoTokenizer.from_pretrained(model_name)
+
+    return registry.get(f"transformer:{model_name}:{device}", load)
+
+def get_pipeline(task: str, model_name: str, **kwargs):
+    """Shared transformers pipeline, on the GPU when one is available"""
+    from transformers import pipeline
+
+    def load():
+        return pipeline(
+            task,
+            model=model_name,
+            device=0 if torch.cuda.is_available() else -1,
+            **kwargs
+        )
+
+    options = ','.join(f"{name}={value}" for name, value in sorted(kwargs.items()))
+    return registry.get(f"pipeline:{task}:{model_name}:{options}", load)
@@ -2,10 +2,11 @@ import requests
 import json
 import time
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Iterator, Optional
 from dataclasses import dataclass
 from enum import Enum
-from tenacity import retry, stop_after_attempt, wait_exponential
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Configure logging
 logging.basicConfig(
@@ -58,13 +59,59 @@ class OllamaIntegration:
         self, 
         model_name: str = "llama3.2:3b-instruct-q8_0",  # Updated model name
         api_url: str = "http://localhost:11434",
-        default_params: Optional[ModelParameters] = None
+        default_params: Optional[ModelParameters] = None,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 120.0,
+        pool_maxsize: int = 10,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5
     ):
+        """
+        Args:
+            model_name: Ollama model to generate with
+            api_url: Base URL of the Ollama server
+            default_params: Generation parameters used when a request gives none
+            connect_timeout: Seconds to establish a connection
+            read_timeout: Seconds to wait between bytes of a response; bounds
+                how long a hung server can block a caller
+            pool_maxsize: Keep-alive connections kept to the server, at least
+                the number of concurrent callers
+            max_retries: Retries of failed connections and 502/503/504 responses
+            backoff_factor: Base of the exponential sleep between retries
+        """
         self.model_name = model_name
         self.api_url = api_url.rstrip('/')
         self.default_params = default_params or ModelParameters()
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = self._create_session(pool_maxsize, max_retries, backoff_factor)
         self._validate_model()
 
+    @staticmethod
+    def _create_session(pool_maxsize: int, max_retries: int, backoff_factor: float) -> requests.Session:
+        """Session reusing keep-alive connections, with retries on transient failures"""
+        retries = Retry(
+            total=max_retries,
+            connect=max_retries,
+            # A read timeout may leave a generation running server-side;
+            # retrying it would queue a duplicate behind it
+            read=0,
+            status=max_retries,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({'GET', 'POST'}),
+            backoff_factor=backoff_factor,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retries)
+
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def close(self) -> None:
+        """Close the pooled connections"""
+        self.session.close()
+
     def load_bank_data(self, filepath: str = 'data/banks.json'):
         """
         Load bank data for direct reference
@@ -82,14 +129,10 @@ class OllamaIntegration:
             logger.error(f"Failed to load bank data: {str(e)}")
             return None
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
-    )
     def _validate_model(self) -> None:
         """Validate that the specified model is available"""
         try:
-            response = requests.get(f"{self.api_url}/api/tags")
+            response = self.session.get(f"{self.api_url}/api/tags", timeout=self.timeout)
             if response.status_code == 200:
                 available_models = [model['name'] for model in response.json().get('models', [])]
                 if self.model_name not in available_models:
@@ -292,11 +335,63 @@ class OllamaIntegration:
 
 
 
+    def _payload(self, prompt: str, current_params: Dict[str, Any], stream: bool) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "prompt": prompt,
+            "stream": stream,
+            **current_params
+        }
+
+    def stream_model(
+        self,
+        prompt: str,
+        params: Optional[ModelParameters] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a generation from the Ollama API as it is produced
+
+        Args:
+            prompt: The prompt to send
+            params: Optional custom parameters for this request
+
+        Yields:
+            Ollama's NDJSON chunks; each carries the next text in "response",
+            the last one has "done" set and the generation statistics
+        """
+        url = f"{self.api_url}/api/generate"
+        payload = self._payload(prompt, (params or self.default_params).to_dict(), stream=True)
+
+        try:
+            # The read timeout applies between chunks, not to the whole generation
+            with self.session.post(url, json=payload, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if 'error' in chunk:
+                        error_msg = f"Ollama error in model stream: {chunk['error']}"
+                        logger.error(error_msg)
+                        raise RuntimeError(error_msg)
+                    # Read on past the final chunk so the connection goes back to the pool
+                    yield chunk
+
+        except requests.RequestException as e:
+            error_msg = f"Network error in model request: {str(e)}"
+            logger.error(error_msg)
+            raise RuntimeError(error_msg)
+        except json.JSONDecodeError:
+            error_msg = "Invalid JSON chunk in Ollama stream"
+            logger.error(error_msg)
+            raise RuntimeError(error_msg)
+
     def ask_model(
         self, 
         prompt: str,
         params: Optional[ModelParameters] = None,
-        stream: bool = False
+        stream: bool = False,
+        on_token: Optional[Callable[[str], None]] = None
     ) -> ModelResponse:
         """
         Send prompt to Ollama API with comprehensive error handling
@@ -304,7 +399,9 @@ class OllamaIntegration:
         Args:
             prompt: The prompt to send
             params: Optional custom parameters for this request
-            stream: Whether to stream the response
+            stream: Whether to stream the response; the chunks are
+                aggregated into the same ModelResponse
+            on_token: Called with each piece of text as it arrives, when streaming
 
         Returns:
             ModelResponse object containing the response and metadata
@@ -314,19 +411,25 @@ class OllamaIntegration:
         # Use custom parameters if provided, otherwise use defaults
         current_params = (params or self.default_params).to_dict()
         
-        payload = {
-            "model": self.model_name,
-            "prompt": prompt,
-            "stream": stream,
-            **current_params
-        }
+        payload = self._payload(prompt, current_params, stream)
 
         start_time = time.time()
         try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            
-            result = response.json()
+            if stream:
+                pieces = []
+                result: Dict[str, Any] = {}
+                for result in self.stream_model(prompt, params):
+                    piece = result.get("response", "")
+                    if piece:
+                        pieces.append(piece)
+                        if on_token:
+                            on_token(piece)
+                result = {**result, "response": ''.join(pieces)}
+            else:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+                response.raise_for_status()
+                
+                result = response.json()
             generation_time = time.time() - start_time
             
             return ModelResponse(
@@ -345,6 +448,9 @@ class OllamaIntegration:
             error_msg = "Invalid JSON response from Ollama"
             logger.error(error_msg)
             raise RuntimeError(error_msg)
+        except RuntimeError:
+            # Already logged by stream_model
+            raise
         except Exception as e:
             error_msg = f"Unexpected error in model request: {str(e)}"
             logger.error(error_msg)
@@ -1,5 +1,10 @@
 import simplejson as json
-from typing import Any, Dict, List, Union, Optional
+import itertools
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union, Optional
 from tqdm import tqdm
 import psutil
 import logging
@@ -18,15 +23,110 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+import ijson
+
 class MemoryError(Exception):
     """Custom exception for memory-related errors."""
     pass
 
+def _require_banks_list(events: Iterator[Tuple[str, str, Any]]) -> Iterator[Tuple[str, str, Any]]:
+    """Pass parse events through, checking the top-level object has a 'banks' list"""
+    found = False
+    for prefix, event, value in events:
+        if prefix == 'banks' and not found:
+            if event != 'start_array':
+                raise ValueError("Expected 'banks' to be a list")
+            found = True
+        yield prefix, event, value
+    if not found:
+        raise ValueError("Expected either a dictionary with 'banks' key or a list of banks")
+
+def iter_banks(input_file: str) -> Iterator[Any]:
+    """
+    Yield bank objects from a file holding a list of banks or an object
+    with a 'banks' list, without loading the whole file
+    """
+    with open(input_file, 'rb') as file:
+        events = ijson.parse(file, use_float=True)
+        first = next(events, ('', None, None))
+        events = itertools.chain([first], events)
+
+        if first[1] == 'start_array':
+            yield from ijson.items(events, 'item')
+        elif first[1] == 'start_map':
+            yield from ijson.items(_require_banks_list(events), 'banks.item')
+        else:
+            raise ValueError("Expected either a dictionary with 'banks' key or a list of banks")
+
+class JSONObjectWriter:
+    """
+    Writes (key, value) records as one JSON object, formatted like
+    json.dump(..., indent=2, ensure_ascii=False), without holding them
+    """
+    def __init__(self, output_file: str):
+        self.output_file = output_file
+        self.count = 0
+
+    def __enter__(self) -> 'JSONObjectWriter':
+        self.file = open(f"{self.output_file}.tmp", 'w', encoding='utf-8')
+        self.file.write('{')
+        return self
+
+    def write(self, key: str, value: Any) -> None:
+        self.file.write(',\n  ' if self.count else '\n  ')
+        self.file.write(json.dumps(key, ensure_ascii=False))
+        self.file.write(': ')
+        self.file.write(json.dumps(value, ensure_ascii=False))
+        self.count += 1
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.file.write('\n}' if self.count else '}')
+        self.file.close()
+        if exc_type is None:
+            os.replace(f"{self.output_file}.tmp", self.output_file)
+        else:
+            os.remove(f"{self.output_file}.tmp")
+
+# Tokenizer of the model embeddings.py encodes with, so chunks are sized in
+# the tokens the encoder actually sees
+DEFAULT_TOKENIZER = 'sentence-transformers/all-mpnet-base-v2'
+
+# Sentence ends followed by whitespace, or line breaks
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\s*\n\s*')
+
 class JSONFlattener:
-    def __init__(self, memory_threshold: float = 85.0):
+    def __init__(
+        self,
+        memory_threshold: float = 85.0,
+        tokenizer: Optional[Any] = DEFAULT_TOKENIZER,
+        max_tokens: int = 384,
+        token_overlap: int = 32
+    ):
+        """
+        Args:
+            memory_threshold: Process memory percentage _check_memory_usage allows
+            tokenizer: Fast tokenizer of the embedding model, or its name or
+                path; long values are chunked by token count along sentence
+                boundaries. None chunks them by word count instead
+            max_tokens: Encoder input limit each embedded "key: chunk" text must fit
+            token_overlap: Tokens repeated between consecutive chunks
+        """
         self.memory_threshold = memory_threshold
         self.flattened_data = {}
 
+        if isinstance(tokenizer, str):
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(tokenizer)
+        # Chunks are cut at token offsets, which only fast tokenizers return
+        if tokenizer is not None and not getattr(tokenizer, 'is_fast', False):
+            raise ValueError(
+                f"Token chunking needs a fast tokenizer with offset mappings, got {type(tokenizer).__name__}"
+            )
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.token_overlap = token_overlap
+
     def _check_memory_usage(self) -> None:
         memory_percent = psutil.Process().memory_percent()
         if memory_percent > self.memory_threshold:
@@ -35,27 +135,51 @@ class JSONFlattener:
             )
 
     def flatten_dict(self, obj: Dict, parent_key: str = '', sep: str = '.') -> None:
-        """Recursively flatten a nested dictionary"""
-        for key, value in obj.items():
-            new_key = f"{parent_key}{sep}{key}" if parent_key else key
-
-            if isinstance(value, dict):
-                self.flatten_dict(value, new_key, sep=sep)
-            elif isinstance(value, list):
-                self.flatten_list(value, new_key, sep=sep)
-            else:
-                self.flattened_data[new_key] = str(value)
+        """Flatten a nested dictionary into self.flattened_data"""
+        self._flatten(obj, parent_key, sep)
 
     def flatten_list(self, obj: List, parent_key: str, sep: str = '.') -> None:
         """Flatten a list with its index as part of the key"""
-        for i, item in enumerate(obj):
-            new_key = f"{parent_key}[{i}]"
-            if isinstance(item, dict):
-                self.flatten_dict(item, new_key, sep=sep)
-            elif isinstance(item, list):
-                self.flatten_list(item, new_key, sep=sep)
+        self._flatten(obj, parent_key, sep)
+
+    def _flatten(self, obj: Union[Dict, List], parent_key: str, sep: str) -> None:
+        """
+        Depth-first flattening with an explicit stack
+
+        Each stack level holds the key of its container, built once and
+        shared by all of its children, so nesting depth is not limited by
+        the recursion limit. Runs of leaves are consumed in a tight inner
+        loop that only builds each leaf's final key.
+        """
+        flattened = self.flattened_data
+        stack = [(obj, iter(obj.items()) if isinstance(obj, dict) else enumerate(obj), parent_key)]
+
+        while stack:
+            container, entries, parent = stack[-1]
+            if isinstance(container, dict):
+                for key, value in entries:
+                    new_key = f"{parent}{sep}{key}" if parent else key
+                    if isinstance(value, dict):
+                        stack.append((value, iter(value.items()), new_key))
+                        break
+                    if isinstance(value, list):
+                        stack.append((value, enumerate(value), new_key))
+                        break
+                    flattened[new_key] = str(value)
+                else:
+                    stack.pop()
             else:
-                self.flattened_data[new_key] = str(item)
+                for i, item in entries:
+                    new_key = f"{parent}[{i}]"
+                    if isinstance(item, dict):
+                        stack.append((item, iter(item.items()), new_key))
+                        break
+                    if isinstance(item, list):
+                        stack.append((item, enumerate(item), new_key))
+                        break
+                    flattened[new_key] = str(item)
+                else:
+                    stack.pop()
 
     def chunk_text(self, text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
         """Split text into overlapping chunks"""
@@ -68,15 +192,170 @@ class JSONFlattener:
         
         return chunks
 
+    def _count_tokens(self, texts: List[str]) -> List[int]:
+        return [len(ids) for ids in self.tokenizer(texts, add_special_tokens=False)['input_ids']]
+
+    def _token_budget(self, key: str) -> int:
+        """Tokens left for a chunk of this key's value once the key and special tokens are added"""
+        # Embedded text is "<key>_chunk_<j>: <chunk>"; [CLS]/[SEP] take two more
+        key_tokens = self._count_tokens([f"{key}_chunk_00: "])[0]
+        return max(self.max_tokens - key_tokens - 2, 16)
+
+    def chunk_text_tokens(self, text: str, budget: int, overlap: int) -> List[str]:
+        """
+        Split text into chunks of at most budget tokens, preferring sentence boundaries
+
+        Sentences are packed greedily; each new chunk starts with the
+        trailing sentences of the previous one that fit in overlap tokens.
+        Sentences longer than budget are cut into token windows overlapping
+        by overlap tokens. Chunks are slices of the original text.
+        """
+        spans, start = [], 0
+        for boundary in SENTENCE_BOUNDARY.finditer(text):
+            if boundary.start() > start:
+                spans.append((start, boundary.start()))
+            start = boundary.end()
+        if text[start:].strip():
+            spans.append((start, len(text.rstrip())))
+        if not spans:
+            return []
+
+        encoded = self.tokenizer(
+            [text[a:b] for a, b in spans],
+            add_special_tokens=False,
+            return_offsets_mapping=True
+        )
+
+        # (start, end, tokens) units, long sentences already cut to fit
+        units = []
+        step = max(budget - overlap, 1)
+        for (a, b), offsets in zip(spans, encoded['offset_mapping']):
+            if len(offsets) <= budget:
+                units.append((a, b, len(offsets)))
+                continue
+            for first in range(0, len(offsets), step):
+                window = offsets[first:first + budget]
+                units.append((a + window[0][0], a + window[-1][1], len(window)))
+                if first + budget >= len(offsets):
+                    break
+
+        chunks, current, current_tokens = [], [], 0
+        for unit in units:
+            if current and current_tokens + unit[2] > budget:
+                chunks.append(text[current[0][0]:current[-1][1]])
+                carried, carried_tokens = [], 0
+                for previous in reversed(current):
+                    if carried_tokens + previous[2] > overlap or carried_tokens + previous[2] + unit[2] > budget:
+                        break
+                    carried.insert(0, previous)
+                    carried_tokens += previous[2]
+                current, current_tokens = carried, carried_tokens
+            current.append(unit)
+            current_tokens += unit[2]
+        chunks.append(text[current[0][0]:current[-1][1]])
+
+        return chunks
+
+    def split_value(self, key: str, value: Any, chunk_size: int, chunk_overlap: int) -> Optional[List[str]]:
+        """Chunks of a long value, None when it fits in a single entry"""
+        if not isinstance(value, str):
+            return None
+
+        if self.tokenizer is None:
+            if len(value.split()) > chunk_size:
+                return self.chunk_text(value, chunk_size, chunk_overlap)
+            return None
+
+        # Every token covers at least one byte, so most entries are known to
+        # fit without tokenizing them
+        text = f"{key}: {value}"
+        if len(text.encode('utf-8')) + 2 <= self.max_tokens or self._count_tokens([text])[0] + 2 <= self.max_tokens:
+            return None
+        return self.chunk_text_tokens(value, self._token_budget(key), self.token_overlap)
+
+    def bank_records(self, i: int, bank: Any, chunk_size: int, chunk_overlap: int) -> List[Tuple[str, str]]:
+        """Flattened, chunked (key, text) records of the i-th bank"""
+        if not isinstance(bank, dict):
+            return []
+
+        # Fetch and sanitize the bank name
+        raw_bank_name = bank.get('bank_information', {}).get('bank_name', f'Bank_{i}')
+        bank_name = raw_bank_name.lower().replace(' ', '_')  # Normalize name
+
+        logger.debug(f"Processing bank: {raw_bank_name}")
+
+        # Flatten the bank data
+        self.flattened_data = {}
+        self.flatten_dict(bank, parent_key=f"bank_{bank_name}")
+
+        # Post-process long text fields
+        records = []
+        for key, value in self.flattened_data.items():
+            chunks = self.split_value(key, value, chunk_size, chunk_overlap)
+            if chunks is not None:
+                for j, chunk in enumerate(chunks):
+                    records.append((f"{key}_chunk_{j}", chunk))
+            else:
+                records.append((key, value))
+
+        self.flattened_data = {}
+        return records
+
+    def iter_records(
+        self,
+        banks: Iterable[Any],
+        chunk_size: int = 200,
+        chunk_overlap: int = 50,
+        workers: int = 1
+    ) -> Iterator[Tuple[str, str]]:
+        """
+        Yield flattened, chunked (key, text) records bank by bank
+
+        Only a few banks' entries are held at a time, so memory is bounded by
+        the largest banks rather than the dataset.
+
+        Args:
+            banks: Bank objects in dataset order
+            chunk_size: Words per chunk of long values
+            chunk_overlap: Words shared by consecutive chunks
+            workers: Processes flattening banks in parallel; records are
+                still yielded in dataset order
+        """
+        if workers > 1:
+            yield from self._iter_records_parallel(banks, chunk_size, chunk_overlap, workers)
+            return
+
+        for i, bank in enumerate(banks):
+            yield from self.bank_records(i, bank, chunk_size, chunk_overlap)
+
+    def _iter_records_parallel(
+        self,
+        banks: Iterable[Any],
+        chunk_size: int,
+        chunk_overlap: int,
+        workers: int
+    ) -> Iterator[Tuple[str, str]]:
+        # The flattener, tokenizer included, is sent to each worker once
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_flatten_worker, initargs=(self,)) as executor:
+            pending = deque()
+            for i, bank in enumerate(banks):
+                pending.append(executor.submit(_flatten_bank, (i, bank, chunk_size, chunk_overlap)))
+                # Bounded window of banks in flight, drained in submission order
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
     def preprocess_json(
         self, 
         data: Union[Dict, List], 
         chunk_size: int = 200, 
-        chunk_overlap: int = 50
+        chunk_overlap: int = 50,
+        workers: int = 1
     ) -> Dict[str, str]:
         try:
-            self.flattened_data = {}  # Reset flattened data
-            
+            start = time.perf_counter()
+
             # Handle the banks data structure
             if isinstance(data, dict) and 'banks' in data:
                 banks_data = data['banks']
@@ -85,84 +364,106 @@ class JSONFlattener:
             else:
                 raise ValueError("Expected either a dictionary with 'banks' key or a list of banks")
 
-            # Process each bank
-            for i, bank in enumerate(banks_data):
-                if not isinstance(bank, dict):
-                    continue
-                
-                # Fetch and sanitize the bank name
-                raw_bank_name = bank.get('bank_information', {}).get('bank_name', f'Bank_{i}')
-                bank_name = raw_bank_name.lower().replace(' ', '_')  # Normalize name
-                
-                logger.info(f"Processing bank: {raw_bank_name}")
-                
-                # Flatten the bank data
-                self.flatten_dict(bank, parent_key=f"bank_{bank_name}")
-
-            # Post-process long text fields
-            chunked_data = {}
-            for key, value in self.flattened_data.items():
-                if isinstance(value, str) and len(value.split()) > chunk_size:
-                    chunks = self.chunk_text(value, chunk_size, chunk_overlap)
-                    for i, chunk in enumerate(chunks):
-                        chunk_key = f"{key}_chunk_{i}"
-                        chunked_data[chunk_key] = chunk
-                else:
-                    chunked_data[key] = value
+            chunked_data = dict(self.iter_records(banks_data, chunk_size, chunk_overlap, workers=workers))
 
-            logger.info(f"Flattened {len(banks_data)} banks into {len(chunked_data)} entries")
+            elapsed = time.perf_counter() - start
+            logger.info(
+                f"Flattened {len(banks_data)} banks into {len(chunked_data)} entries in {elapsed:.2f}s "
+                f"({len(chunked_data) / max(elapsed, 1e-9):.0f} entries/sec)"
+            )
             return chunked_data
 
         except Exception as e:
             logger.error(f"Error in preprocessing: {str(e)}")
             raise
 
+    def preprocess_file(
+        self,
+        input_file: str,
+        output_file: str,
+        chunk_size: int = 200,
+        chunk_overlap: int = 50,
+        workers: int = 1
+    ) -> int:
+        """
+        Stream banks from input_file and write the flattened entries to output_file
+
+        The output has the same format as dumping preprocess_json's result
+        with indent=2. Keys repeated across banks are written each time;
+        JSON loaders keep the last value, as preprocess_json does.
+
+        Returns:
+            Number of entries written
+        """
+        try:
+            start = time.perf_counter()
+            with JSONObjectWriter(output_file) as writer:
+                records = self.iter_records(iter_banks(input_file), chunk_size, chunk_overlap, workers=workers)
+                for key, value in records:
+                    writer.write(key, value)
+
+            elapsed = time.perf_counter() - start
+            logger.info(
+                f"Flattened {input_file} into {writer.count} entries in {elapsed:.2f}s "
+                f"({writer.count / max(elapsed, 1e-9):.0f} entries/sec)"
+            )
+            return writer.count
+
+        except Exception as e:
+            logger.error(f"Error in preprocessing: {str(e)}")
+            raise
+
+
+_worker_flattener: Optional['JSONFlattener'] = None
+
+def _init_flatten_worker(flattener: 'JSONFlattener') -> None:
+    global _worker_flattener
+    _worker_flattener = flattener
+
+def _flatten_bank(task: Tuple[int, Any, int, int]) -> List[Tuple[str, str]]:
+    """Process pool entry point of JSONFlattener.iter_records"""
+    i, bank, chunk_size, chunk_overlap = task
+    return _worker_flattener.bank_records(i, bank, chunk_size, chunk_overlap)
 
 def get_memory_usage() -> float:
     return psutil.Process().memory_percent()
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Flatten and chunk the bank dataset")
+    parser.add_argument('--workers', type=int, default=1, help="Processes flattening banks in parallel")
+    parser.add_argument('--tokenizer', default=DEFAULT_TOKENIZER, help="Tokenizer name or path long values are chunked with")
+    parser.add_argument('--word-chunks', action='store_true', help="Chunk long values by word count instead of tokens")
+    parser.add_argument('--max-tokens', type=int, default=384, help="Token limit of each embedded chunk")
+    parser.add_argument('--token-overlap', type=int, default=32, help="Tokens shared by consecutive chunks")
+    args = parser.parse_args()
+
     try:
         # Ensure data directory exists
         os.makedirs('data/processed', exist_ok=True)
 
-        # Load JSON data
+        # Stream banks from the input so memory stays bounded by one bank
         input_file = 'data/banks.json'
-        logger.info(f"Loading data from {input_file}")
-        
-        with open(input_file, 'r', encoding='utf-8') as file:
-            raw_data = json.load(file)
+        output_file = 'data/processed/flattened_data.json'
+        logger.info(f"Streaming data from {input_file} to {output_file}")
 
-        # Initialize and run flattener
-        flattener = JSONFlattener()
-        flattened_data = flattener.preprocess_json(
-            raw_data,
+        flattener = JSONFlattener(
+            tokenizer=None if args.word_chunks else args.tokenizer,
+            max_tokens=args.max_tokens,
+            token_overlap=args.token_overlap
+        )
+        num_entries = flattener.preprocess_file(
+            input_file,
+            output_file,
             chunk_size=200,
-            chunk_overlap=50
+            chunk_overlap=50,
+            workers=args.workers
         )
 
-        # Save processed data
-        output_file = 'data/processed/flattened_data.json'
-        logger.info(f"Saving processed data to {output_file}")
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(flattened_data, f, indent=2, ensure_ascii=False)
-
-        # Log statistics
-        if isinstance(raw_data, dict):
-            num_banks = len(raw_data.get('banks', []))
-        else:
-            num_banks = len(raw_data) if isinstance(raw_data, list) else 0
-            
         logger.info(f"Preprocessing completed successfully")
-        logger.info(f"Total banks processed: {num_banks}")
-        logger.info(f"Total flattened entries: {len(flattened_data)}")
-        
-        # Print sample of flattened data
-        logger.info("\nSample of flattened data (first 5 entries):")
-        for i, (key, value) in enumerate(list(flattened_data.items())[:5]):
-            logger.info(f"{key}: {value[:100]}...")
+        logger.info(f"Total flattened entries: {num_entries}")
 
     except Exception as e:
         logger.error(f"Preprocessing failed: {str(e)}")
-        raise
\ No newline at end of file
+        raise
@@ -1,29 +1,113 @@
-from transformers import pipeline
-from functools import lru_cache
-import torch
+import logging
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from cache import TTLCache
+from model_registry import get_pipeline
+
+logger = logging.getLogger(__name__)
+
+INTENT_ENGINES = ('finbert', 'prototype')
+
+# Example phrasings per banking intent; each intent's prototype is the mean
+# of their embeddings
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    'rates': [
+        "What is the interest rate on a fixed deposit?",
+        "Current savings account interest rate",
+        "Home loan interest rate of the bank",
+        "What is the base rate?",
+        "How much interest does a recurring deposit earn?",
+        "Personal loan rates"
+    ],
+    'branch': [
+        "Where is the nearest branch?",
+        "Branch locations in Kathmandu",
+        "Head office address and contact number",
+        "ATM locations near me",
+        "How many branches does the bank have?",
+        "Opening hours of the branch"
+    ],
+    'personnel': [
+        "Who is the CEO of the bank?",
+        "Name of the chairman",
+        "Board of directors members",
+        "Who is the branch manager?",
+        "Management team of the bank",
+        "Who is the company secretary?"
+    ],
+    'fees': [
+        "What are the charges for a debit card?",
+        "Service fee for opening an account",
+        "Annual fee of the credit card",
+        "Loan processing fee",
+        "Minimum balance penalty charges",
+        "Fund transfer charges"
+    ],
+    'calculation': [
+        "Calculate the EMI for a loan of 10 lakh for 5 years",
+        "How much interest will I earn on 1 lakh in a fixed deposit for 2 years?",
+        "Compute the monthly installment of a home loan",
+        "Estimate the maturity amount of my deposit",
+        "Work out the total interest payable on a loan",
+        "Find the returns on a recurring deposit"
+    ],
+    'general': [
+        "Tell me about the bank",
+        "When was the bank established?",
+        "What is the vision and mission of the bank?",
+        "What services does the bank offer?",
+        "Website and social media links of the bank",
+        "What types of savings accounts are available?"
+    ]
+}
 
 class IntentClassifier:
-    def __init__(self):
+    def __init__(self, batch_size: int = 32, cache_size: int = 4096, cache_ttl: Optional[float] = None):
+        """
+        Args:
+            batch_size: Queries per forward pass of classify_batch
+            cache_size: Queries whose class scores are kept, 0 disables
+            cache_ttl: Seconds cached scores stay valid, None for no expiry
+        """
         # Using a financial/banking specific BERT model
         self.model_name = "yiyanghkust/finbert-tone"
-        self._initialize_classifier()
+        self.batch_size = batch_size
+        # Loaded from the model registry by the first classification
+        self.classifier = None
+        # Sorted (label, score) pairs keyed on the query
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
 
-    @lru_cache(maxsize=1)
     def _initialize_classifier(self):
         """
-        Initialize the classifier with caching to avoid reloading
+        Initialize the classifier from the model registry, shared by every instance
         """
         try:
-            self.classifier = pipeline(
+            self.classifier = get_pipeline(
                 "text-classification",
-                model=self.model_name,
-                device=0 if torch.cuda.is_available() else -1,  # Use GPU if available
+                self.model_name,
                 top_k=None  # Return all possible classes with scores
             )
         except Exception as e:
             print(f"Error initializing classifier: {e}")
             raise
 
+    @staticmethod
+    def _build_result(scores: Sequence[Tuple[str, float]], confidence_threshold: float) -> dict:
+        """Classification dict from (label, score) pairs sorted by score"""
+        top_label, top_score = scores[0]
+        return {
+            'intent': top_label,
+            'confidence': top_score,
+            'all_intents': [
+                {
+                    'label': label,
+                    'score': score
+                }
+                for label, score in scores
+            ],
+            'is_confident': top_score >= confidence_threshold
+        }
+
     def classify_query(self, query: str, confidence_threshold: float = 0.3):
         """
         Classify query intent using FinBERT model and return intent with confidence score
@@ -35,55 +119,231 @@ class IntentClassifier:
         Returns:
             dict: Contains intent label and confidence score
         """
+        return self.classify_batch([query], confidence_threshold)[0]
+
+    def classify_batch(
+        self,
+        queries: List[str],
+        confidence_threshold: float = 0.3,
+        batch_size: Optional[int] = None
+    ) -> List[dict]:
+        """
+        Classify many queries, running uncached ones through the pipeline in batches
+
+        Args:
+            queries: Input queries, duplicates are classified once
+            confidence_threshold: Minimum confidence score to consider valid
+            batch_size: Queries per forward pass, self.batch_size by default
+
+        Returns:
+            One classify_query dict per query, in input order
+        """
         try:
-            # Get classification results
-            results = self.classifier(query)
-            
-            # Sort results by score
-            sorted_results = sorted(results[0], key=lambda x: x['score'], reverse=True)
-            
-            # Get top result
-            top_result = sorted_results[0]
-            
-            # Prepare response
-            classification_result = {
-                'intent': top_result['label'],
-                'confidence': float(top_result['score']),
-                'all_intents': [
-                    {
-                        'label': result['label'],
-                        'score': float(result['score'])
-                    }
-                    for result in sorted_results
-                ],
-                'is_confident': float(top_result['score']) >= confidence_threshold
-            }
-            
-            return classification_result
+            scores = [self.cache.get(query) for query in queries]
+            missing = list(dict.fromkeys(query for query, cached in zip(queries, scores) if cached is None))
+
+            if missing:
+                if self.classifier is None:
+                    self._initialize_classifier()
+
+                # A list input always yields one list of class scores per query
+                outputs = self.classifier(missing, batch_size=batch_size or self.batch_size, truncation=True)
+                computed = {}
+                for query, output in zip(missing, outputs):
+                    computed[query] = tuple(
+                        (result['label'], float(result['score']))
+                        for result in sorted(output, key=lambda x: x['score'], reverse=True)
+                    )
+                    self.cache.put(query, computed[query])
+                scores = [cached if cached is not None else computed[query] for query, cached in zip(queries, scores)]
+
+            return [self._build_result(query_scores, confidence_threshold) for query_scores in scores]
 
         except Exception as e:
             print(f"Error during classification: {e}")
-            return {
-                'intent': 'unknown',
-                'confidence': 0.0,
-                'all_intents': [],
-                'is_confident': False,
-                'error': str(e)
-            }
-
-def get_classifier():
+            return [
+                {
+                    'intent': 'unknown',
+                    'confidence': 0.0,
+                    'all_intents': [],
+                    'is_confident': False,
+                    'error': str(e)
+                }
+                for _ in queries
+            ]
+
+class PrototypeIntentClassifier:
     """
-    Singleton pattern to ensure we only create one instance of the classifier
+    Nearest-prototype intent classifier over sentence embeddings
+
+    Queries are embedded by the same encoder as the search, so a query
+    that is also searched costs no extra forward pass.
     """
-    if not hasattr(get_classifier, 'instance'):
-        get_classifier.instance = IntentClassifier()
-    return get_classifier.instance
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        examples: Optional[Dict[str, List[str]]] = None,
+        temperature: float = 0.05
+    ):
+        """
+        Args:
+            encode: Maps texts to normalized embeddings of shape (n, dimension),
+                e.g. SemanticSearch.embed_queries
+            examples: Example phrasings per intent, INTENT_EXAMPLES by default
+            temperature: Softmax temperature turning similarities into confidences
+        """
+        self.encode = encode
+        self.temperature = temperature
+        self.examples = examples or INTENT_EXAMPLES
+        self.labels = list(self.examples)
+        # Built by the first classification, so the encoder loads on first use
+        self._prototypes: Optional[np.ndarray] = None
+
+    @property
+    def prototypes(self) -> np.ndarray:
+        """Normalized prototype of each intent, shape (len(labels), dimension)"""
+        if self._prototypes is None:
+            try:
+                prototypes = []
+                for label in self.labels:
+                    centroid = np.asarray(self.encode(self.examples[label]), dtype=np.float32).mean(axis=0)
+                    prototypes.append(centroid / max(np.linalg.norm(centroid), 1e-12))
+                self._prototypes = np.vstack(prototypes)
+            except Exception as e:
+                logger.error(f"Error building intent prototypes: {str(e)}")
+                raise
+            logger.info(f"Built intent prototypes for {self.labels}")
+        return self._prototypes
+
+    def classify_query(
+        self,
+        query: str,
+        confidence_threshold: float = 0.3,
+        embedding: Optional[np.ndarray] = None
+    ) -> dict:
+        """
+        Classify query intent by its nearest prototype
+
+        Args:
+            query: The input query to classify
+            confidence_threshold: Minimum confidence score to consider valid
+            embedding: Normalized query embedding, computed with encode when omitted
+
+        Returns:
+            dict: Same fields as IntentClassifier.classify_query, plus the
+            cosine similarity to the chosen prototype
+        """
+        embeddings = None if embedding is None else np.asarray(embedding).reshape(1, -1)
+        return self.classify_batch([query], confidence_threshold, embeddings)[0]
+
+    def classify_batch(
+        self,
+        queries: List[str],
+        confidence_threshold: float = 0.3,
+        embeddings: Optional[np.ndarray] = None
+    ) -> List[dict]:
+        """
+        Classify many queries with one encode call and one similarity product
+
+        Args:
+            queries: Input queries
+            confidence_threshold: Minimum confidence score to consider valid
+            embeddings: Normalized query embeddings of shape (n, dimension),
+                computed with encode when omitted
+
+        Returns:
+            One classify_query dict per query, in input order
+        """
+        try:
+            if embeddings is None:
+                embeddings = self.encode(queries)
+
+            similarities = np.asarray(embeddings, dtype=np.float32) @ self.prototypes.T
+            scores = np.exp((similarities - similarities.max(axis=1, keepdims=True)) / self.temperature)
+            scores /= scores.sum(axis=1, keepdims=True)
+            orders = np.argsort(-scores, axis=1, kind='stable')
+
+            results = []
+            for query_scores, query_similarities, order in zip(scores, similarities, orders):
+                top = int(order[0])
+                results.append({
+                    'intent': self.labels[top],
+                    'confidence': float(query_scores[top]),
+                    'similarity': float(query_similarities[top]),
+                    'all_intents': [
+                        {
+                            'label': self.labels[i],
+                            'score': float(query_scores[i])
+                        }
+                        for i in order
+                    ],
+                    'is_confident': float(query_scores[top]) >= confidence_threshold
+                })
+            return results
+
+        except Exception as e:
+            logger.error(f"Error during intent classification: {str(e)}")
+            return [
+                {
+                    'intent': 'unknown',
+                    'confidence': 0.0,
+                    'all_intents': [],
+                    'is_confident': False,
+                    'error': str(e)
+                }
+                for _ in queries
+            ]
+
+def get_classifier(engine: str = 'finbert', semantic_search=None):
+    """
+    Singleton pattern to ensure we only create one instance of each classifier
+
+    Args:
+        engine: 'finbert' for the FinBERT pipeline, or 'prototype' for the
+            embedding prototype classifier
+        semantic_search: SemanticSearch whose encoder and embedding cache the
+            prototype engine shares; required for 'prototype'
+    """
+    if engine not in INTENT_ENGINES:
+        raise ValueError(f"Unknown intent engine '{engine}', expected one of {INTENT_ENGINES}")
+
+    if not hasattr(get_classifier, 'instances'):
+        get_classifier.instances = {}
+    if engine not in get_classifier.instances:
+        if engine == 'prototype':
+            if semantic_search is None:
+                raise ValueError("The prototype intent engine needs a SemanticSearch to embed queries")
+            get_classifier.instances[engine] = PrototypeIntentClassifier(semantic_search.embed_queries)
+        else:
+            get_classifier.instances[engine] = IntentClassifier()
+    return get_classifier.instances[engine]
 
 if __name__ == "__main__":
-    classifier = get_classifier()
-    query = "Where is the nearest branch?"
-    result = classifier.classify_query(query)
-    print(f"Query: {query}")
-    print(f"Intent: {result['intent']}")
-    print(f"Confidence: {result['confidence']:.4f}")
-    print(f"Is Confident: {result['is_confident']}")
\ No newline at end of file
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Classify query intents")
+    parser.add_argument('queries', nargs='*', default=["Where is the nearest branch?"])
+    parser.add_argument('--input', help="File of queries, one per line, e.g. replayed chat logs")
+    parser.add_argument('--engine', choices=INTENT_ENGINES, default='finbert')
+    parser.add_argument('--model', default='all-mpnet-base-v2', help="Encoder of the prototype engine")
+    args = parser.parse_args()
+
+    queries = args.queries
+    if args.input:
+        with open(args.input, 'r', encoding='utf-8') as file:
+            queries = [line.strip() for line in file if line.strip()]
+
+    semantic_search = None
+    if args.engine == 'prototype':
+        from search import SemanticSearch
+        semantic_search = SemanticSearch(model_name=args.model)
+
+    classifier = get_classifier(args.engine, semantic_search)
+    for query, result in zip(queries, classifier.classify_batch(queries)):
+        print(json.dumps({
+            'query': query,
+            'intent': result['intent'],
+            'confidence': round(result['confidence'], 4),
+            'is_confident': result['is_confident']
+        }, ensure_ascii=False))
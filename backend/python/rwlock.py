@@ -0,0 +1,48 @@
+from contextlib import contextmanager
+from threading import Condition, Lock
+
+class ReadWriteLock:
+    """
+    Lock allowing many concurrent readers or a single writer
+
+    Waiting writers block new readers, so a reload is not starved by a
+    steady stream of searches. Not reentrant.
+    """
+    def __init__(self):
+        self._condition = Condition(Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        """Hold the lock shared with other readers"""
+        with self._condition:
+            while self._writer or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        """Hold the lock exclusively"""
+        with self._condition:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._condition.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
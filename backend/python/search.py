@@ -187,17 +187,23 @@
 import logging
 import json
 import os
-from typing import List, Dict, Optional
-from dataclasses import dataclass
-from sentence_transformers import SentenceTransformer
+from typing import Any, List, Dict, Optional, Sequence, Tuple
+from dataclasses import dataclass, replace
 import numpy as np
 import faiss
-from threading import Lock
+from threading import Event, Thread
+from rwlock import ReadWriteLock
 import unicodedata
 import re
+import time
 from concurrent.futures import ThreadPoolExecutor
 from collections import Counter
 import math
+import atexit
+from cache import TTLCache
+from faiss_index import read_index_meta, make_search_params, file_fingerprint, exact_rerank, MMAP_FLAGS
+from key_store import KeyStore
+from model_registry import get_encoder
 
 logging.basicConfig(
     level=logging.INFO,
@@ -217,13 +223,52 @@ class SearchResult:
     similarity: float
     rank: int
 
+def clean_text(text: str) -> str:
+    """Clean and normalize text"""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = re.sub(r'[^\x20-\x7E]', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+def _file_signature(*paths: str) -> Tuple:
+    """(size, mtime) of each file, None for missing files"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+def _check_fingerprint(artifact: str, found: str, expected: Optional[str]):
+    """Reject an index artifact written by a different build than the metadata"""
+    if found != expected:
+        raise ValueError(
+            f"The {artifact} belongs to index build {found}, the metadata to {expected}"
+        )
+
 class CustomRanker:
-    """Simple implementation of keyword-based scoring"""
-    def __init__(self):
-        self.doc_freqs = Counter()
-        self.doc_lengths = []
+    """BM25 keyword scoring backed by an inverted index"""
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        
+        self.vocabulary: Dict[str, int] = {}
+        self.doc_lengths = np.zeros(0, dtype=np.int32)
         self.avg_doc_length = 0
         self.total_docs = 0
+        self.idf = np.zeros(0, dtype=np.float32)
+        
+        # Postings of term t live in [postings_offsets[t], postings_offsets[t + 1]),
+        # sorted by document id
+        self.postings_offsets = np.zeros(1, dtype=np.int64)
+        self.postings_docs = np.zeros(0, dtype=np.int32)
+        self.postings_tfs = np.zeros(0, dtype=np.int32)
+        # Precomputed BM25 contribution of each posting
+        self.postings_weights = np.zeros(0, dtype=np.float32)
+        # Index build the ranker was fitted for, recorded by save()
+        self.fingerprint: Optional[str] = None
         
     def preprocess(self, text: str) -> List[str]:
         """Tokenize text into words"""
@@ -232,192 +277,1031 @@ class CustomRanker:
         return text.split()
     
     def fit(self, documents: List[str]):
-        """Compute document frequencies and lengths"""
+        """Build the inverted index with term frequencies, lengths and IDF values"""
+        self.vocabulary = {}
         self.total_docs = len(documents)
         
-        # Compute document frequencies and lengths
-        for doc in documents:
+        term_ids, doc_ids, tfs = [], [], []
+        doc_lengths = np.zeros(self.total_docs, dtype=np.int32)
+        
+        for doc_id, doc in enumerate(documents):
             tokens = self.preprocess(doc)
-            self.doc_lengths.append(len(tokens))
+            doc_lengths[doc_id] = len(tokens)
+            
+            for term, tf in Counter(tokens).items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+        
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        # Stable sort keeps each posting list in document order
+        order = np.argsort(term_ids, kind='stable')
+        
+        self.postings_docs = np.asarray(doc_ids, dtype=np.int32)[order]
+        self.postings_tfs = np.asarray(tfs, dtype=np.int32)[order]
+        doc_freqs = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self.postings_offsets = np.concatenate(([0], np.cumsum(doc_freqs))).astype(np.int64)
+        
+        self.doc_lengths = doc_lengths
+        self.avg_doc_length = float(doc_lengths.mean()) if self.total_docs else 0.0
+        self.idf = np.log(
+            1 + (self.total_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)
+        ).astype(np.float32)
+        
+        self.postings_weights = self._bm25(
+            self.postings_tfs,
+            self.doc_lengths[self.postings_docs],
+            np.repeat(self.idf, doc_freqs)
+        ).astype(np.float32)
+    
+    def save(self, path: str):
+        """Write the fitted inverted index, replacing the file atomically"""
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        # np.savez appends .npz to names without it, so write through a file object
+        with open(f"{path}.tmp", 'wb') as file:
+            np.savez(
+                file,
+                k1=self.k1,
+                b=self.b,
+                terms=np.array(terms, dtype=str),
+                doc_lengths=self.doc_lengths,
+                idf=self.idf,
+                postings_offsets=self.postings_offsets,
+                postings_docs=self.postings_docs,
+                postings_tfs=self.postings_tfs,
+                postings_weights=self.postings_weights,
+                fingerprint=np.array(self.fingerprint or '')
+            )
+        os.replace(f"{path}.tmp", path)
+    
+    @classmethod
+    def load(cls, path: str) -> 'CustomRanker':
+        """Restore a ranker written by save() without re-tokenizing the corpus"""
+        with np.load(path, allow_pickle=False) as data:
+            ranker = cls(k1=float(data['k1']), b=float(data['b']))
+            ranker.vocabulary = {term: term_id for term_id, term in enumerate(data['terms'].tolist())}
+            ranker.doc_lengths = data['doc_lengths']
+            ranker.idf = data['idf']
+            ranker.postings_offsets = data['postings_offsets']
+            ranker.postings_docs = data['postings_docs']
+            ranker.postings_tfs = data['postings_tfs']
+            ranker.postings_weights = data['postings_weights']
+            ranker.fingerprint = str(data['fingerprint']) or None
+        
+        ranker.total_docs = len(ranker.doc_lengths)
+        ranker.avg_doc_length = float(ranker.doc_lengths.mean()) if ranker.total_docs else 0.0
+        return ranker
+    
+    def _bm25(self, tfs: np.ndarray, doc_lengths: np.ndarray, idf: np.ndarray) -> np.ndarray:
+        """BM25 weight of terms with the given frequencies and document lengths"""
+        norm = self.k1 * (1 - self.b + self.b * doc_lengths / max(self.avg_doc_length, 1e-9))
+        return idf * tfs * (self.k1 + 1) / (tfs + norm)
+    
+    def _query_terms(self, query: str) -> List[Tuple[int, int]]:
+        """(term id, query frequency) pairs for in-vocabulary query tokens"""
+        return [
+            (self.vocabulary[term], count)
+            for term, count in Counter(self.preprocess(query)).items()
+            if term in self.vocabulary
+        ]
+    
+    @staticmethod
+    def _normalize(scores: np.ndarray) -> np.ndarray:
+        """Normalize scores to [0, 1]"""
+        if scores.size and scores.max() > 0:
+            return scores / scores.max()
+        return scores
+    
+    def score_candidates(self, query: str, doc_ids: np.ndarray) -> np.ndarray:
+        """Score a candidate set of fitted documents by id, normalized to [0, 1]"""
+        return self.score_candidates_batch([query], np.asarray(doc_ids)[None, :])[0]
+    
+    def score_candidates_batch(self, queries: List[str], doc_ids: np.ndarray) -> np.ndarray:
+        """
+        Score one candidate row per query in bulk
+        
+        Each posting list is visited once for all queries containing its
+        term. Rows are normalized to [0, 1] independently; -1 padding
+        scores 0.
+        
+        Args:
+            queries: Query strings
+            doc_ids: Candidate document ids of shape (len(queries), n)
+        """
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        scores = np.zeros(doc_ids.shape, dtype=np.float32)
+        
+        term_rows: Dict[int, List[Tuple[int, int]]] = {}
+        for row, query in enumerate(queries):
+            for term_id, query_tf in self._query_terms(query):
+                term_rows.setdefault(term_id, []).append((row, query_tf))
+        
+        for term_id, entries in term_rows.items():
+            rows = np.array([row for row, _ in entries])
+            query_tfs = np.array([query_tf for _, query_tf in entries], dtype=np.float32)
+            
+            start, end = self.postings_offsets[term_id], self.postings_offsets[term_id + 1]
+            docs = self.postings_docs[start:end]
+            candidates = doc_ids[rows]
             
-            # Count unique terms in document
-            for term in set(tokens):
-                self.doc_freqs[term] += 1
+            positions = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+            matched = docs[positions] == candidates
+            weights = np.where(matched, self.postings_weights[start + positions], 0)
+            scores[rows] += query_tfs[:, None] * weights
         
-        self.avg_doc_length = sum(self.doc_lengths) / self.total_docs
+        row_max = scores.max(axis=1, keepdims=True) if scores.size else scores
+        return np.divide(scores, row_max, out=scores, where=row_max > 0)
+    
+    def retrieve(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Keyword retrieval over the whole fitted corpus
+        
+        Returns:
+            Tuple of (document ids, raw BM25 scores), best first, only
+            documents matching at least one query term
+        """
+        scores = np.zeros(self.total_docs, dtype=np.float32)
+        
+        for term_id, query_tf in self._query_terms(query):
+            start, end = self.postings_offsets[term_id], self.postings_offsets[term_id + 1]
+            scores[self.postings_docs[start:end]] += query_tf * self.postings_weights[start:end]
+        
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        
+        order = np.argsort(-scores[matched], kind='stable')
+        return matched[order], scores[matched[order]]
     
     def score(self, query: str, documents: List[str]) -> np.ndarray:
-        """Score documents using TF-IDF like scoring"""
-        query_tokens = self.preprocess(query)
-        scores = np.zeros(len(documents))
+        """Score arbitrary documents with the fitted IDF values"""
+        query_terms = Counter(
+            term for term in self.preprocess(query) if term in self.vocabulary
+        )
+        scores = np.zeros(len(documents), dtype=np.float32)
         
         for i, doc in enumerate(documents):
             doc_tokens = self.preprocess(doc)
-            doc_len = len(doc_tokens)
             term_freqs = Counter(doc_tokens)
             
-            score = 0
-            for term in query_tokens:
+            for term, query_tf in query_terms.items():
                 if term in term_freqs:
-                    tf = term_freqs[term]
-                    df = self.doc_freqs[term]
-                    if df > 0:
-                        idf = math.log((self.total_docs + 1) / (df + 0.5))
-                        score += (tf * idf) * (2.2 / (1.2 + 0.3 * (doc_len / self.avg_doc_length)))
-            
-            scores[i] = score
-        
-        # Normalize scores to [0, 1]
-        if scores.max() > 0:
-            scores = scores / scores.max()
+                    scores[i] += query_tf * self._bm25(
+                        term_freqs[term], len(doc_tokens), self.idf[self.vocabulary[term]]
+                    )
         
-        return scores
+        return self._normalize(scores)
+
+@dataclass
+class IndexSnapshot:
+    """Everything searches read from one index build, swapped in as a unit"""
+    index: Any
+    keys: Sequence[Tuple[str, str]]
+    ranker: CustomRanker
+    meta: Dict[str, Any]
+    fingerprint: str
+    signature: Tuple
+    # Float32 vectors of compressed indexes, memory-mapped for re-ranking
+    vectors: Optional[np.ndarray] = None
 
 class SemanticSearch:
+    FUSION_MODES = ('linear', 'rrf', 'weighted')
+    
     def __init__(
         self,
         model_name: str = 'all-mpnet-base-v2',
         top_k: int = 15,
         threshold: float = 0.3,
         semantic_weight: float = 0.7,
-        keyword_weight: float = 0.3
+        keyword_weight: float = 0.3,
+        fusion: str = 'linear',
+        rrf_k: int = 60,
+        candidate_k: Optional[int] = None,
+        embedding_cache_size: int = 1024,
+        embedding_cache_ttl: Optional[float] = 3600,
+        embedding_cache_file: Optional[str] = None,
+        result_cache_size: int = 512,
+        batch_size: int = 32,
+        encoder_backend: str = 'torch',
+        rerank_factor: int = 4
     ):
-        self.model = SentenceTransformer(model_name)
-        self.dimension = self.model.get_sentence_embedding_dimension()
+        """
+        Args:
+            threshold: Minimum cosine similarity of dense candidates, in every
+                fusion mode. Documents found by keyword retrieval in 'rrf' and
+                'weighted' mode are kept below it, since exact term hits are
+                the recall those modes add
+            fusion: 'linear' rescores the dense candidates with keyword scores;
+                'rrf' and 'weighted' run dense and full-corpus keyword
+                retrieval in parallel and fuse them by reciprocal rank or by
+                semantic_weight/keyword_weight
+            rrf_k: Rank offset of reciprocal-rank fusion
+            candidate_k: Depth of each retriever in hybrid modes, 2*top_k by default
+            embedding_cache_size: Cleaned queries whose embeddings are kept, 0 disables
+            embedding_cache_ttl: Seconds a cached query embedding stays valid
+            embedding_cache_file: Optional file the embedding cache is loaded
+                from at startup and spilled to at exit
+            result_cache_size: Complete search results kept per index build, 0 disables
+            batch_size: Encoder batch size of batch_search
+            encoder_backend: 'torch', or 'int8', 'onnx' or 'onnx_int8' for
+                faster CPU inference (see encoder_backends)
+            rerank_factor: Compressed indexes return rerank_factor times the
+                requested neighbours, re-ranked by exact similarity; 1 disables
+        """
+        if fusion not in self.FUSION_MODES:
+            raise ValueError(f"Unknown fusion mode '{fusion}', expected one of {self.FUSION_MODES}")
+        
+        # The encoder is loaded from the model registry on first use
+        self.model_name = model_name
+        self.encoder_backend = encoder_backend
         self.top_k = top_k
         self.threshold = threshold
         
         self.semantic_weight = semantic_weight
         self.keyword_weight = keyword_weight
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        self.candidate_k = candidate_k
+        self.rerank_factor = rerank_factor
+        self.batch_size = batch_size
         
-        self.index = None
-        self.keys = None
-        self.ranker = CustomRanker()
-        self.lock = Lock()
+        self.snapshot: Optional[IndexSnapshot] = None
+        self.index_files: Optional[Tuple[str, str, str]] = None
+        # Searches share the read side; swapping in an index takes the write side
+        self.lock = ReadWriteLock()
+        # Loads new index builds in the background, one at a time
+        self.reload_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='reload')
+        self._watch_stop = Event()
+        self._watch_thread: Optional[Thread] = None
+        # Runs keyword retrieval alongside the dense retrieval of hybrid searches
+        self.retrieval_pool = ThreadPoolExecutor(thread_name_prefix='lexical')
+        
+        # Normalized float32 query embeddings keyed on clean_text(query)
+        self.embedding_cache = TTLCache(maxsize=embedding_cache_size, ttl=embedding_cache_ttl)
+        self.embedding_cache_file = embedding_cache_file
+        if embedding_cache_file:
+            self._discard_pickled_cache(embedding_cache_file)
+            self.embedding_cache.load(embedding_cache_file)
+            atexit.register(self.save_caches)
+        
+        # Final results keyed on the query, search settings and index fingerprint
+        self.result_cache = TTLCache(maxsize=result_cache_size)
         
         logger.info(f"Initialized SemanticSearch with model {model_name}")
-        logger.info(f"Embedding dimension: {self.dimension}")
+    
+    @property
+    def model(self):
+        """Sentence encoder, shared through the model registry"""
+        return get_encoder(self.model_name, self.encoder_backend)
+    
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
 
     def clean_text(self, text: str) -> str:
         """Clean and normalize text"""
-        text = unicodedata.normalize('NFKD', str(text))
-        text = re.sub(r'[^\x20-\x7E]', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
+        return clean_text(text)
+
+    @property
+    def index(self):
+        return self.snapshot.index if self.snapshot else None
+
+    @property
+    def keys(self) -> Optional[Sequence[Tuple[str, str]]]:
+        return self.snapshot.keys if self.snapshot else None
+
+    @property
+    def ranker(self) -> Optional[CustomRanker]:
+        return self.snapshot.ranker if self.snapshot else None
+
+    @property
+    def index_meta(self) -> Dict[str, Any]:
+        return self.snapshot.meta if self.snapshot else {'index_type': 'flat', 'search_params': {}}
+
+    @property
+    def index_fingerprint(self) -> Optional[str]:
+        return self.snapshot.fingerprint if self.snapshot else None
+
+    def _load_snapshot(self, faiss_file: str, key_file: str, meta_file: str) -> IndexSnapshot:
+        """
+        Read an index build from disk without touching the live one
+        
+        save_faiss_index writes the key store, ranker and vectors before
+        the index, and the metadata last. Reading in the opposite order and
+        checking each file against the metadata's fingerprint and counts
+        rejects a build that is half written or was replaced mid-load.
+        """
+        signature = _file_signature(faiss_file, key_file, meta_file)
+        meta = read_index_meta(meta_file)
+        fingerprint = meta.get('fingerprint')
+        
+        # Memory-map the index so it is not copied into RAM and processes
+        # serving the same build share its pages
+        index = faiss.read_index(faiss_file, MMAP_FLAGS)
+        if meta.get('ntotal') is not None and index.ntotal != meta['ntotal']:
+            raise ValueError(
+                f"Index has {index.ntotal} vectors but its metadata records {meta['ntotal']}"
+            )
+        
+        # Builds with a key store and a saved ranker skip JSON parsing,
+        # cleaning and tokenizing every entry. Files the metadata names must
+        # exist; only indexes without them are loaded from key_file.
+        meta_dir = os.path.dirname(meta_file)
+        key_store_file = os.path.join(meta_dir, meta['key_store']) if meta.get('key_store') else None
+        ranker_file = os.path.join(meta_dir, meta['ranker']) if meta.get('ranker') else None
+        vectors_file = os.path.join(meta_dir, meta['vectors']) if meta.get('vectors') else None
+        
+        if key_store_file:
+            keys = KeyStore(key_store_file)
+            _check_fingerprint('key store', keys.fingerprint, fingerprint)
+        else:
+            with open(key_file, 'r', encoding='utf-8') as f:
+                raw_keys = json.load(f)
+            
+            keys = [
+                tuple(self.clean_text(str(item)) for item in key_pair)
+                for key_pair in raw_keys
+            ]
+        if index.ntotal != len(keys):
+            raise ValueError(
+                f"Mismatch between index vectors ({index.ntotal}) and keys ({len(keys)})"
+            )
+        
+        if ranker_file:
+            ranker = CustomRanker.load(ranker_file)
+            _check_fingerprint('keyword ranker', ranker.fingerprint, fingerprint)
+        else:
+            # Prepare ranker with documents
+            ranker = CustomRanker()
+            ranker.fit([content for content, _ in keys])
+        
+        vectors = None
+        if vectors_file:
+            # Named after the build's fingerprint, so a missing file means
+            # the metadata belongs to a build that is not there
+            if not os.path.exists(vectors_file):
+                raise ValueError(f"Re-rank vectors {vectors_file} of this build are missing")
+            vectors = np.load(vectors_file, mmap_mode='r')
+            if len(vectors) != index.ntotal:
+                raise ValueError(
+                    f"Mismatch between index vectors ({index.ntotal}) and re-rank vectors ({len(vectors)})"
+                )
+        
+        if _file_signature(meta_file) != signature[-1:]:
+            raise ValueError("Index metadata changed while the index was loading")
+        
+        return IndexSnapshot(
+            index=index,
+            keys=keys,
+            ranker=ranker,
+            meta=meta,
+            fingerprint=fingerprint or file_fingerprint(faiss_file, key_file),
+            signature=signature,
+            vectors=vectors
+        )
+
+    def _install(self, snapshot: IndexSnapshot):
+        """Swap in a loaded snapshot; the caller holds the write lock"""
+        if snapshot.fingerprint != self.index_fingerprint:
+            self.result_cache.clear()
+        self.snapshot = snapshot
+        logger.info(
+            f"Loaded {snapshot.meta['index_type']} index with {snapshot.index.ntotal} vectors "
+            f"(fingerprint {snapshot.fingerprint})"
+        )
 
     def load_index_and_keys(
         self,
         faiss_file: str = 'python/embeddings/vector_database.faiss',
-        key_file: str = 'python/embeddings/key_mapping.json'
+        key_file: str = 'python/embeddings/key_mapping.json',
+        meta_file: str = 'python/embeddings/index_meta.json'
     ):
         """Load index and prepare ranker"""
-        with self.lock:
-            try:
-                if not os.path.exists(faiss_file) or not os.path.exists(key_file):
-                    logger.warning("Index or key file not found. Starting with empty index.")
-                    return
+        try:
+            if not os.path.exists(faiss_file) or not os.path.exists(key_file):
+                logger.warning("Index or key file not found. Starting with empty index.")
+                return
 
-                self.index = faiss.read_index(faiss_file)
-                
-                with open(key_file, 'r', encoding='utf-8') as f:
-                    raw_keys = json.load(f)
-                
-                self.keys = [
-                    tuple(self.clean_text(str(item)) for item in key_pair)
-                    for key_pair in raw_keys
-                ]
-                
-                # Prepare ranker with documents
-                documents = [content for content, _ in self.keys]
-                self.ranker.fit(documents)
-                
-                logger.info(f"Loaded index with {self.index.ntotal} vectors")
+            self.index_files = (faiss_file, key_file, meta_file)
+            snapshot = self._load_snapshot(faiss_file, key_file, meta_file)
             
+            with self.lock.write():
+                self._install(snapshot)
+        
+        except Exception as e:
+            logger.error(f"Error loading index and keys: {str(e)}")
+            raise
+
+    def _reload(self) -> bool:
+        try:
+            snapshot = self._load_snapshot(*self.index_files)
+        except Exception as e:
+            logger.error(f"Index reload failed, keeping the current index: {str(e)}")
+            return False
+        
+        # Searches already running finish on the old snapshot before the swap
+        with self.lock.write():
+            self._install(snapshot)
+        return True
+
+    def reload(self, wait: bool = False):
+        """
+        Load the index files again in the background and swap them in
+        
+        The live index keeps serving while the new build loads. A failed
+        load, or files that do not belong to one build (counts or
+        fingerprints disagreeing with the metadata), leave it in place.
+        
+        Args:
+            wait: Block until the reload finished
+        
+        Returns:
+            Future resolving to whether the new build was installed
+        """
+        if not self.index_files:
+            raise ValueError("load_index_and_keys must be called before reload")
+        
+        future = self.reload_pool.submit(self._reload)
+        if wait:
+            future.result()
+        return future
+
+    def watch_index_files(self, interval: float = 10.0):
+        """
+        Reload automatically when the index files change on disk
+        
+        A change is only picked up once the files look the same on two
+        consecutive polls, so a build still being written is not loaded.
+        Files whose reload was rejected are not tried again until they
+        change once more.
+        
+        Args:
+            interval: Seconds between polls
+        """
+        if self._watch_thread and self._watch_thread.is_alive():
+            return
+        
+        def watch():
+            previous = None
+            rejected = None
+            while not self._watch_stop.wait(interval):
+                signature = _file_signature(*self.index_files)
+                # Settled only once the key store, ranker and vectors have stopped changing too
+                settled = signature + self._artifact_signature()
+                current = self.snapshot.signature if self.snapshot else None
+                if (signature != current and settled == previous and settled != rejected
+                        and None not in signature[:2]):
+                    logger.info("Index files changed, reloading")
+                    if not self.reload(wait=True).result():
+                        rejected = settled
+                previous = settled
+        
+        self._watch_stop.clear()
+        self._watch_thread = Thread(target=watch, name='index-watcher', daemon=True)
+        self._watch_thread.start()
+
+    def _artifact_signature(self) -> Tuple:
+        """File signature of the side artifacts the on-disk metadata references"""
+        meta_file = self.index_files[2]
+        try:
+            meta = read_index_meta(meta_file)
+        except (OSError, ValueError):
+            return (None,)
+        meta_dir = os.path.dirname(meta_file)
+        return _file_signature(*(
+            os.path.join(meta_dir, meta[name])
+            for name in ('key_store', 'ranker', 'vectors') if meta.get(name)
+        ))
+    
+    def stop_watching(self):
+        """Stop the thread started by watch_index_files"""
+        self._watch_stop.set()
+
+    @staticmethod
+    def _discard_pickled_cache(cache_file: str):
+        """
+        Remove the pickle spill file earlier versions kept next to cache_file
+
+        It is not unpickled, as it sits in a shared writable directory; the
+        queries it held are encoded again on first use.
+        """
+        pickled = f"{os.path.splitext(cache_file)[0]}.pkl"
+        if not os.path.exists(pickled):
+            return
+        logger.warning(f"Discarding pickled embedding cache {pickled}, its queries will be re-encoded")
+        try:
+            os.remove(pickled)
+        except OSError as e:
+            logger.warning(f"Could not remove {pickled}: {str(e)}")
+
+    def save_caches(self):
+        """Spill the query embedding cache to disk if a cache file is configured"""
+        if self.embedding_cache_file:
+            try:
+                self.embedding_cache.save(self.embedding_cache_file)
             except Exception as e:
-                logger.error(f"Error loading index and keys: {str(e)}")
-                raise
+                logger.warning(f"Could not save embedding cache: {str(e)}")
+    
+    def cache_stats(self) -> Dict[str, Dict]:
+        """Hit/miss counters of the search caches"""
+        return {
+            'embedding': self.embedding_cache.stats(),
+            'result': self.result_cache.stats()
+        }
+    
+    def _encode_batch(self, cleaned_queries: List[str]) -> np.ndarray:
+        """
+        Normalized float32 embeddings of cleaned queries, shape (n, dimension)
+        
+        Queries missing from the embedding cache are encoded in one forward pass.
+        """
+        embeddings = [self.embedding_cache.get(query) for query in cleaned_queries]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        
+        if missing:
+            encoded = self.model.encode(
+                [cleaned_queries[i] for i in missing],
+                batch_size=self.batch_size,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            ).astype(np.float32)
+            for i, embedding in zip(missing, encoded):
+                # Cached arrays are shared between callers
+                embedding.setflags(write=False)
+                self.embedding_cache.put(cleaned_queries[i], embedding)
+                embeddings[i] = embedding
+        
+        return np.vstack(embeddings)
+    
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Normalized float32 embeddings of raw queries, shape (n, dimension)
+        
+        Shares the embedding cache with search, so a query embedded here is
+        not encoded again when it is searched.
+        """
+        return self._encode_batch([self.clean_text(query) for query in queries])
+    
+    def _encode_cleaned(self, cleaned_query: str) -> np.ndarray:
+        """Normalized float32 embedding of a cleaned query, shape (1, dimension)"""
+        return self._encode_batch([cleaned_query])
+    
+    def _dense_search(
+        self,
+        query_embeddings: np.ndarray,
+        k: int,
+        nprobe: Optional[int],
+        ef_search: Optional[int]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """One FAISS call for all query rows, returning (similarities, ids) with -1 padding"""
+        search_params = make_search_params(
+            self.index_meta['index_type'],
+            nprobe=nprobe,
+            ef_search=ef_search,
+            defaults=self.index_meta.get('search_params')
+        )
+        vectors = self.snapshot.vectors
+        if vectors is not None and self.rerank_factor > 1:
+            # Over-fetch from the compressed index, then order exactly
+            _, indices = self.index.search(query_embeddings, k * self.rerank_factor, params=search_params)
+            return exact_rerank(vectors, query_embeddings, indices, k)
+        
+        distances, indices = self.index.search(query_embeddings, k, params=search_params)
+        
+        # Convert distances to similarities
+        return 1 - (distances / 2.0), indices
+    
+    def _dense_retrieve(
+        self,
+        cleaned_query: str,
+        k: int,
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+        stats: Dict[str, float]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Encode the query and return (similarities, document ids) of the FAISS hits"""
+        start = time.perf_counter()
+        query_embedding = self._encode_cleaned(cleaned_query)
+        stats['encode_ms'] = (time.perf_counter() - start) * 1000
+        
+        start = time.perf_counter()
+        similarities, indices = self._dense_search(query_embedding, k, nprobe, ef_search)
+        stats['dense_ms'] = (time.perf_counter() - start) * 1000
+        
+        # Approximate indexes pad missing neighbours with -1
+        valid = indices[0] >= 0
+        return similarities[0][valid], indices[0][valid]
+    
+    def _lexical_retrieve(
+        self,
+        cleaned_query: str,
+        k: int,
+        stats: Dict[str, float]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (document ids, BM25 scores) of the best keyword matches"""
+        start = time.perf_counter()
+        doc_ids, scores = self.ranker.retrieve(cleaned_query, k)
+        stats['lexical_ms'] = (time.perf_counter() - start) * 1000
+        return doc_ids, scores
+    
+    def _fuse(
+        self,
+        dense_ids: np.ndarray,
+        similarities: np.ndarray,
+        lexical_ids: np.ndarray,
+        lexical_scores: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Fuse dense and lexical rankings
+        
+        Returns:
+            Tuple of (document ids, fused scores in [0, 1], dense similarities),
+            where documents only found lexically have a similarity of 0. RRF
+            scores are scaled so rank 1 in both lists scores 1.
+        """
+        fused = {}
+        dense_similarity = dict(zip(dense_ids.tolist(), similarities.tolist()))
+        
+        if self.fusion == 'rrf':
+            for ranking in (dense_ids, lexical_ids):
+                for rank, doc_id in enumerate(ranking.tolist(), 1):
+                    fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (self.rrf_k + rank)
+            # A document ranked first by both retrievers scores 1
+            scale = 2.0 / (self.rrf_k + 1)
+            fused = {doc_id: score / scale for doc_id, score in fused.items()}
+        else:
+            keyword_scores = CustomRanker._normalize(lexical_scores)
+            for doc_id, similarity in dense_similarity.items():
+                fused[doc_id] = self.semantic_weight * similarity
+            for doc_id, keyword_score in zip(lexical_ids.tolist(), keyword_scores.tolist()):
+                fused[doc_id] = fused.get(doc_id, 0.0) + self.keyword_weight * keyword_score
+        
+        doc_ids = np.fromiter(fused.keys(), dtype=np.int64, count=len(fused))
+        scores = np.fromiter(fused.values(), dtype=np.float32, count=len(fused))
+        order = np.argsort(-scores, kind='stable')
+        doc_ids, scores = doc_ids[order], scores[order]
+        similarities = np.array([dense_similarity.get(doc_id, 0.0) for doc_id in doc_ids.tolist()])
+        return doc_ids, scores, similarities
+    
+    def _fused_results(
+        self,
+        dense_ids: np.ndarray,
+        similarities: np.ndarray,
+        lexical_ids: np.ndarray,
+        lexical_scores: np.ndarray,
+        top_k: int,
+        threshold: float
+    ) -> List[SearchResult]:
+        """
+        Fuse the hybrid candidates and turn them into SearchResults
+        
+        Dense candidates below threshold are dropped before fusion; keyword
+        candidates are all kept.
+        """
+        keep = similarities >= threshold
+        doc_ids, scores, fused_similarities = self._fuse(
+            dense_ids[keep], similarities[keep], lexical_ids, lexical_scores
+        )
+        return self._build_results(doc_ids, scores, fused_similarities, top_k)
+    
+    def _build_results(
+        self,
+        doc_ids: np.ndarray,
+        scores: np.ndarray,
+        similarities: np.ndarray,
+        top_k: int
+    ) -> List[SearchResult]:
+        """Turn ranked document ids into SearchResults"""
+        results = []
+        for rank, (doc_id, score, similarity) in enumerate(
+            zip(doc_ids[:top_k], scores[:top_k], similarities[:top_k]), 1
+        ):
+            if doc_id >= len(self.keys) or doc_id < 0:
+                continue
+            
+            content, source = self.keys[doc_id]
+            
+            results.append(SearchResult(
+                content=content,
+                source=source,
+                score=score,
+                similarity=similarity,
+                rank=rank
+            ))
+        
+        return results
+    
+    def _linear_search(
+        self,
+        cleaned_query: str,
+        top_k: int,
+        threshold: float,
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+        stats: Dict[str, float]
+    ) -> List[SearchResult]:
+        """Rescore the dense candidates with keyword scores"""
+        similarities, indices = self._dense_retrieve(
+            cleaned_query, top_k * 2, nprobe, ef_search, stats
+        )
+        if not len(indices):
+            return []
+        
+        # Get keyword-based scores from the inverted index
+        start = time.perf_counter()
+        keyword_scores = self.ranker.score_candidates(cleaned_query, indices)
+        stats['keyword_ms'] = (time.perf_counter() - start) * 1000
+        
+        return self._linear_results(indices, similarities, keyword_scores, top_k, threshold)
+    
+    def _linear_results(
+        self,
+        indices: np.ndarray,
+        similarities: np.ndarray,
+        keyword_scores: np.ndarray,
+        top_k: int,
+        threshold: float
+    ) -> List[SearchResult]:
+        """Combine dense similarities with keyword scores and rank the candidates"""
+        keep = similarities >= threshold
+        indices, similarities, keyword_scores = indices[keep], similarities[keep], keyword_scores[keep]
+        
+        final_scores = (
+            self.semantic_weight * similarities +
+            self.keyword_weight * keyword_scores
+        )
+        
+        # Sort by combined scores
+        sorted_indices = np.argsort(-final_scores)
+        
+        return self._build_results(
+            indices[sorted_indices],
+            final_scores[sorted_indices],
+            similarities[sorted_indices],
+            top_k
+        )
+    
+    def _hybrid_search(
+        self,
+        cleaned_query: str,
+        top_k: int,
+        threshold: float,
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+        stats: Dict[str, float]
+    ) -> List[SearchResult]:
+        """Run dense and full-corpus keyword retrieval in parallel and fuse them"""
+        depth = self.candidate_k or top_k * 2
+        
+        lexical_future = self.retrieval_pool.submit(
+            self._lexical_retrieve, cleaned_query, depth, stats
+        )
+        similarities, dense_ids = self._dense_retrieve(
+            cleaned_query, depth, nprobe, ef_search, stats
+        )
+        lexical_ids, lexical_scores = lexical_future.result()
+        
+        start = time.perf_counter()
+        results = self._fused_results(
+            dense_ids, similarities, lexical_ids, lexical_scores, top_k, threshold
+        )
+        stats['fusion_ms'] = (time.perf_counter() - start) * 1000
+        
+        return results
 
-    def search(
+    def _result_cache_key(
+        self,
+        cleaned_query: str,
+        top_k: int,
+        threshold: float,
+        nprobe: Optional[int],
+        ef_search: Optional[int]
+    ) -> tuple:
+        """Everything a search result depends on"""
+        return (
+            self.index_fingerprint, cleaned_query, top_k, threshold,
+            nprobe, ef_search, self.fusion, self.semantic_weight,
+            self.keyword_weight, self.rrf_k, self.candidate_k, self.rerank_factor
+        )
+
+    def search_with_stats(
         self,
         query: str,
         top_k: Optional[int] = None,
-        threshold: Optional[float] = None
-    ) -> List[SearchResult]:
+        threshold: Optional[float] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None
+    ) -> Tuple[List[SearchResult], Dict[str, float]]:
+        """Search and return per-stage latencies in milliseconds alongside the results"""
         search_top_k = top_k or self.top_k
-        search_threshold = threshold or self.threshold
+        search_threshold = threshold if threshold is not None else self.threshold
+        stats: Dict[str, float] = {}
+        start = time.perf_counter()
         
         try:
-            with self.lock:
+            with self.lock.read():
                 if not self.index or not self.keys:
                     raise ValueError("Index and keys must be loaded first")
                 
                 # Clean query
                 cleaned_query = self.clean_text(query)
                 
-                # Semantic search
-                query_embedding = self.model.encode([cleaned_query], normalize_embeddings=True)
-                distances, indices = self.index.search(query_embedding, search_top_k * 2)
-                
-                # Convert distances to similarities
-                similarities = 1 - (distances[0] / 2.0)
-                
-                # Get candidate documents
-                candidate_docs = [self.keys[idx][0] for idx in indices[0]]
-                
-                # Get keyword-based scores
-                keyword_scores = self.ranker.score(cleaned_query, candidate_docs)
-                
-                # Combine scores
-                final_scores = (
-                    self.semantic_weight * similarities +
-                    self.keyword_weight * keyword_scores
+                cache_key = self._result_cache_key(
+                    cleaned_query, search_top_k, search_threshold, nprobe, ef_search
                 )
+                cached = self.result_cache.get(cache_key)
                 
-                # Sort by combined scores
-                sorted_indices = np.argsort(-final_scores)
+                if cached is not None:
+                    results = [replace(result) for result in cached]
+                    stats['result_cache_hit'] = 1.0
+                else:
+                    if self.fusion == 'linear':
+                        results = self._linear_search(
+                            cleaned_query, search_top_k, search_threshold, nprobe, ef_search, stats
+                        )
+                    else:
+                        results = self._hybrid_search(
+                            cleaned_query, search_top_k, search_threshold, nprobe, ef_search, stats
+                        )
+                    self.result_cache.put(cache_key, tuple(replace(result) for result in results))
                 
-                # Create results
-                results = []
-                for rank, idx in enumerate(sorted_indices[:search_top_k], 1):
-                    if final_scores[idx] < search_threshold:
-                        continue
-                        
-                    orig_idx = indices[0][idx]
-                    if orig_idx >= len(self.keys) or orig_idx < 0:
-                        continue
-                    
-                    content, source = self.keys[orig_idx]
-                    
-                    results.append(SearchResult(
-                        content=content,
-                        source=source,
-                        score=final_scores[idx],
-                        similarity=similarities[idx],
-                        rank=rank
-                    ))
+                stats['total_ms'] = (time.perf_counter() - start) * 1000
                 
                 logger.info(f"Search Results for Query: '{query}'")
+                logger.info(
+                    "Search timings: " + ", ".join(f"{stage}={ms:.1f}" for stage, ms in stats.items())
+                )
                 for result in results:
                     logger.info(
                         f"Rank: {result.rank}, Score: {result.score:.4f}, "
                         f"Similarity: {result.similarity:.4f}, Content: {result.content[:1000]}"
                     )
                 
-                return results
+                return results, stats
         
         except Exception as e:
             logger.error(f"Error during search: {str(e)}")
-            return []
+            return [], stats
+
+    def search(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        threshold: Optional[float] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None
+    ) -> List[SearchResult]:
+        """
+        Hybrid semantic + keyword search
+
+        nprobe (IVF indexes) and ef_search (HNSW indexes) override the
+        defaults recorded in the index metadata for this query only.
+        """
+        results, _ = self.search_with_stats(query, top_k, threshold, nprobe, ef_search)
+        return results
+
+    def fit_fusion_weights(
+        self,
+        queries: List[str],
+        relevant: List[set],
+        top_k: Optional[int] = None,
+        steps: int = 11
+    ) -> Tuple[float, float]:
+        """
+        Learn semantic/keyword fusion weights by grid search on labelled queries
+        
+        Both retrievers run once per query; only the fusion is repeated for
+        each candidate weight. The best weights are kept and fusion switches
+        to 'weighted'.
+        
+        Args:
+            queries: Queries to evaluate
+            relevant: Relevant document ids for each query
+            top_k: Cut-off at which recall is measured
+            steps: Number of semantic weights tried between 0 and 1
+        
+        Returns:
+            Tuple of (semantic weight, recall@top_k reached with it)
+        """
+        search_top_k = top_k or self.top_k
+        depth = self.candidate_k or search_top_k * 2
+        
+        with self.lock.write():
+            retrieved = []
+            for query in queries:
+                cleaned_query = self.clean_text(query)
+                similarities, dense_ids = self._dense_retrieve(cleaned_query, depth, None, None, {})
+                lexical_ids, lexical_scores = self._lexical_retrieve(cleaned_query, depth, {})
+                retrieved.append((dense_ids, similarities, lexical_ids, lexical_scores))
+            
+            previous = (self.fusion, self.semantic_weight, self.keyword_weight)
+            self.fusion = 'weighted'
+            best_weight, best_recall = previous[1], -1.0
+            
+            for weight in np.linspace(0, 1, steps):
+                self.semantic_weight, self.keyword_weight = float(weight), float(1 - weight)
+                hits = [
+                    len(set(self._fuse(*candidates)[0][:search_top_k].tolist()) & expected) / len(expected)
+                    for candidates, expected in zip(retrieved, relevant) if expected
+                ]
+                recall = float(np.mean(hits)) if hits else 0.0
+                if recall > best_recall:
+                    best_weight, best_recall = float(weight), recall
+            
+            self.semantic_weight, self.keyword_weight = best_weight, 1 - best_weight
+        
+        logger.info(f"Learned fusion weights: semantic={best_weight:.2f}, recall@{search_top_k}={best_recall:.4f}")
+        return best_weight, best_recall
 
     def batch_search(
         self,
         queries: List[str],
         top_k: Optional[int] = None,
-        threshold: Optional[float] = None
+        threshold: Optional[float] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None
     ) -> List[List[SearchResult]]:
-        with ThreadPoolExecutor() as executor:
-            results = list(executor.map(
-                lambda q: self.search(q, top_k, threshold),
-                queries
-            ))
-        return results
\ No newline at end of file
+        """
+        Vectorized search over many queries
+        
+        Results match calling search() per query, but queries missing from
+        the result cache are encoded in one forward pass, searched with a
+        single FAISS call and rescored in bulk.
+        """
+        search_top_k = top_k or self.top_k
+        search_threshold = threshold if threshold is not None else self.threshold
+        results: List[Optional[List[SearchResult]]] = [None] * len(queries)
+        start = time.perf_counter()
+        
+        try:
+            with self.lock.read():
+                if not self.index or not self.keys:
+                    raise ValueError("Index and keys must be loaded first")
+                
+                cleaned_queries = [self.clean_text(query) for query in queries]
+                cache_keys = [
+                    self._result_cache_key(cleaned, search_top_k, search_threshold, nprobe, ef_search)
+                    for cleaned in cleaned_queries
+                ]
+                
+                # Unique cleaned queries that still need searching
+                pending: Dict[str, List[int]] = {}
+                for i, cache_key in enumerate(cache_keys):
+                    cached = self.result_cache.get(cache_key)
+                    if cached is not None:
+                        results[i] = [replace(result) for result in cached]
+                    else:
+                        pending.setdefault(cleaned_queries[i], []).append(i)
+                
+                if pending:
+                    pending_queries = list(pending)
+                    depth = (
+                        search_top_k * 2 if self.fusion == 'linear'
+                        else self.candidate_k or search_top_k * 2
+                    )
+                    
+                    if self.fusion != 'linear':
+                        lexical_futures = [
+                            self.retrieval_pool.submit(self.ranker.retrieve, query, depth)
+                            for query in pending_queries
+                        ]
+                    
+                    similarities, indices = self._dense_search(
+                        self._encode_batch(pending_queries), depth, nprobe, ef_search
+                    )
+                    
+                    if self.fusion == 'linear':
+                        keyword_scores = self.ranker.score_candidates_batch(pending_queries, indices)
+                    
+                    for row, query in enumerate(pending_queries):
+                        # Approximate indexes pad missing neighbours with -1
+                        valid = indices[row] >= 0
+                        
+                        if self.fusion == 'linear':
+                            query_results = self._linear_results(
+                                indices[row][valid], similarities[row][valid],
+                                keyword_scores[row][valid], search_top_k, search_threshold
+                            )
+                        else:
+                            lexical_ids, lexical_scores = lexical_futures[row].result()
+                            query_results = self._fused_results(
+                                indices[row][valid], similarities[row][valid],
+                                lexical_ids, lexical_scores, search_top_k, search_threshold
+                            )
+                        
+                        self.result_cache.put(
+                            cache_keys[pending[query][0]],
+                            tuple(replace(result) for result in query_results)
+                        )
+                        for i in pending[query]:
+                            results[i] = [replace(result) for result in query_results]
+                
+                logger.info(
+                    f"Batch searched {len(queries)} queries ({len(pending)} uncached) "
+                    f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+                )
+                return results
+        
+        except Exception as e:
+            logger.error(f"Error during batch search: {str(e)}")
+            return [result or [] for result in results]
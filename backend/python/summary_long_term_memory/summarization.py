@@ -1,16 +1,22 @@
+import os
+import sys
 import nltk
 import pandas as pd
 from sklearn.cluster import KMeans
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from scipy.spatial import distance_matrix
 
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from model_registry import get_encoder
+
 # Download necessary NLTK resources
 # nltk.download('punkt')
 # nltk.download('punkt_tab')
 
-# Initialize the model
-model = SentenceTransformer('stsb-roberta-base')
+# Loaded from the model registry on the first summary
+MODEL_NAME = 'stsb-roberta-base'
 
 def summarize_responses(article: str,num_cluster:int=10)->str:
 # Sample Article (fill this with the article you want to summarize)
@@ -22,6 +28,8 @@ def summarize_responses(article: str,num_cluster:int=10)->str:
     # Using Pandas to efficiently apply various transformations
     data = pd.DataFrame(sentences, columns=['sentence'])
 
+    model = get_encoder(MODEL_NAME)
+
     # Convert sentences to contextual dense vectors
     def get_sentence_embeddings(sentence):
         embedding = model.encode([sentence])
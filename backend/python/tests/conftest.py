@@ -0,0 +1,107 @@
+import os
+import sys
+import zlib
+
+import numpy as np
+import pytest
+
+# The backend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import encoder_backends
+import model_registry
+
+# (key, value) pairs of a small bank corpus
+DOCUMENTS = [
+    ('nabil bank home loan interest rate', '10.5% per annum'),
+    ('global ime bank personal loan interest rate', 'Up to 5 Years: 12.25%, Above 5 Years: 13.75%'),
+    ('global ime bank fixed deposit rate', '9%'),
+    ('himalayan bank savings account minimum balance', 'NPR 1000'),
+    ('nic asia bank debit card annual fee', 'NPR 500'),
+    ('everest bank education loan processing fee', '0.5%'),
+    ('nabil bank savings account interest rate', '5%'),
+    ('global ime bank home loan tenure', '25 years'),
+]
+
+class HashingEncoder:
+    """Bag-of-words encoder with the SentenceTransformer encode interface"""
+    dimension = 32
+
+    def __init__(self):
+        # Every text encoded so far, in order
+        self.encoded = []
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def encode(self, texts, normalize_embeddings=False, **kwargs):
+        self.encoded.extend(texts)
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                embeddings[row, zlib.crc32(word.encode()) % self.dimension] += 1
+        if normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-9)
+        return embeddings
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Empty model registry, installed for the duration of the test"""
+    registry = model_registry.ModelRegistry()
+    monkeypatch.setattr(model_registry, 'registry', registry)
+    return registry
+
+@pytest.fixture
+def encoder(monkeypatch, registry):
+    """HashingEncoder served by the model registry for every encoder name"""
+    encoder = HashingEncoder()
+    monkeypatch.setattr(encoder_backends, 'load_encoder', lambda *args, **kwargs: encoder)
+    return encoder
+
+@pytest.fixture
+def make_index(tmp_path, encoder):
+    """Builds an index of documents with save_faiss_index, returning its file paths"""
+    from embeddings import save_faiss_index
+
+    def make(directory=tmp_path, documents=DOCUMENTS, index_type='flat'):
+        files = {
+            'faiss_file': os.path.join(directory, 'vector_database.faiss'),
+            'key_file': os.path.join(directory, 'key_mapping.json'),
+            'meta_file': os.path.join(directory, 'index_meta.json')
+        }
+        embeddings = encoder.encode([content for content, _ in documents], normalize_embeddings=True)
+        save_faiss_index(embeddings, list(documents), index_type=index_type, **files)
+        return files
+
+    return make
+
+VOCABULARY = (
+    'bank banks loan loans rate rates interest home personal savings account fixed deposit fee '
+    'the a of for is and per annum years up to above minimum maximum nabil global ime everest '
+    'nic asia himalayan 1 2 3 4 5 6 7 8 9 0 % : . , ! ? ; - _ [ ] ( )'
+).split()
+
+@pytest.fixture(scope='session')
+def tiny_bert(tmp_path_factory):
+    """Directory of a small random BERT model with a fast WordPiece tokenizer"""
+    import json
+    import torch
+    from transformers import BertConfig, BertModel
+
+    directory = tmp_path_factory.mktemp('tiny_bert')
+    with open(directory / 'vocab.txt', 'w', encoding='utf-8') as file:
+        file.write('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + VOCABULARY) + '\n')
+    with open(directory / 'tokenizer_config.json', 'w', encoding='utf-8') as file:
+        json.dump({'tokenizer_class': 'BertTokenizerFast', 'do_lower_case': True, 'model_max_length': 64}, file)
+
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=len(VOCABULARY) + 5,
+        hidden_size=16,
+        num_hidden_layers=1,
+        num_attention_heads=2,
+        intermediate_size=32,
+        max_position_embeddings=64
+    )
+    BertModel(config).save_pretrained(str(directory))
+    return str(directory)
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+import cache
+from cache import TTLCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'time', lambda: now[0])
+    return now
+
+def test_entries_expire_after_ttl(clock):
+    ttl_cache = TTLCache(maxsize=4, ttl=10)
+    ttl_cache.put('a', 1)
+
+    clock[0] += 10
+    assert ttl_cache.get('a') == 1
+    clock[0] += 1
+    assert ttl_cache.get('a') is None
+    assert len(ttl_cache) == 0
+    assert ttl_cache.stats()['hits'] == 1
+    assert ttl_cache.stats()['misses'] == 1
+
+def test_least_recently_used_entry_is_evicted():
+    ttl_cache = TTLCache(maxsize=2)
+    ttl_cache.put('a', 1)
+    ttl_cache.put('b', 2)
+    ttl_cache.get('a')
+    ttl_cache.put('c', 3)
+
+    assert ttl_cache.get('b') is None
+    assert ttl_cache.get('a') == 1
+    assert ttl_cache.get('c') == 3
+
+def test_save_load_round_trip(tmp_path, clock):
+    path = str(tmp_path / 'cache.npz')
+    saved = TTLCache(maxsize=4, ttl=100)
+    for i, key in enumerate(['a', 'b', 'c']):
+        saved.put(key, np.full(3, i, dtype=np.float32))
+        clock[0] += 1
+
+    assert saved.save(path) == 3
+    assert not [name for name in tmp_path.iterdir() if name.suffix == '.tmp']
+
+    loaded = TTLCache(maxsize=4, ttl=100)
+    assert loaded.load(path) == 3
+    for i, key in enumerate(['a', 'b', 'c']):
+        np.testing.assert_array_equal(loaded.get(key), np.full(3, i, dtype=np.float32))
+
+    # Entries keep their original age, so they still expire on time
+    clock[0] += 98
+    expiring = TTLCache(maxsize=4, ttl=100)
+    assert expiring.load(path) == 2
+    assert expiring.get('a') is None
+
+def test_save_merges_entries_saved_by_others(tmp_path, clock):
+    path = str(tmp_path / 'cache.npz')
+    first, second = TTLCache(maxsize=4), TTLCache(maxsize=4)
+    first.put('a', np.zeros(2))
+    first.put('shared', np.zeros(2))
+    clock[0] += 1
+    second.put('shared', np.ones(2))
+
+    first.save(path)
+    assert second.save(path) == 2
+
+    loaded = TTLCache(maxsize=4)
+    loaded.load(path)
+    np.testing.assert_array_equal(loaded.get('a'), np.zeros(2))
+    np.testing.assert_array_equal(loaded.get('shared'), np.ones(2))
+
+def test_save_rejects_non_string_keys(tmp_path):
+    ttl_cache = TTLCache()
+    ttl_cache.put(('a', 1), np.zeros(2))
+    with pytest.raises(TypeError):
+        ttl_cache.save(str(tmp_path / 'cache.npz'))
+
+def test_save_skips_unchanged_caches(tmp_path):
+    path = tmp_path / 'cache.npz'
+    ttl_cache = TTLCache()
+    assert ttl_cache.save(str(path)) == 0
+    assert not path.exists()
+
+    ttl_cache.put('a', np.zeros(2))
+    assert ttl_cache.save(str(path)) == 1
+    written = path.stat().st_mtime_ns
+    assert ttl_cache.save(str(path)) == 0
+
+    reader = TTLCache()
+    reader.load(str(path))
+    reader.get('a')
+    assert reader.save(str(path)) == 0
+    assert path.stat().st_mtime_ns == written
+
+def test_failed_save_is_retried(tmp_path):
+    ttl_cache = TTLCache()
+    ttl_cache.put('a', np.zeros(2))
+    # A file where the cache directory should be
+    (tmp_path / 'blocked').write_text('')
+    with pytest.raises(OSError):
+        ttl_cache.save(str(tmp_path / 'blocked' / 'cache.npz'))
+
+    assert ttl_cache.save(str(tmp_path / 'cache.npz')) == 1
+
+def test_search_discards_pickled_cache(tmp_path):
+    from search import SemanticSearch
+
+    pickled = tmp_path / 'query_embedding_cache.pkl'
+    pickled.write_bytes(b'not unpickled')
+    SemanticSearch(embedding_cache_file=str(tmp_path / 'query_embedding_cache.npz'))
+    assert not pickled.exists()
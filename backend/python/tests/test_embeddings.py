@@ -0,0 +1,153 @@
+import os
+
+import numpy as np
+import pytest
+
+from embeddings import EmbeddingGenerator, load_embedding_cache, text_hash
+
+TEXTS = [f"bank_{i}.loan.interest_rate: {10 + i}%" for i in range(6)]
+
+@pytest.fixture
+def generator(encoder, tmp_path):
+    generator = EmbeddingGenerator(model_name='test-model', shard_dir=str(tmp_path / 'shards'))
+    # Load the encoder now, so its warm-up call is not counted
+    generator.model
+    encoder.encoded.clear()
+    return generator
+
+def test_incremental_build_only_encodes_changed_texts(generator, encoder, tmp_path):
+    cache_file = str(tmp_path / 'embedding_cache.npz')
+    first = generator.generate_embeddings_incremental(TEXTS, cache_file, show_progress=False)
+    assert encoder.encoded == TEXTS
+
+    changed = TEXTS[:2] + ['bank_2.loan.interest_rate: 99%'] + TEXTS[3:] + [TEXTS[0]]
+    encoder.encoded.clear()
+    second = generator.generate_embeddings_incremental(changed, cache_file, show_progress=False)
+
+    assert encoder.encoded == ['bank_2.loan.interest_rate: 99%']
+    np.testing.assert_array_equal(second[[0, 1, 3, 4, 5]], first[[0, 1, 3, 4, 5]])
+    np.testing.assert_array_equal(second[6], first[0])
+    np.testing.assert_array_equal(second, encoder.encode(changed))
+
+def test_incremental_build_drops_deleted_texts(generator, encoder, tmp_path):
+    cache_file = str(tmp_path / 'embedding_cache.npz')
+    generator.generate_embeddings_incremental(TEXTS, cache_file, show_progress=False)
+    generator.generate_embeddings_incremental(TEXTS[:3], cache_file, show_progress=False)
+
+    encoder.encoded.clear()
+    generator.generate_embeddings_incremental(TEXTS, cache_file, show_progress=False)
+    assert encoder.encoded == TEXTS[3:]
+
+def write_shards(generator, encoder, texts):
+    """Save every shard of texts as an earlier, interrupted run would have"""
+    generator._prepare_shard_dir(texts)
+    order = np.argsort([len(text) for text in texts], kind='stable')
+    for i, start in enumerate(range(0, len(texts), generator.shard_size)):
+        shard_texts = [texts[j] for j in order[start:start + generator.shard_size]]
+        np.save(os.path.join(generator.shard_dir, f"shard_{i:05d}.npy"), encoder.encode(shard_texts))
+
+def shard_files(generator):
+    return sorted(name for name in os.listdir(generator.shard_dir) if name.startswith('shard_'))
+
+def test_parallel_build_reuses_finished_shards(generator, encoder):
+    generator.shard_size = 2
+    texts = TEXTS + ['short', 'a much longer text than any of the others']
+    write_shards(generator, encoder, texts)
+    encoder.encoded.clear()
+
+    embeddings = generator.generate_embeddings_parallel(texts, show_progress=False)
+
+    # Every shard was on disk, so nothing was encoded again
+    assert encoder.encoded == []
+    np.testing.assert_array_equal(embeddings, encoder.encode(texts))
+    assert shard_files(generator) == []
+
+@pytest.mark.parametrize('change', ['texts', 'model', 'backend'])
+def test_shards_of_other_runs_are_discarded(generator, encoder, change):
+    generator.shard_size = 2
+    write_shards(generator, encoder, TEXTS)
+    texts = TEXTS
+    if change == 'texts':
+        texts = TEXTS[:-1] + ['bank_5.loan.interest_rate: 99%']
+    elif change == 'model':
+        generator.model_name = 'other-model'
+    else:
+        generator.backend = 'int8'
+
+    generator._prepare_shard_dir(texts)
+    assert shard_files(generator) == []
+
+def test_shards_of_the_same_run_are_kept(generator, encoder):
+    generator.shard_size = 2
+    write_shards(generator, encoder, TEXTS)
+
+    generator._prepare_shard_dir(list(TEXTS))
+    assert len(shard_files(generator)) == 3
+
+def test_token_budget_batches_respect_the_budget(generator):
+    generator.max_batch_tokens = 40
+    lengths = [3, 17, 5, 40, 9, 9, 2, 25, 1, 12]
+
+    batches = generator._token_budget_batches(lengths)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    order = [i for batch in batches for i in batch]
+    assert [lengths[i] for i in order] == sorted(lengths, reverse=True)
+    for batch in batches:
+        if len(batch) > 1:
+            assert len(batch) * max(lengths[i] for i in batch) <= generator.max_batch_tokens
+
+def test_manual_fallback_pooling_ignores_padding(registry, tiny_bert):
+    generator = EmbeddingGenerator(model_name=tiny_bert, max_batch_tokens=24)
+    generator.use_sentence_transformer = False
+    texts = [
+        'nabil bank home loan rate',
+        'global ime bank personal loan interest rate is 12 % per annum for up to 5 years',
+        'fee',
+        'everest bank fixed deposit rate'
+    ]
+
+    batched = generator.generate_embeddings(texts, show_progress=False)
+    alone = np.vstack([generator.generate_embeddings([text], show_progress=False) for text in texts])
+
+    assert batched.shape == (len(texts), 16)
+    np.testing.assert_allclose(batched, alone, atol=1e-5)
+    np.testing.assert_allclose(np.linalg.norm(batched, axis=1), 1.0, rtol=1e-5)
+
+def test_embedding_cache_is_keyed_on_the_backend(generator, encoder, tmp_path):
+    cache_file = str(tmp_path / 'embedding_cache.npz')
+    generator.generate_embeddings_incremental(TEXTS, cache_file, show_progress=False)
+    assert set(load_embedding_cache(cache_file, 'test-model', 'torch')) == {text_hash(text) for text in TEXTS}
+    assert load_embedding_cache(cache_file, 'test-model', 'onnx') == {}
+    assert load_embedding_cache(cache_file, 'other-model', 'torch') == {}
+
+    # Vectors of another backend are not mixed into the index
+    generator.backend = 'int8'
+    generator.model
+    encoder.encoded.clear()
+    generator.generate_embeddings_incremental(TEXTS, cache_file, show_progress=False)
+    assert encoder.encoded == TEXTS
+
+def test_embedding_cache_without_backend_is_ignored(tmp_path):
+    cache_file = str(tmp_path / 'embedding_cache.npz')
+    with open(cache_file, 'wb') as file:
+        np.savez(file, model_name=np.array('test-model'), hashes=np.array(['a' * 40]), vectors=np.zeros((1, 4)))
+
+    assert load_embedding_cache(cache_file, 'test-model', 'torch') == {}
+
+def test_encoders_are_shared_per_backend_and_thread_count(registry, monkeypatch):
+    import encoder_backends
+    from conftest import HashingEncoder
+    from model_registry import get_encoder
+
+    loads = []
+    monkeypatch.setattr(
+        encoder_backends, 'load_encoder',
+        lambda *args, **kwargs: loads.append((args, kwargs)) or HashingEncoder()
+    )
+
+    torch_encoder = get_encoder('test-model', 'torch', 'cpu')
+    assert get_encoder('test-model', 'torch', 'cpu') is torch_encoder
+    assert get_encoder('test-model', 'onnx', 'cpu') is not torch_encoder
+    assert get_encoder('test-model', 'onnx', 'cpu', num_threads=2) is not get_encoder('test-model', 'onnx', 'cpu')
+    assert len(loads) == 3
@@ -0,0 +1,32 @@
+import pytest
+
+from key_store import KeyStore, write_key_store
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'key_store.bin')
+    keys = [('nabil bank home loan rate', '10.5'), ('', 'empty content'), ('café', 'नेपाल')]
+    write_key_store(path, keys, fingerprint='0123456789abcdef')
+
+    store = KeyStore(path)
+    assert len(store) == len(keys)
+    assert list(store) == keys
+    assert store[-1] == keys[-1]
+    assert store[1:] == keys[1:]
+    assert store.fingerprint == '0123456789abcdef'
+    with pytest.raises(IndexError):
+        store[len(keys)]
+
+def test_empty_store(tmp_path):
+    path = str(tmp_path / 'key_store.bin')
+    write_key_store(path, [], fingerprint='fedcba9876543210')
+
+    store = KeyStore(path)
+    assert len(store) == 0
+    assert list(store) == []
+    assert store.fingerprint == 'fedcba9876543210'
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'key_store.bin'
+    path.write_bytes(b'not a key store')
+    with pytest.raises(ValueError):
+        KeyStore(str(path))
@@ -0,0 +1,261 @@
+import io
+import json
+import logging
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import main
+import query_intent
+
+def conversation(follow_up):
+    return {'query': '', 'response': '', 'follow_up': follow_up}
+
+@pytest.fixture
+def assistant(tmp_path, make_index, monkeypatch):
+    """Warm BankAssistant over the test corpus, classifying with the prototype engine"""
+    make_index()
+    monkeypatch.setattr(query_intent.get_classifier, 'instances', {}, raising=False)
+    return main.BankAssistant(intent_engine='prototype', embeddings_dir=str(tmp_path))
+
+def test_calculations_use_the_rates_of_their_own_request(assistant):
+    home_loan = assistant.process_query(conversation(
+        "calculate emi for nabil bank home loan of 100000 for 5 years"
+    ))
+    personal_loan = assistant.process_query(conversation(
+        "calculate emi for global ime bank personal loan of 100000 for 5 years"
+    ))
+    home_loan_again = assistant.process_query(conversation(
+        "calculate emi for nabil bank home loan of 100000 for 5 years"
+    ))
+
+    assert home_loan['calculation']['parameters']['rate'] == 10.5
+    assert personal_loan['calculation']['parameters']['min_rate'] == 12.25
+    assert personal_loan['calculation']['parameters']['max_rate'] == 13.75
+    assert home_loan_again['calculation'] == home_loan['calculation']
+
+class ScriptedAssistant:
+    """Answers with the follow-up after an optional delay, failing on request"""
+    def process_query(self, conversation_context, on_token=None):
+        follow_up = conversation_context['follow_up']
+        if follow_up.startswith('sleep'):
+            time.sleep(float(follow_up.split()[1]))
+        if follow_up == 'fail':
+            raise RuntimeError('assistant failed')
+        if on_token is not None:
+            for token in follow_up.split():
+                on_token(token)
+        return {'status': 'success', 'response': follow_up}
+
+def run_ndjson(monkeypatch, lines, assistant=None, **kwargs):
+    """Feed lines to run_ndjson, returning the parsed output frames"""
+    output = io.StringIO()
+    created = []
+
+    def create(**kwargs):
+        created.append(kwargs)
+        return assistant or ScriptedAssistant()
+
+    monkeypatch.setattr(main, 'BankAssistant', create)
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(''.join(line + '\n' for line in lines)))
+    monkeypatch.setattr(sys, '__stdout__', output)
+    main.run_ndjson(**kwargs)
+    run_ndjson.created = created
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+def request(follow_up, request_id=None):
+    payload = conversation(follow_up)
+    if request_id is not None:
+        payload['request_id'] = request_id
+    return json.dumps(payload)
+
+def test_ndjson_echoes_request_ids_in_input_order(monkeypatch):
+    frames = run_ndjson(monkeypatch, [request('first', 'a'), '', request('second', 7)])
+
+    assert [(frame['request_id'], frame['response']) for frame in frames] == [('a', 'first'), (7, 'second')]
+
+def test_ndjson_generates_missing_request_ids(monkeypatch):
+    frames = run_ndjson(monkeypatch, [request('first'), request('second')])
+
+    ids = [frame['request_id'] for frame in frames]
+    assert all(isinstance(request_id, str) and request_id for request_id in ids)
+    assert ids[0] != ids[1]
+
+def test_ndjson_workers_answer_in_completion_order(monkeypatch):
+    frames = run_ndjson(
+        monkeypatch, [request('sleep 0.5', 'slow'), request('fast', 'fast')], workers=2
+    )
+
+    assert [frame['request_id'] for frame in frames] == ['fast', 'slow']
+    assert frames[1]['response'] == 'sleep 0.5'
+
+def test_ndjson_reports_errors_and_keeps_going(monkeypatch):
+    frames = run_ndjson(monkeypatch, [
+        '{not json',
+        json.dumps({'request_id': 'partial', 'follow_up': 'missing fields'}),
+        request('fail', 'failing'),
+        request('after', 'after')
+    ])
+
+    assert [frame['status'] for frame in frames] == ['error', 'error', 'error', 'success']
+    assert frames[0]['response'] == 'Invalid JSON input'
+    assert frames[0]['request_id']
+    assert frames[1]['request_id'] == 'partial'
+    assert 'Missing required fields' in frames[1]['error']
+    assert frames[2]['request_id'] == 'failing'
+    assert frames[3]['response'] == 'after'
+
+def test_ndjson_calculations_keep_their_own_rates(monkeypatch, assistant):
+    frames = run_ndjson(monkeypatch, [
+        request("calculate emi for nabil bank home loan of 100000 for 5 years", 'home'),
+        request("calculate emi for global ime bank personal loan of 100000 for 5 years", 'personal')
+    ] * 3, assistant=assistant, workers=4)
+
+    assert len(frames) == 6
+    for frame in frames:
+        parameters = frame['calculation']['parameters']
+        if frame['request_id'] == 'home':
+            assert parameters['rate'] == 10.5
+        else:
+            assert (parameters['min_rate'], parameters['max_rate']) == (12.25, 13.75)
+
+def test_ndjson_sizes_the_ollama_pool_from_its_workers(monkeypatch):
+    run_ndjson(monkeypatch, [request('first')], workers=6)
+    assert run_ndjson.created == [{'ollama_pool_size': 6}]
+
+class CountingAssistant(ScriptedAssistant):
+    """Records the most requests it was answering at once"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def process_query(self, conversation_context, on_token=None):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            return super().process_query(conversation_context, on_token)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+def test_server_handles_at_most_max_concurrency_requests():
+    assistant = CountingAssistant()
+    server = main.BankAssistantServer(('127.0.0.1', 0), assistant, max_concurrency=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/query"
+
+    def post(follow_up):
+        with urllib.request.urlopen(urllib.request.Request(url, data=request(follow_up).encode())) as response:
+            return json.loads(response.read())
+
+    try:
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            results = list(executor.map(post, ['sleep 0.2'] * 6))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [result['response'] for result in results] == ['sleep 0.2'] * 6
+    assert assistant.peak == 2
+
+class ChattyAssistant(ScriptedAssistant):
+    """Logs through a library logger while it generates"""
+    def process_query(self, conversation_context, on_token=None):
+        logging.getLogger('chatty_library').warning('generating')
+        return super().process_query(conversation_context, on_token)
+
+@pytest.fixture
+def stdout(monkeypatch):
+    """Stands in for the real stdout, with a library log handler writing to it"""
+    output = io.StringIO()
+    monkeypatch.setattr(sys, '__stdout__', output)
+    library = logging.getLogger('chatty_library')
+    handler = logging.StreamHandler(output)
+    library.addHandler(handler)
+    yield output
+    library.removeHandler(handler)
+
+def run_once(monkeypatch, line, stream):
+    monkeypatch.setattr(main, 'BankAssistant', ChattyAssistant)
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(line + '\n'))
+    main.run_once(stream)
+
+def test_run_once_writes_one_json_line(monkeypatch, stdout):
+    run_once(monkeypatch, request('hello there'), stream=False)
+
+    lines = stdout.getvalue().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])['response'] == 'hello there'
+
+def test_run_once_streams_token_frames_then_a_final_frame(monkeypatch, stdout):
+    run_once(monkeypatch, request('hello there'), stream=True)
+
+    frames = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert frames[:-1] == [{'type': 'token', 'token': 'hello'}, {'type': 'token', 'token': 'there'}]
+    assert frames[-1]['type'] == 'final'
+    assert frames[-1]['response'] == 'hello there'
+
+def test_run_once_streams_errors_as_a_final_frame(monkeypatch, stdout):
+    run_once(monkeypatch, '{not json', stream=True)
+
+    frames = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert [(frame['type'], frame['status']) for frame in frames] == [('final', 'error')]
+
+def test_stdout_log_handlers_are_detached(stdout):
+    main._detach_stdout_handlers()
+    logging.getLogger('chatty_library').warning('after detaching')
+
+    assert stdout.getvalue() == ''
+    assert not any(handler.stream is stdout for handler in logging.getLogger('chatty_library').handlers)
+
+def test_ndjson_streams_frames_tagged_with_their_request(monkeypatch):
+    frames = run_ndjson(monkeypatch, [request('one two', 'a'), request('three', 'b')], stream=True)
+
+    assert frames == [
+        {'type': 'token', 'token': 'one', 'request_id': 'a'},
+        {'type': 'token', 'token': 'two', 'request_id': 'a'},
+        {'type': 'final', 'status': 'success', 'response': 'one two', 'request_id': 'a'},
+        {'type': 'token', 'token': 'three', 'request_id': 'b'},
+        {'type': 'final', 'status': 'success', 'response': 'three', 'request_id': 'b'},
+    ]
+
+@pytest.fixture
+def start_server():
+    servers = []
+
+    def start(stream):
+        server = main.BankAssistantServer(('127.0.0.1', 0), ScriptedAssistant(), stream)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_server_answers_queries(start_server):
+    url = start_server(stream=False)
+
+    with urllib.request.urlopen(f"{url}/health") as response:
+        assert json.loads(response.read()) == {'status': 'ok'}
+    with urllib.request.urlopen(urllib.request.Request(f"{url}/query", data=request('hello there').encode())) as response:
+        assert response.headers['Content-Type'].startswith('application/json')
+        assert json.loads(response.read())['response'] == 'hello there'
+
+def test_server_streams_ndjson_frames(start_server):
+    url = start_server(stream=True)
+
+    with urllib.request.urlopen(urllib.request.Request(f"{url}/query", data=request('hello there').encode())) as response:
+        assert response.headers['Content-Type'].startswith('application/x-ndjson')
+        frames = [json.loads(line) for line in response.read().decode('utf-8').splitlines()]
+
+    assert [frame['type'] for frame in frames] == ['token', 'token', 'final']
+    assert [frame['token'] for frame in frames[:2]] == ['hello', 'there']
+    assert frames[-1]['response'] == 'hello there'
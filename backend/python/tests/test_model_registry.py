@@ -0,0 +1,131 @@
+import threading
+import time
+
+import pytest
+
+import model_registry
+from model_registry import ModelRegistry, get_encoder, get_pipeline, get_transformer
+
+class Loader:
+    """Counts its calls, optionally sleeping or failing in them"""
+    def __init__(self, delay=0.0, failures=0):
+        self.calls = 0
+        self.delay = delay
+        self.failures = failures
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.calls <= self.failures:
+            raise RuntimeError('load failed')
+        return object()
+
+def test_models_are_loaded_once():
+    registry = ModelRegistry()
+    loader = Loader()
+
+    model = registry.get('model', loader)
+
+    assert registry.get('model', loader) is model
+    assert loader.calls == 1
+    assert registry.is_loaded('model')
+    assert not registry.is_loaded('other')
+
+def test_concurrent_gets_share_one_load():
+    registry = ModelRegistry()
+    loader = Loader(delay=0.05)
+    barrier = threading.Barrier(8)
+    models = []
+
+    def get():
+        barrier.wait()
+        models.append(registry.get('model', loader))
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loader.calls == 1
+    assert len(models) == 8 and all(model is models[0] for model in models)
+
+def test_failed_loads_are_not_cached():
+    registry = ModelRegistry()
+    loader = Loader(failures=1)
+
+    with pytest.raises(RuntimeError, match='load failed'):
+        registry.get('model', loader)
+    assert not registry.is_loaded('model')
+    assert 'model' not in registry.stats()['models']
+
+    registry.get('model', loader)
+    assert loader.calls == 2
+
+def test_unload_forgets_the_model_and_its_stats():
+    registry = ModelRegistry()
+    loader = Loader()
+    model = registry.get('model', loader)
+
+    registry.unload('model')
+    registry.unload('never loaded')
+
+    assert not registry.is_loaded('model')
+    assert 'model' not in registry.stats()['models']
+    assert registry.get('model', loader) is not model
+    assert loader.calls == 2
+
+def test_stats_report_each_load():
+    registry = ModelRegistry()
+    registry.get('slow', Loader(delay=0.02))
+    registry.get('fast', Loader())
+
+    stats = registry.stats()
+
+    assert set(stats['models']) == {'slow', 'fast'}
+    assert stats['models']['slow']['load_seconds'] >= 0.02
+    assert all(isinstance(entry['rss_mb'], float) for entry in stats['models'].values())
+    assert stats['process_rss_mb'] > 0
+
+def test_encoders_are_warmed_up_and_keyed_on_their_options(encoder, registry):
+    first = get_encoder('model', backend='torch', device='cpu')
+
+    assert encoder.encoded == ['warm up']
+    assert get_encoder('model', backend='torch', device='cpu') is first
+    get_encoder('model', backend='onnx', device='cpu')
+    get_encoder('model', backend='onnx', device='cpu', num_threads=2)
+    assert set(registry.stats()['models']) == {
+        'encoder:model:torch:cpu:None',
+        'encoder:model:onnx:cpu:None',
+        'encoder:model:onnx:cpu:2',
+    }
+    assert encoder.encoded == ['warm up'] * 3
+
+def test_transformers_are_shared_with_their_tokenizer(registry, tiny_bert):
+    model, tokenizer = get_transformer(str(tiny_bert), device='cpu')
+
+    assert get_transformer(str(tiny_bert), device='cpu')[0] is model
+    assert tokenizer.is_fast
+    assert registry.is_loaded(f"transformer:{tiny_bert}:cpu")
+
+def test_pipelines_are_keyed_on_their_options(registry, monkeypatch):
+    import transformers
+
+    created = []
+
+    def pipeline(task, model, device, **kwargs):
+        created.append((task, model, kwargs))
+        return object()
+
+    monkeypatch.setattr(transformers, 'pipeline', pipeline)
+    monkeypatch.setattr(model_registry.torch.cuda, 'is_available', lambda: False)
+
+    classifier = get_pipeline('text-classification', 'finbert', top_k=None, truncation=True)
+
+    assert get_pipeline('text-classification', 'finbert', truncation=True, top_k=None) is classifier
+    assert get_pipeline('text-classification', 'finbert', top_k=3) is not classifier
+    assert created == [
+        ('text-classification', 'finbert', {'top_k': None, 'truncation': True}),
+        ('text-classification', 'finbert', {'top_k': 3}),
+    ]
+    assert registry.is_loaded('pipeline:text-classification:finbert:top_k=None,truncation=True')
@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ollama_integration import OllamaIntegration
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so connection reuse can be counted
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def _send_json(self, status_code, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_chunk(self, body):
+        line = (json.dumps(body) + '\n').encode('utf-8')
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+        self.wfile.flush()
+
+    def do_GET(self):
+        self._send_json(200, {'models': [{'name': 'test-model'}]})
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.posts.append(payload)
+        if self.server.statuses:
+            status_code = self.server.statuses.pop(0)
+            if status_code != 200:
+                self._send_json(status_code, {'error': 'busy'})
+                return
+        if payload['prompt'] == 'hang':
+            time.sleep(1)
+
+        if not payload['stream']:
+            self._send_json(200, {'response': f" echo {payload['prompt']} ", 'done': True, 'total_tokens': 3})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for token in ['Hel', 'lo', ' world']:
+            self._send_chunk({'response': token, 'done': False})
+        if payload['prompt'] == 'broken':
+            self._send_chunk({'error': 'model crashed'})
+        self._send_chunk({'response': '', 'done': True, 'eval_count': 3})
+        self.wfile.write(b'0\r\n\r\n')
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server():
+    """Fake Ollama API on a free port; statuses lists the codes of the next POSTs"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeOllamaHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.posts = []
+    server.statuses = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def connect(server, **kwargs):
+    return OllamaIntegration(
+        model_name='test-model',
+        api_url=f"http://127.0.0.1:{server.server_address[1]}",
+        backoff_factor=0,
+        **kwargs
+    )
+
+def test_requests_share_a_keep_alive_connection(server):
+    ollama = connect(server)
+
+    responses = [ollama.ask_model(prompt) for prompt in ['a', 'b', 'c']]
+
+    assert [response.text for response in responses] == ['echo a', 'echo b', 'echo c']
+    assert server.connections == 1
+
+def test_unavailable_responses_are_retried(server):
+    server.statuses = [503, 502]
+    ollama = connect(server)
+
+    assert ollama.ask_model('retried').text == 'echo retried'
+    assert len(server.posts) == 3
+
+def test_retries_give_up_after_max_retries(server):
+    server.statuses = [503] * 3
+    ollama = connect(server, max_retries=2)
+
+    with pytest.raises(RuntimeError, match='503'):
+        ollama.ask_model('unavailable')
+    assert len(server.posts) == 3
+
+def test_read_timeouts_are_not_retried(server):
+    ollama = connect(server, read_timeout=0.2)
+
+    with pytest.raises(RuntimeError, match='Network error'):
+        ollama.ask_model('hang')
+    assert len(server.posts) == 1
+
+def test_pool_size_is_configurable(server):
+    ollama = connect(server, pool_maxsize=24)
+    adapter = ollama.session.get_adapter(ollama.api_url)
+    assert adapter.poolmanager.connection_pool_kw['maxsize'] == 24
+
+def test_streamed_tokens_are_passed_on_as_they_arrive(server):
+    ollama = connect(server)
+    tokens = []
+
+    response = ollama.ask_model('stream', stream=True, on_token=tokens.append)
+
+    assert tokens == ['Hel', 'lo', ' world']
+    assert response.text == 'Hello world'
+    assert server.posts[-1]['stream'] is True
+
+def test_stream_model_yields_chunks_through_the_final_one(server):
+    ollama = connect(server)
+
+    chunks = list(ollama.stream_model('stream'))
+
+    assert [chunk['response'] for chunk in chunks] == ['Hel', 'lo', ' world', '']
+    assert chunks[-1]['done'] and chunks[-1]['eval_count'] == 3
+    # The stream was read to its end, so the next request reuses the connection
+    ollama.ask_model('after')
+    assert server.connections == 1
+
+def test_stream_errors_raise(server):
+    ollama = connect(server)
+    tokens = []
+
+    with pytest.raises(RuntimeError, match='model crashed'):
+        ollama.ask_model('broken', stream=True, on_token=tokens.append)
+    assert tokens == ['Hel', 'lo', ' world']
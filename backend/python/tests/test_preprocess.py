@@ -0,0 +1,147 @@
+import json
+
+import ijson
+import pytest
+
+from preprocess import SENTENCE_BOUNDARY, JSONFlattener, iter_banks
+
+SENTENCES = [
+    'Nabil bank home loan interest rate is 10.5% per annum.',
+    'The minimum fixed deposit for savings account is 5000!',
+    'Global ime bank personal loan rates: up to 5 years 12.25%, above 5 years 13.75%.',
+    'Is the fee per annum?',
+]
+
+BANKS = [
+    {
+        'name': 'Quote " and backslash \\ bank',
+        'rates': {'home loan': 10.5, 'fee': -1.25e-3},
+        'tags': ['a/b', 'tab\there', ['nested', [1, 2]]],
+    },
+    {'name': 'café 😀', 'open': True, 'branch': None, 'note': 'line\nbreak'},
+    {},
+]
+
+def write_json(path, data):
+    # ASCII-escaped, so \uXXXX sequences and surrogate pairs are decoded too
+    path.write_text(json.dumps(data, ensure_ascii=True), encoding='utf-8')
+    return str(path)
+
+@pytest.mark.parametrize('document', [BANKS, {'source': 'test', 'banks': BANKS}, {'banks': BANKS, 'count': 3}])
+def test_iter_banks_streams_both_layouts(tmp_path, document):
+    assert list(iter_banks(write_json(tmp_path / 'banks.json', document))) == BANKS
+
+def test_iter_banks_keeps_numbers_as_floats(tmp_path):
+    banks = list(iter_banks(write_json(tmp_path / 'banks.json', [{'rate': 12.25, 'branches': 7}])))
+    assert banks == [{'rate': 12.25, 'branches': 7}]
+    assert type(banks[0]['rate']) is float
+
+@pytest.mark.parametrize('document', [{'name': 'no banks'}, {'banks': {'name': 'not a list'}}, 'banks', 42])
+def test_iter_banks_rejects_other_layouts(tmp_path, document):
+    with pytest.raises(ValueError):
+        list(iter_banks(write_json(tmp_path / 'banks.json', document)))
+
+def test_iter_banks_raises_on_truncated_input(tmp_path):
+    path = tmp_path / 'banks.json'
+    path.write_text('[{"name": "unterminated', encoding='utf-8')
+    with pytest.raises(ijson.JSONError):
+        list(iter_banks(str(path)))
+
+@pytest.fixture
+def tokenizer(tiny_bert):
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(str(tiny_bert))
+
+def test_preprocess_file_matches_preprocess_json(tmp_path, tokenizer):
+    banks = [{'name': f'bank {i}', 'details': {'about': ' '.join(['word'] * 450), 'rates': [i, i + 0.5]}} for i in range(3)]
+    output_file = tmp_path / 'flattened.json'
+
+    count = JSONFlattener(tokenizer=tokenizer, max_tokens=48).preprocess_file(write_json(tmp_path / 'banks.json', {'banks': banks}), str(output_file))
+
+    expected = JSONFlattener(tokenizer=tokenizer, max_tokens=48).preprocess_json(banks)
+    assert any('_chunk_' in key for key in expected)
+    assert json.loads(output_file.read_text(encoding='utf-8')) == expected
+    assert count == len(expected)
+
+def test_flatten_mixes_dict_and_list_keys():
+    flattener = JSONFlattener(tokenizer=None)
+    flattener.flatten_dict({'bank': {'loans': [{'rate': 10.5}, [1, None]], 'open': True}})
+    assert flattener.flattened_data == {
+        'bank.loans[0].rate': '10.5',
+        'bank.loans[1][0]': '1',
+        'bank.loans[1][1]': 'None',
+        'bank.open': 'True',
+    }
+
+def test_flatten_handles_nesting_past_the_recursion_limit():
+    depth = 5000
+    document = leaf = {}
+    for _ in range(depth):
+        child = {'items': [{}]}
+        leaf['level'] = child
+        leaf = child['items'][0]
+    leaf['rate'] = 12.25
+
+    flattener = JSONFlattener(tokenizer=None)
+    flattener.flatten_dict(document)
+
+    assert flattener.flattened_data == {'.'.join(['level.items[0]'] * depth) + '.rate': '12.25'}
+
+def embedded_tokens(tokenizer, key, text):
+    return len(tokenizer(f"{key}: {text}")['input_ids'])
+
+@pytest.mark.parametrize('max_tokens', [40, 48, 64])
+def test_token_chunks_fit_the_encoder(tokenizer, max_tokens):
+    value = ' '.join(SENTENCES * 6)
+    flattener = JSONFlattener(tokenizer=tokenizer, max_tokens=max_tokens, token_overlap=8)
+
+    records = flattener.bank_records(0, {'bank_information': {'bank_name': 'Nabil Bank', 'about': value}}, 200, 50)
+
+    assert len(records) > 2
+    for key, chunk in records[1:]:
+        assert key.startswith('bank_nabil_bank.bank_information.about_chunk_')
+        assert embedded_tokens(tokenizer, key, chunk) <= max_tokens
+        assert chunk in value
+
+def test_token_chunks_follow_sentence_boundaries(tokenizer):
+    value = ' '.join(SENTENCES * 3)
+    flattener = JSONFlattener(tokenizer=tokenizer, max_tokens=48, token_overlap=0)
+
+    chunks = flattener.split_value('about', value, 200, 50)
+
+    assert len(chunks) > 1
+    sentences = set(SENTENCES)
+    for chunk in chunks:
+        assert all(sentence in sentences for sentence in SENTENCE_BOUNDARY.split(chunk))
+    # Without overlap the chunks cover the value exactly once
+    assert ' '.join(chunks) == value
+
+def test_token_chunks_overlap_by_whole_sentences(tokenizer):
+    flattener = JSONFlattener(tokenizer=tokenizer, max_tokens=48, token_overlap=20)
+
+    chunks = flattener.split_value('about', ' '.join(SENTENCES * 3), 200, 50)
+
+    for previous, chunk in zip(chunks, chunks[1:]):
+        first = SENTENCE_BOUNDARY.split(chunk)[0]
+        assert previous.endswith(first)
+
+def test_short_values_are_not_chunked(tokenizer):
+    flattener = JSONFlattener(tokenizer=tokenizer, max_tokens=48)
+    assert flattener.split_value('rate', SENTENCES[0], 200, 50) is None
+    assert flattener.split_value('rate', 10.5, 200, 50) is None
+
+def test_slow_tokenizers_are_rejected(tokenizer):
+    class SlowTokenizer:
+        is_fast = False
+
+        def __call__(self, texts, **kwargs):
+            return tokenizer(texts, **kwargs)
+
+    with pytest.raises(ValueError, match='fast tokenizer'):
+        JSONFlattener(tokenizer=SlowTokenizer())
+
+def test_word_chunks_without_a_tokenizer():
+    flattener = JSONFlattener(tokenizer=None)
+    chunks = flattener.split_value('about', ' '.join(f'w{i}' for i in range(450)), 200, 50)
+    assert [len(chunk.split()) for chunk in chunks] == [200, 200, 150]
+    assert chunks[1].split()[0] == 'w150'
@@ -0,0 +1,185 @@
+import inspect
+
+import pytest
+
+import main
+import query_intent
+from conftest import HashingEncoder
+from query_intent import PrototypeIntentClassifier, get_classifier
+
+EXAMPLES = {
+    'rates': ['interest rate', 'loan interest rate', 'deposit rate'],
+    'branch': ['branch address', 'nearest atm location', 'branch hours'],
+    'fees': ['card fee', 'service charge', 'processing fee'],
+}
+
+@pytest.fixture
+def hashing():
+    encoder = HashingEncoder()
+    encoder.calls = 0
+
+    def encode(texts):
+        encoder.calls += 1
+        return encoder.encode(texts, normalize_embeddings=True)
+
+    encoder.normalized = encode
+    return encoder
+
+@pytest.fixture
+def prototype(hashing):
+    return PrototypeIntentClassifier(hashing.normalized, examples=EXAMPLES)
+
+@pytest.fixture(autouse=True)
+def fresh_classifiers(monkeypatch):
+    monkeypatch.setattr(get_classifier, 'instances', {}, raising=False)
+
+def test_bank_assistant_defaults_to_finbert():
+    assert inspect.signature(main.BankAssistant).parameters['intent_engine'].default == 'finbert'
+
+@pytest.mark.parametrize('query, intent', [
+    ('what is the interest rate', 'rates'),
+    ('address of the branch', 'branch'),
+    ('annual card fee', 'fees'),
+])
+def test_prototype_picks_the_nearest_intent(prototype, query, intent):
+    result = prototype.classify_query(query)
+
+    assert result['intent'] == intent
+    scores = [entry['score'] for entry in result['all_intents']]
+    assert [entry['label'] for entry in result['all_intents']][0] == intent
+    assert sorted(scores, reverse=True) == scores
+    assert sum(scores) == pytest.approx(1.0)
+    assert result['confidence'] == scores[0]
+    assert -1.0 <= result['similarity'] <= 1.0
+
+def test_prototype_confidence_threshold(prototype):
+    result = prototype.classify_query('interest rate', confidence_threshold=0.0)
+    assert result['is_confident']
+    assert not prototype.classify_query('interest rate', confidence_threshold=1.01)['is_confident']
+
+def test_prototype_temperature_sharpens_confidence(hashing):
+    sharp = PrototypeIntentClassifier(hashing.normalized, examples=EXAMPLES, temperature=0.01)
+    flat = PrototypeIntentClassifier(hashing.normalized, examples=EXAMPLES, temperature=1.0)
+    assert sharp.classify_query('interest rate')['confidence'] > flat.classify_query('interest rate')['confidence']
+
+def test_prototype_uses_a_given_embedding(prototype, hashing):
+    prototype.prototypes
+    calls = hashing.calls
+    embedding = hashing.encode(['branch address'], normalize_embeddings=True)[0]
+
+    assert prototype.classify_query('ignored', embedding=embedding)['intent'] == 'branch'
+    assert hashing.calls == calls
+
+def test_prototype_reports_encoder_failures():
+    def encode(texts):
+        raise RuntimeError('encoder unavailable')
+
+    result = PrototypeIntentClassifier(encode, examples=EXAMPLES).classify_query('interest rate')
+    assert result['intent'] == 'unknown'
+    assert not result['is_confident']
+    assert 'encoder unavailable' in result['error']
+
+def test_get_classifier_rejects_unknown_engines():
+    with pytest.raises(ValueError, match='Unknown intent engine'):
+        get_classifier('keywords')
+
+def test_prototype_engine_needs_a_search():
+    with pytest.raises(ValueError, match='SemanticSearch'):
+        get_classifier('prototype')
+
+def test_get_classifier_returns_one_instance_per_engine(hashing):
+    class Search:
+        embed_queries = staticmethod(hashing.normalized)
+
+    prototype = get_classifier('prototype', Search())
+    assert isinstance(prototype, PrototypeIntentClassifier)
+    assert get_classifier('prototype', Search()) is prototype
+    finbert = get_classifier('finbert')
+    assert isinstance(finbert, query_intent.IntentClassifier)
+    assert get_classifier() is finbert
+
+class FakePipeline:
+    """Text-classification pipeline scoring each query by its length"""
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, queries, batch_size, truncation):
+        self.calls.append((list(queries), batch_size, truncation))
+        if self.fail:
+            raise RuntimeError('pipeline failed')
+        outputs = []
+        for query in queries:
+            positive = (len(query) % 10) / 10
+            outputs.append([
+                {'label': 'Neutral', 'score': 0.0},
+                {'label': 'Negative', 'score': 1 - positive},
+                {'label': 'Positive', 'score': positive},
+            ])
+        return outputs
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    pipeline = FakePipeline()
+    loads = []
+
+    def get_pipeline(task, model_name, **kwargs):
+        loads.append((task, model_name, kwargs))
+        return pipeline
+
+    monkeypatch.setattr(query_intent, 'get_pipeline', get_pipeline)
+    pipeline.loads = loads
+    return pipeline
+
+def test_batch_classification_matches_single_queries(pipeline):
+    classifier = query_intent.IntentClassifier()
+    queries = ['interest rate', 'branch address of the bank', 'card fee']
+
+    batch = classifier.classify_batch(queries)
+
+    assert batch == [query_intent.IntentClassifier().classify_query(query) for query in queries]
+    assert pipeline.loads[0] == ('text-classification', 'yiyanghkust/finbert-tone', {'top_k': None})
+    assert batch[0]['all_intents'][0]['score'] >= batch[0]['all_intents'][1]['score']
+
+def test_duplicate_queries_are_classified_once(pipeline):
+    classifier = query_intent.IntentClassifier(batch_size=4)
+
+    results = classifier.classify_batch(['interest rate', 'card fee', 'interest rate'], batch_size=2)
+
+    assert pipeline.calls == [(['interest rate', 'card fee'], 2, True)]
+    assert results[0] == results[2]
+
+def test_cached_queries_skip_the_pipeline(pipeline):
+    classifier = query_intent.IntentClassifier(batch_size=4)
+    first = classifier.classify_batch(['interest rate', 'card fee'])
+
+    second = classifier.classify_batch(['card fee', 'branch hours', 'interest rate'], confidence_threshold=0.9)
+
+    assert pipeline.calls == [(['interest rate', 'card fee'], 4, True), (['branch hours'], 4, True)]
+    assert [result['intent'] for result in second] == [first[1]['intent'], second[1]['intent'], first[0]['intent']]
+    # The threshold is applied on every call, not cached with the scores
+    assert second[2]['is_confident'] == (first[0]['confidence'] >= 0.9)
+
+def test_disabled_cache_classifies_every_call(pipeline):
+    classifier = query_intent.IntentClassifier(cache_size=0)
+    classifier.classify_query('interest rate')
+    classifier.classify_query('interest rate')
+    assert len(pipeline.calls) == 2
+
+def test_pipeline_failures_return_unknown_intents(pipeline):
+    pipeline.fail = True
+
+    results = query_intent.IntentClassifier().classify_batch(['interest rate', 'card fee'])
+
+    assert [result['intent'] for result in results] == ['unknown', 'unknown']
+    assert all('pipeline failed' in result['error'] for result in results)
+
+def test_prototype_batch_encodes_once(prototype, hashing):
+    queries = ['interest rate', 'address of the branch', 'annual card fee', 'interest rate']
+    prototype.prototypes
+    calls = hashing.calls
+
+    batch = prototype.classify_batch(queries)
+
+    assert hashing.calls == calls + 1
+    assert batch == [prototype.classify_query(query) for query in queries]
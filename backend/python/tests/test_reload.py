@@ -0,0 +1,93 @@
+import os
+import shutil
+import time
+
+import pytest
+
+from conftest import DOCUMENTS
+from search import SemanticSearch
+
+NEW_DOCUMENTS = DOCUMENTS + [('sanima bank mobile banking charge', 'free')]
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+def replace_file(source, target):
+    """Swap in a file the way save_faiss_index does; live memory maps keep the old one"""
+    shutil.copy(source, f"{target}.tmp")
+    os.replace(f"{target}.tmp", target)
+
+@pytest.fixture
+def searcher(make_index):
+    files = make_index()
+    searcher = SemanticSearch(top_k=4)
+    searcher.load_index_and_keys(**files)
+    yield searcher
+    searcher.stop_watching()
+
+def test_reload_swaps_in_a_new_build(searcher, make_index):
+    before = searcher.index_fingerprint
+    searcher.search('mobile banking charge')
+
+    make_index(documents=NEW_DOCUMENTS)
+    assert searcher.reload(wait=True).result()
+
+    assert searcher.index_fingerprint != before
+    assert len(searcher.keys) == len(NEW_DOCUMENTS)
+    assert searcher.search('sanima mobile banking charge')[0].source == 'free'
+
+@pytest.mark.parametrize('artifact', ['key_store.bin', 'ranker.npz', 'vector_database.faiss'])
+def test_reload_rejects_files_of_another_build(searcher, make_index, tmp_path, artifact):
+    other = tmp_path / 'other'
+    other.mkdir()
+    make_index(directory=str(other), documents=NEW_DOCUMENTS)
+    before = searcher.snapshot
+    replace_file(other / artifact, tmp_path / artifact)
+
+    assert not searcher.reload(wait=True).result()
+    assert searcher.snapshot is before
+    assert searcher.search('nabil home loan rate')
+
+def test_watcher_reloads_changed_files(searcher, make_index):
+    searcher.watch_index_files(interval=0.02)
+    make_index(documents=NEW_DOCUMENTS)
+
+    assert wait_for(lambda: len(searcher.keys) == len(NEW_DOCUMENTS))
+
+def test_watcher_does_not_retry_rejected_files(searcher, make_index, tmp_path, monkeypatch):
+    attempts = []
+    load_snapshot = searcher._load_snapshot
+    monkeypatch.setattr(searcher, '_load_snapshot', lambda *files: attempts.append(files) or load_snapshot(*files))
+
+    other = tmp_path / 'other'
+    other.mkdir()
+    make_index(directory=str(other), documents=NEW_DOCUMENTS)
+    replace_file(other / 'vector_database.faiss', tmp_path / 'vector_database.faiss')
+
+    searcher.watch_index_files(interval=0.02)
+    assert wait_for(lambda: len(attempts) == 1)
+    time.sleep(0.3)
+    assert len(attempts) == 1
+    assert len(searcher.keys) == len(DOCUMENTS)
+
+    # A complete build is picked up once the files change again
+    make_index(documents=NEW_DOCUMENTS)
+    assert wait_for(lambda: len(searcher.keys) == len(NEW_DOCUMENTS))
+
+def test_reload_rejects_unverified_artifacts(searcher, tmp_path):
+    from search import CustomRanker
+
+    before = searcher.snapshot
+    ranker = CustomRanker.load(str(tmp_path / 'ranker.npz'))
+    ranker.fingerprint = None
+    ranker.save(str(tmp_path / 'ranker.npz'))
+    assert not searcher.reload(wait=True).result()
+
+    os.remove(tmp_path / 'key_store.bin')
+    assert not searcher.reload(wait=True).result()
+    assert searcher.snapshot is before
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from rwlock import ReadWriteLock
+
+def test_readers_share_the_lock():
+    lock = ReadWriteLock()
+    inside = threading.Barrier(3, timeout=5)
+
+    def read():
+        with lock.read():
+            inside.wait()
+
+    threads = [threading.Thread(target=read) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    # Only passes if both readers hold the lock at the same time
+    inside.wait()
+    for thread in threads:
+        thread.join(5)
+
+def test_writer_excludes_readers_and_writers():
+    lock = ReadWriteLock()
+    events = []
+
+    def read():
+        with lock.read():
+            events.append('read')
+
+    def write():
+        with lock.write():
+            events.append('write')
+
+    with lock.write():
+        threads = [threading.Thread(target=read), threading.Thread(target=write)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        assert events == []
+        events.append('first write done')
+
+    for thread in threads:
+        thread.join(5)
+    assert events[0] == 'first write done'
+    assert sorted(events[1:]) == ['read', 'write']
+
+def test_waiting_writer_blocks_new_readers():
+    lock = ReadWriteLock()
+    events = []
+    writer_waiting = threading.Event()
+
+    def write():
+        writer_waiting.set()
+        with lock.write():
+            events.append('write')
+
+    def read():
+        with lock.read():
+            events.append('late read')
+
+    with lock.read():
+        writer = threading.Thread(target=write)
+        writer.start()
+        writer_waiting.wait(5)
+        time.sleep(0.1)
+        reader = threading.Thread(target=read)
+        reader.start()
+        time.sleep(0.1)
+        # Neither the writer (a reader is active) nor the late reader (a
+        # writer is waiting) may enter
+        assert events == []
+
+    writer.join(5)
+    reader.join(5)
+    assert events == ['write', 'late read']
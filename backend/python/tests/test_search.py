@@ -0,0 +1,127 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import DOCUMENTS
+from search import CustomRanker, SemanticSearch
+
+CONTENTS = [content for content, _ in DOCUMENTS]
+
+QUERIES = [
+    'nabil home loan rate',
+    'savings account balance',
+    'debit card fee',
+    'education loan',
+    'tenure of global ime home loan',
+    'something unrelated entirely',
+]
+
+def fitted_ranker():
+    ranker = CustomRanker(k1=1.5, b=0.6)
+    ranker.fit(CONTENTS)
+    return ranker
+
+def test_ranker_inverted_index_matches_direct_scoring():
+    ranker = fitted_ranker()
+    for query in QUERIES:
+        direct = ranker.score(query, CONTENTS)
+        np.testing.assert_allclose(ranker.score_candidates(query, np.arange(len(CONTENTS))), direct, rtol=1e-5)
+
+        # Ties may be broken either way, so compare by score
+        doc_ids, scores = ranker.retrieve(query, 3)
+        expected = np.sort(direct[direct > 0])[::-1][:3]
+        np.testing.assert_allclose(CustomRanker._normalize(scores), expected, rtol=1e-5)
+        np.testing.assert_allclose(direct[doc_ids], expected, rtol=1e-5)
+
+def test_ranker_save_load_round_trip(tmp_path):
+    ranker = fitted_ranker()
+    ranker.fingerprint = 'abc123'
+    path = str(tmp_path / 'ranker.npz')
+    ranker.save(path)
+
+    loaded = CustomRanker.load(path)
+    assert (loaded.k1, loaded.b) == (ranker.k1, ranker.b)
+    assert loaded.vocabulary == ranker.vocabulary
+    assert loaded.total_docs == ranker.total_docs
+    assert loaded.avg_doc_length == ranker.avg_doc_length
+    assert loaded.fingerprint == 'abc123'
+    for name in ('doc_lengths', 'idf', 'postings_offsets', 'postings_docs', 'postings_tfs', 'postings_weights'):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(ranker, name))
+
+    for query in QUERIES:
+        for got, expected in zip(loaded.retrieve(query, 5), ranker.retrieve(query, 5)):
+            np.testing.assert_array_equal(got, expected)
+
+@pytest.fixture
+def make_searcher(make_index):
+    files = make_index()
+
+    def make(**kwargs):
+        searcher = SemanticSearch(result_cache_size=0, **kwargs)
+        searcher.load_index_and_keys(**files)
+        return searcher
+
+    return make
+
+@pytest.mark.parametrize('fusion', SemanticSearch.FUSION_MODES)
+def test_threshold_is_a_dense_similarity_floor(make_searcher, fusion):
+    searcher = make_searcher(fusion=fusion, top_k=8, candidate_k=8)
+    lexical_ids, _ = searcher.ranker.retrieve('nabil home loan rate', 8)
+    keyword_hits = {CONTENTS[doc_id] for doc_id in lexical_ids.tolist()}
+
+    for threshold in (0.0, 0.3, 0.6, 0.99):
+        for result in searcher.search('nabil home loan rate', threshold=threshold):
+            # Keyword retrieval's own hits are exempt in the hybrid modes
+            assert result.similarity >= threshold or (fusion != 'linear' and result.content in keyword_hits)
+
+def test_hybrid_modes_keep_keyword_hits_below_the_threshold(make_searcher):
+    for fusion in ('rrf', 'weighted'):
+        searcher = make_searcher(fusion=fusion, top_k=8, candidate_k=8)
+        results = searcher.search('bank', threshold=0.99)
+        assert len(results) == len(DOCUMENTS)
+
+    assert make_searcher(fusion='linear', top_k=8).search('bank', threshold=0.99) == []
+
+def test_explicit_zero_threshold_is_not_replaced_by_the_default(make_searcher):
+    searcher = make_searcher(fusion='linear', top_k=8, threshold=0.3)
+    assert len(searcher.search('something unrelated entirely', threshold=0.0)) == 8
+    assert len(searcher.search('something unrelated entirely')) < 8
+
+@pytest.mark.parametrize('index_type', ['flat', 'sq_fp16'])
+@pytest.mark.parametrize('fusion', SemanticSearch.FUSION_MODES)
+@pytest.mark.parametrize('threshold', [0.0, 0.5])
+def test_batch_search_matches_search(make_index, index_type, fusion, threshold):
+    # No result cache, so batch_search cannot just replay search's results
+    searcher = SemanticSearch(fusion=fusion, top_k=4, candidate_k=6, result_cache_size=0)
+    searcher.load_index_and_keys(**make_index(index_type=index_type))
+
+    expected = [searcher.search(query, threshold=threshold) for query in QUERIES]
+    actual = searcher.batch_search(QUERIES, threshold=threshold)
+
+    assert len(actual) == len(QUERIES)
+    for query, single, batch in zip(QUERIES, expected, actual):
+        assert [(r.content, r.source, r.rank) for r in batch] == \
+            [(r.content, r.source, r.rank) for r in single], query
+        np.testing.assert_allclose([r.score for r in batch], [r.score for r in single], rtol=1e-5)
+        np.testing.assert_allclose([r.similarity for r in batch], [r.similarity for r in single], rtol=1e-5)
+
+def test_compressed_index_reranks_to_exact_results(make_index, tmp_path):
+    exact = SemanticSearch(top_k=5, result_cache_size=0)
+    exact.load_index_and_keys(**make_index(directory=str(tmp_path)))
+    compressed_dir = tmp_path / 'sq_fp16'
+    compressed_dir.mkdir()
+    compressed = SemanticSearch(top_k=5, result_cache_size=0)
+    compressed.load_index_and_keys(**make_index(directory=str(compressed_dir), index_type='sq_fp16'))
+
+    assert compressed.snapshot.vectors is not None
+    assert [name for name in os.listdir(compressed_dir) if name.startswith('vectors.')] == \
+        [f"vectors.{compressed.index_fingerprint}.npy"]
+    for query in QUERIES:
+        expected = exact.search(query, threshold=0.0)
+        actual = compressed.search(query, threshold=0.0)
+        # Re-ranked similarities are exact; documents tied on them may swap
+        np.testing.assert_allclose([r.similarity for r in actual], [r.similarity for r in expected], atol=1e-6)
+        similarity = {r.content: r.similarity for r in exact.search(query, top_k=len(DOCUMENTS), threshold=0.0)}
+        for result in actual:
+            assert result.similarity == pytest.approx(similarity[result.content], abs=1e-6)